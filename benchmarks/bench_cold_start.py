@@ -0,0 +1,82 @@
+"""Measures the cold start of functions/main/app.py and fails when it exceeds a budget.
+
+Each sample is a fresh interpreter that imports boto3 and the function module against the
+local stand-ins, then runs one small invocation. It reports the time to import everything
+(what Lambda bills as init), the module's own init_ms, the first invocation, and peak RSS.
+
+    python benchmarks/bench_cold_start.py --runs 5 --budget-ms 300
+    python benchmarks/bench_cold_start.py --importtime     # also list the slowest imports
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CHILD = r"""
+import time
+started = time.perf_counter()
+import contextlib, io, json, resource, sys
+sys.path.insert(0, {here!r})
+from standins import FakeBedrockRuntime, FakeDynamoDB, LambdaContext, catalog_items, load_app, local_model_ids
+db = FakeDynamoDB()
+app = load_app(FakeBedrockRuntime(seed=0), db, local_model_ids("anthropic", 1), catalog=catalog_items(5))
+imported = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    app.lambda_handler({{}}, LambdaContext())
+invoked = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "init_ms": app.init_ms,
+    "first_invocation_ms": (invoked - imported) * 1000,
+    "peak_memory_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules": sorted(m for m in ("pandas", "numpy", "pyarrow") if m in sys.modules),
+}}))
+"""
+
+
+def sample(importtime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD.format(here=HERE)]
+    proc = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def slowest_imports(stderr, count=15):
+    # "import time: self [us] | cumulative | imported package" lines
+    rows = []
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line and "cumulative" not in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=300.0, help="maximum median import time")
+    parser.add_argument("--importtime", action="store_true", help="list the slowest imports of one run")
+    args = parser.parse_args()
+
+    samples = [sample()[0] for _ in range(args.runs)]
+    median = {k: round(statistics.median(s[k] for s in samples), 1)
+              for k in ("import_ms", "init_ms", "first_invocation_ms", "peak_memory_mb")}
+    print(f"cold start over {args.runs} runs (median): {median}")
+    if samples[0]["heavy_modules"]:
+        print(f"heavy modules loaded by a benchmark run: {samples[0]['heavy_modules']}")
+
+    if args.importtime:
+        for cumulative, name in slowest_imports(sample(importtime=True)[1]):
+            print(f"{cumulative / 1000:8.1f} ms  {name}")
+
+    if median["import_ms"] > args.budget_ms:
+        print(f"FAIL: median import {median['import_ms']} ms is over the {args.budget_ms} ms budget")
+        sys.exit(1)
+    print(f"OK: within the {args.budget_ms} ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Measures the benchmark harness's own overhead against local stand-ins.
+
+Runs functions/main/app.py end to end with an in-memory DynamoDB and a fake
+bedrock-runtime, across a grid of catalog sizes and model counts, and reports
+throughput, per-pair overhead and peak memory.
+
+    python benchmarks/bench_harness.py --prompts 10 100 1000 --models 1 4 --latency-ms 0
+    python benchmarks/bench_harness.py --prompts 1000 --models 4 --latency-ms 20 --trace   # per-span profile
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from standins import (FakeBedrockRuntime, FakeDynamoDB, LambdaContext, LatencyModel, ReplayBedrockRuntime,
+                      catalog_items, load_app, local_model_ids, restore_boto3)
+
+
+def run_case(prompts, model_ids, latency_ms, runs, env, replay=None):
+    models = len(model_ids)
+    results = []
+    for run in range(runs):
+        db = FakeDynamoDB()
+        if replay:
+            runtime = ReplayBedrockRuntime(replay)
+        else:
+            runtime = FakeBedrockRuntime(latency=LatencyModel(median_ms=latency_ms), seed=run)
+        app = load_app(runtime, db, model_ids, env=env, catalog=catalog_items(prompts))
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            output = app.lambda_handler({}, LambdaContext())
+        wall_s = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        pairs = prompts * models
+        # time the harness spends beyond the (simulated) model latency, per pair
+        ideal_s = pairs * latency_ms / 1000 / max(1, int(env.get("max_concurrency", "8")))
+        results.append({
+            "prompts": prompts,
+            "models": models,
+            "pairs": pairs,
+            "wall_s": round(wall_s, 4),
+            "pairs_per_s": round(pairs / wall_s, 1),
+            "overhead_ms_per_pair": round(max(0.0, wall_s - ideal_s) * 1000 / pairs, 4),
+            "peak_mem_mb": round(peak / 1024 / 1024, 2),
+            "items": len(db.items("bedrockbenchmark")),
+            "ddb_calls": dict(db.calls),
+            "status": output["statusCode"],
+            "profile": output["stats"].get("profile"),
+        })
+    # report the fastest run, the usual convention for overhead measurements
+    return min(results, key=lambda r: r["wall_s"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prompts", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--models", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--family", default="anthropic")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-concurrency", default="8")
+    parser.add_argument("--model-ids", nargs="+", help="explicit model ids, e.g. the ones in a --replay file")
+    parser.add_argument("--replay", help="JSONL file recorded with RecordingBedrockRuntime")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--trace", action="store_true", help="enable span tracing and print each case's profile")
+    args = parser.parse_args()
+
+    # the adaptive rate limiter would otherwise pace the run at its 5 rps starting rate
+    env = {"max_concurrency": args.max_concurrency, "tracing": "true" if args.trace else "false",
+           "rate_limit": '{"initial": 1000, "max": 1000}'}
+    rows = []
+    try:
+        model_sets = [args.model_ids] if args.model_ids else [local_model_ids(args.family, m) for m in args.models]
+        for model_ids in model_sets:
+            for prompts in args.prompts:
+                row = run_case(prompts, model_ids, args.latency_ms, args.runs, env, args.replay)
+                rows.append(row)
+                print(f"{row['prompts']:>7} prompts x {row['models']:>3} models: {row['pairs_per_s']:>10} pairs/s "
+                      f"{row['overhead_ms_per_pair']:>8} ms/pair overhead {row['peak_mem_mb']:>8} MB peak")
+                if row["profile"]:
+                    from tracing import format_profile
+                    print(format_profile(row["profile"]))
+    finally:
+        restore_boto3()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
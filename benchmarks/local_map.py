@@ -0,0 +1,102 @@
+"""Runs the plan -> Distributed Map -> shard flow of the state machine locally.
+
+Mirrors one provider branch of statemachine/bedrock_benchmark.asl.json: the
+planner invocation, then one invocation per shard of the plan it wrote to the
+(stand-in) S3 bucket, looping on continuations, with at most shard_concurrency
+shards in flight. Like Lambda execution environments, the planner and every
+worker get their own copy of the app module, so no two concurrent invocations
+share its caches, result writer or tracer.
+
+    python benchmarks/local_map.py --prompts 200 --models 2 --latency-ms 50 --shard-size 25 --shard-concurrency 1 4 16
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from standins import (MAIN_FUNCTION_DIR, FakeBedrockRuntime, FakeDynamoDB, FakeS3, LambdaContext, LatencyModel,
+                      catalog_items, load_app, local_model_ids, restore_boto3)
+
+sys.path.insert(0, MAIN_FUNCTION_DIR)
+from shards import load_plan  # noqa: E402
+
+
+def run_branch(load, state_input=None, timeout_s=900):
+    # load() imports a fresh app module over shared stand-ins, i.e. starts a new execution environment
+    execution_id = f"local:{uuid.uuid4()}"
+    planner = load()
+    plan = planner.lambda_handler({"mode": "plan", "input": state_input or {}, "run": {"execution_id": execution_id}},
+                                  LambdaContext(timeout_s))
+    # the Map's ItemReader
+    shards = load_plan(planner.s3, plan["shard_plan"])
+
+    # one warm environment per worker thread, reused by the shards and continuations it runs in turn
+    environments = threading.local()
+    load_lock = threading.Lock()
+
+    def environment():
+        if not hasattr(environments, "app"):
+            with load_lock:
+                environments.app = load()
+        return environments.app
+
+    def run_shard(shard):
+        # ItemSelector of the Map state, then the Task/Choice/Continue loop of the item processor
+        event = {"shard": shard, "run": {"execution_id": execution_id}, "invocation_mode": plan["invocation_mode"],
+                 "categories": plan["categories"], "regions": plan["regions"], "samples": plan["samples"],
+                 "warmup_samples": plan["warmup_samples"], "trace": plan["trace"]}
+        app = environment()
+        invocations = 0
+        while True:
+            output = app.lambda_handler(event, LambdaContext(timeout_s))
+            invocations += 1
+            if output["done"]:
+                return {"shard_id": shard["shard_id"], "invocations": invocations, "stats": output["stats"]}
+            event = output["continuation"]
+
+    with ThreadPoolExecutor(max_workers=plan["shard_concurrency"]) as pool:
+        return plan, list(pool.map(run_shard, shards))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prompts", type=int, default=200)
+    parser.add_argument("--models", type=int, default=2)
+    parser.add_argument("--family", default="anthropic")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--shard-size", type=int, default=25)
+    parser.add_argument("--shard-concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--max-concurrency", default="2", help="thread pool size inside each shard invocation")
+    args = parser.parse_args()
+
+    try:
+        for concurrency in args.shard_concurrency:
+            db, s3 = FakeDynamoDB(), FakeS3()
+            db.load("bedrockbenchmarkprompts", catalog_items(args.prompts))
+            runtime = FakeBedrockRuntime(latency=LatencyModel(median_ms=args.latency_ms), seed=0)
+
+            def load():
+                return load_app(runtime, db, local_model_ids(args.family, args.models), extra_clients={"s3": s3},
+                                env={"max_concurrency": args.max_concurrency,
+                                     "rate_limit": '{"initial": 1000, "max": 1000}'})
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                plan, results = run_branch(load, {"shard_size": args.shard_size, "shard_concurrency": concurrency})
+            wall_s = time.perf_counter() - start
+            pairs = sum(r["stats"]["invocations"] for r in results)
+            print(f"shard_concurrency={concurrency:>3}: {plan['shard_count']} shards, {pairs} pairs "
+                  f"in {wall_s:.2f}s ({pairs / wall_s:.1f} pairs/s), {len(db.items('bedrockbenchmark'))} items")
+    finally:
+        restore_boto3()
+
+
+if __name__ == "__main__":
+    main()
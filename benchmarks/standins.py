@@ -0,0 +1,805 @@
+import hashlib
+import importlib
+import io
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import types
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.conditions import ConditionExpressionBuilder
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+MAIN_FUNCTION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "functions", "main")
+
+KEY_SCHEMAS = {
+    "bedrockbenchmark": ("model_prompt_id", "date"),
+    "bedrockbenchmarkprompts": ("id", "prompt"),
+    "bedrockbenchmarkloadtest": ("model_id", "run_step"),
+    "bedrockbenchmarkledger": ("run_id", "pair_id"),
+    "bedrockbenchmarkrollup": ("model_id", "date_category"),
+    "bedrockbenchmarksketch": ("model_id", "period"),
+}
+
+# (table, index) -> key attributes of the global secondary indexes the code queries
+INDEX_SCHEMAS = {
+    ("bedrockbenchmark", "date_gsi"): ("date", "model_prompt_id"),
+    ("bedrockbenchmarkprompts", "category_gsi"): ("category", "id"),
+    ("bedrockbenchmarksketch", "period_gsi"): ("period", "model_id"),
+}
+
+MODEL_SHAPES = {
+    "anthropic": {"anthropic_version": "bedrock-2023-05-31", "max_tokens": 4000, "messages": [{"role": "user", "content": ""}], "temperature": 1.0, "stop_sequences": ["."], "top_p": 1.0, "top_k": 250},
+    "amazon.titan": {"inputText": "", "textGenerationConfig": {"temperature": 1.0, "topP": 1.0, "maxTokenCount": 4096, "stopSequences": []}},
+    "ai21": {"prompt": "", "temperature": 1.0, "maxTokens": 2048},
+    "cohere.command-r": {"message": "", "temperature": 0.75, "p": 0.01, "k": 0, "stop_sequences": [], "max_tokens": 2048},
+    "meta": {"prompt": "", "max_gen_len": 512, "temperature": 0.5, "top_p": 0.9},
+    "mistral": {"prompt": "", "max_tokens": 4000, "temperature": 0.5, "top_p": 0.9, "top_k": 50},
+}
+
+_boto3_client = boto3.client
+_boto3_resource = boto3.resource
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def family(model_id):
+    # cross-region inference profiles put a geography in front of the model id
+    model_id = model_id.split(".", 1)[1] if model_id.split(".", 1)[0] in ("us", "eu", "apac") else model_id
+    for prefix in MODEL_SHAPES:
+        if model_id.startswith(prefix):
+            return prefix
+    raise ValueError(f"Unknown model family for {model_id}")
+
+
+def response_body(model_id, text, input_tokens, output_tokens):
+    prefix = family(model_id)
+    if prefix == "anthropic":
+        return {"id": "msg_local", "type": "message", "role": "assistant", "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn", "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens}}
+    elif prefix == "amazon.titan":
+        return {"inputTextTokenCount": input_tokens,
+                "results": [{"tokenCount": output_tokens, "outputText": text, "completionReason": "FINISH"}]}
+    elif prefix == "ai21":
+        return {"id": 1234, "completions": [{"data": {"text": text}, "finishReason": {"reason": "endoftext"}}]}
+    elif prefix == "cohere.command-r":
+        return {"text": text, "finish_reason": "COMPLETE", "chat_history": []}
+    elif prefix == "meta":
+        return {"generation": " " + text, "prompt_token_count": input_tokens,
+                "generation_token_count": output_tokens, "stop_reason": "stop"}
+    return {"outputs": [{"text": text, "stop_reason": "stop"}]}
+
+
+def stream_chunks(model_id, words):
+    # one chunk per word, shaped like each family's invoke_model_with_response_stream events
+    prefix = family(model_id)
+    chunks = []
+    for word in words:
+        if prefix == "anthropic":
+            chunks.append({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": word}})
+        elif prefix == "amazon.titan":
+            chunks.append({"outputText": word, "index": 0})
+        elif prefix == "cohere.command-r":
+            chunks.append({"event_type": "text-generation", "text": word, "is_finished": False})
+        elif prefix == "meta":
+            chunks.append({"generation": word})
+        else:
+            chunks.append({"outputs": [{"text": word}]})
+    if prefix == "anthropic":
+        chunks.insert(0, {"type": "message_start"})
+        chunks.append({"type": "message_stop"})
+    return chunks
+
+
+class StreamingBody:
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+
+    def read(self, amt=None):
+        return self._stream.read(amt)
+
+    def iter_lines(self):
+        # like botocore's: lines without their line endings
+        for line in self._stream:
+            yield line.rstrip(b"\r\n")
+
+
+def max_output_tokens(body):
+    # the output cap under each provider's field name, if the body sets one
+    for field in ("max_tokens", "maxTokens", "max_gen_len"):
+        if field in body:
+            return int(body[field])
+    config = body.get("textGenerationConfig", {})
+    return int(config["maxTokenCount"]) if "maxTokenCount" in config else None
+
+
+class LatencyModel:
+    """Samples a latency in milliseconds: fixed, uniform or lognormal around a median."""
+
+    def __init__(self, dist="fixed", median_ms=0.0, spread=0.0, per_output_token_ms=0.0, seed=None,
+                 per_input_token_ms=0.0):
+        self.dist = dist
+        self.median_ms = median_ms
+        self.spread = spread
+        self.per_output_token_ms = per_output_token_ms
+        self.per_input_token_ms = per_input_token_ms
+        self.random = random.Random(seed)
+
+    def sample_ms(self, output_tokens=0, input_tokens=0):
+        if self.dist == "uniform":
+            base = self.random.uniform(max(0.0, self.median_ms - self.spread), self.median_ms + self.spread)
+        elif self.dist == "lognormal":
+            base = self.median_ms * self.random.lognormvariate(0, self.spread)
+        else:
+            base = self.median_ms
+        return base + self.per_output_token_ms * output_tokens + self.per_input_token_ms * input_tokens
+
+
+class FakeBedrockRuntime:
+    """In-process stand-in for the bedrock-runtime client."""
+
+    def __init__(self, latency=None, output_tokens=(20, 200), throttle_rate=0.0, error_rate=0.0,
+                 time_scale=1.0, seed=None, quota_rps=None, context_tokens=None, network_ms=0.0):
+        self.latency = latency or LatencyModel()
+        # round trip to this endpoint, left out of the invocation latency header like Bedrock's own
+        # and not scaled by time_scale
+        self.network_ms = network_ms
+        # longer prompts are rejected with a ValidationException, like a model's context window
+        self.context_tokens = context_tokens
+        # requests per second per model above which calls are throttled, like an account quota
+        self.quota_rps = quota_rps
+        self._windows = {}
+        self.output_tokens = output_tokens
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.time_scale = time_scale
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.throttles = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def _over_quota(self, model_id):
+        if not self.quota_rps:
+            return False
+        now = time.monotonic()
+        window = [t for t in self._windows.get(model_id, []) if now - t < 1.0]
+        over = len(window) >= self.quota_rps
+        if not over:
+            window.append(now)
+        self._windows[model_id] = window
+        return over
+
+    def _fail(self, operation, model_id=""):
+        with self._lock:
+            self.calls += 1
+            roll = self.random.random()
+            over_quota = self._over_quota(model_id)
+        if over_quota or roll < self.throttle_rate:
+            with self._lock:
+                self.throttles += 1
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Too many requests"},
+                               "ResponseMetadata": {"HTTPStatusCode": 429}}, operation)
+        if self.throttle_rate <= roll < self.throttle_rate + self.error_rate:
+            with self._lock:
+                self.errors += 1
+            raise ClientError({"Error": {"Code": "ModelErrorException", "Message": "Injected error"},
+                               "ResponseMetadata": {"HTTPStatusCode": 424}}, operation)
+
+    def _generate(self, body):
+        with self._lock:
+            output_tokens = self.random.randint(*self.output_tokens)
+        input_tokens = max(1, len(body) // 4)
+        if self.context_tokens and input_tokens > self.context_tokens:
+            raise ClientError({"Error": {"Code": "ValidationException",
+                                         "Message": "Input is too long for requested model."}}, "InvokeModel")
+        cap = max_output_tokens(json.loads(body))
+        if cap is not None:
+            output_tokens = min(output_tokens, cap)
+        # deterministic per body so the drift check sees stable outputs
+        seed = hashlib.md5(body.encode("utf-8")).hexdigest()
+        words = [f"{seed[i % 32]}{i} " for i in range(output_tokens)]
+        latency_ms = self.latency.sample_ms(output_tokens, input_tokens)
+        return input_tokens, output_tokens, words, latency_ms
+
+    def _headers(self, input_tokens, output_tokens, latency_ms):
+        return {
+            "content-type": "application/json",
+            "x-amzn-bedrock-invocation-latency": str(int(latency_ms)),
+            "x-amzn-bedrock-input-token-count": str(input_tokens),
+            "x-amzn-bedrock-output-token-count": str(output_tokens),
+        }
+
+    def invoke_model(self, modelId, body, **kwargs):
+        self._fail("InvokeModel", modelId)
+        input_tokens, output_tokens, words, latency_ms = self._generate(body)
+        time.sleep(latency_ms * self.time_scale / 1000 + self.network_ms / 1000)
+        data = json.dumps(response_body(modelId, "".join(words).strip(), input_tokens, output_tokens)).encode("utf-8")
+        return {
+            "ResponseMetadata": {"HTTPStatusCode": 200,
+                                 "HTTPHeaders": self._headers(input_tokens, output_tokens, latency_ms)},
+            "contentType": "application/json",
+            "body": StreamingBody(data),
+        }
+
+    def invoke_model_with_response_stream(self, modelId, body, **kwargs):
+        if family(modelId) == "ai21":
+            # like Bedrock, which has no response streaming for Jurassic-2
+            raise ClientError({"Error": {"Code": "ValidationException",
+                                         "Message": "The model is unsupported for streaming."}},
+                              "InvokeModelWithResponseStream")
+        self._fail("InvokeModelWithResponseStream", modelId)
+        input_tokens, output_tokens, words, latency_ms = self._generate(body)
+        chunks = stream_chunks(modelId, words)
+        chunks[-1]["amazon-bedrock-invocationMetrics"] = {
+            "inputTokenCount": input_tokens, "outputTokenCount": output_tokens,
+            "invocationLatency": int(latency_ms), "firstByteLatency": int(latency_ms / max(1, len(chunks))),
+        }
+        delay_s = latency_ms * self.time_scale / 1000 / max(1, len(chunks))
+        time.sleep(self.network_ms / 1000)
+
+        def events():
+            for chunk in chunks:
+                time.sleep(delay_s)
+                yield {"chunk": {"bytes": json.dumps(chunk).encode("utf-8")}}
+
+        return {"ResponseMetadata": {"HTTPStatusCode": 200, "HTTPHeaders": {}}, "body": events()}
+
+
+def _request_key(model_id, body):
+    return hashlib.sha256(f"{model_id}\n{body}".encode("utf-8")).hexdigest()
+
+
+class RecordingBedrockRuntime:
+    """Wraps a real bedrock-runtime client and appends every response to a JSONL file."""
+
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+        self._lock = threading.Lock()
+
+    def invoke_model(self, modelId, body, **kwargs):
+        start = time.perf_counter()
+        resp = self.client.invoke_model(modelId=modelId, body=body, **kwargs)
+        data = resp["body"].read()
+        record = {
+            "key": _request_key(modelId, body),
+            "model_id": modelId,
+            "headers": resp["ResponseMetadata"]["HTTPHeaders"],
+            "body": data.decode("utf-8"),
+            "wall_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+        with self._lock, open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        resp["body"] = StreamingBody(data)
+        return resp
+
+
+class ReplayBedrockRuntime:
+    """Serves responses captured by RecordingBedrockRuntime, optionally replaying their wall time."""
+
+    def __init__(self, path, replay_latency=False, time_scale=1.0):
+        self.records = {}
+        self.by_model = {}
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.records[record["key"]] = record
+                    self.by_model.setdefault(record["model_id"], []).append(record)
+        self.replay_latency = replay_latency
+        self.time_scale = time_scale
+        self.calls = 0
+
+    def invoke_model(self, modelId, body, **kwargs):
+        self.calls += 1
+        record = self.records.get(_request_key(modelId, body))
+        if record is None:
+            # unseen prompt: fall back to a recorded response from the same model
+            recorded = self.by_model.get(modelId)
+            if not recorded:
+                raise ClientError({"Error": {"Code": "ResourceNotFoundException",
+                                             "Message": f"No recording for {modelId}"}}, "InvokeModel")
+            record = recorded[self.calls % len(recorded)]
+        if self.replay_latency:
+            time.sleep(record["wall_ms"] * self.time_scale / 1000)
+        return {
+            "ResponseMetadata": {"HTTPStatusCode": 200, "HTTPHeaders": dict(record["headers"])},
+            "contentType": "application/json",
+            "body": StreamingBody(record["body"].encode("utf-8")),
+        }
+
+
+def _plain(value):
+    # float -> Decimal, the way the DynamoDB resource layer stores numbers
+    if isinstance(value, float):
+        return Decimal(str(value))
+    return value
+
+
+def _projected(item, projection=None, names=None):
+    if not projection:
+        return item
+    names = names or {}
+    wanted = [names.get(p.strip(), p.strip()) for p in projection.split(",")]
+    return {k: item[k] for k in wanted if k in item}
+
+
+class FakeDynamoDB:
+    """In-memory DynamoDB serving both the low-level client and the resource API."""
+
+    def __init__(self, key_schemas=None, page_size=1000, unprocessed_rate=0.0, seed=None):
+        self.key_schemas = dict(KEY_SCHEMAS)
+        self.key_schemas.update(key_schemas or {})
+        self.page_size = page_size
+        self.unprocessed_rate = unprocessed_rate
+        self.random = random.Random(seed)
+        self.tables = {}
+        # table -> hash key value -> {key: item}, so queries don't walk the whole table
+        self.partitions = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _count(self, operation):
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+
+    def _key(self, table_name, item):
+        return tuple(item.get(k) for k in self.key_schemas[table_name])
+
+    def put(self, table_name, item):
+        key = self._key(table_name, item)
+        with self._lock:
+            self.tables.setdefault(table_name, {})[key] = item
+            self.partitions.setdefault(table_name, {}).setdefault(key[0], {})[key] = item
+
+    def delete(self, table_name, key):
+        key = self._key(table_name, key)
+        with self._lock:
+            self.tables.get(table_name, {}).pop(key, None)
+            self.partitions.get(table_name, {}).get(key[0], {}).pop(key, None)
+
+    def partition(self, table_name, hash_value):
+        with self._lock:
+            return list(self.partitions.get(table_name, {}).get(hash_value, {}).values())
+
+    def items(self, table_name):
+        with self._lock:
+            return list(self.tables.get(table_name, {}).values())
+
+    def load(self, table_name, items):
+        for item in items:
+            self.put(table_name, {k: _plain(v) for k, v in item.items()})
+
+    # low-level client API (typed attribute values)
+
+    def scan(self, TableName, ExclusiveStartKey=None, Limit=None, ProjectionExpression=None,
+             ExpressionAttributeNames=None, **kwargs):
+        self._count("scan")
+        rows = sorted(self.items(TableName), key=lambda i: tuple(str(v) for v in self._key(TableName, i)))
+        start = 0
+        if ExclusiveStartKey:
+            last = tuple(str(_deserializer.deserialize(ExclusiveStartKey[k])) for k in self.key_schemas[TableName])
+            while start < len(rows) and tuple(str(v) for v in self._key(TableName, rows[start])) <= last:
+                start += 1
+        size = min(Limit or self.page_size, self.page_size)
+        page = rows[start:start + size]
+        resp = {"Items": [self._typed(i, ProjectionExpression, ExpressionAttributeNames) for i in page],
+                "Count": len(page), "ScannedCount": len(page)}
+        if start + size < len(rows):
+            resp["LastEvaluatedKey"] = {k: _serializer.serialize(page[-1][k]) for k in self.key_schemas[TableName]}
+        return resp
+
+    def query(self, TableName, KeyConditionExpression, ExpressionAttributeValues, ExpressionAttributeNames=None,
+              ScanIndexForward=True, Limit=None, ProjectionExpression=None, **kwargs):
+        self._count("query")
+        names = ExpressionAttributeNames or {}
+        values = {k: _deserializer.deserialize(v) for k, v in ExpressionAttributeValues.items()}
+        index = kwargs.get("IndexName")
+        hash_key, range_key = INDEX_SCHEMAS[(TableName, index)] if index else self.key_schemas[TableName]
+        clauses = [c.strip() for c in re.split(r" AND (?!\S+$)", KeyConditionExpression)]
+        name, placeholder = [p.strip() for p in clauses[0].split(" = ")]
+        if names.get(name, name) != hash_key:
+            raise ClientError({"Error": {"Code": "ValidationException",
+                                         "Message": "Query condition missed key schema element"}}, "Query")
+        if index:
+            rows = [r for r in self.items(TableName) if r.get(hash_key) == values[placeholder]]
+        else:
+            rows = self.partition(TableName, values[placeholder])
+        for clause in clauses[1:]:
+            rows = [r for r in rows if self._match(r, clause, names, values)]
+        rows.sort(key=lambda r: r.get(range_key), reverse=not ScanIndexForward)
+        if Limit:
+            rows = rows[:Limit]
+        return {"Items": [self._typed(i, ProjectionExpression, ExpressionAttributeNames) for i in rows],
+                "Count": len(rows)}
+
+    def _match(self, row, clause, names, values):
+        if " BETWEEN " in clause:
+            name, bounds = clause.split(" BETWEEN ")
+            low, high = [values[p.strip()] for p in bounds.split(" AND ")]
+            actual = row.get(names.get(name.strip(), name.strip()))
+            return actual is not None and low <= actual <= high
+        if clause.startswith("begins_with"):
+            name, placeholder = [p.strip() for p in clause[clause.index("(") + 1:clause.rindex(")")].split(",")]
+            return str(row.get(names.get(name, name), "")).startswith(values[placeholder])
+        for op in (">=", "<=", "=", ">", "<"):
+            if f" {op} " in clause:
+                name, placeholder = [p.strip() for p in clause.split(f" {op} ")]
+                actual = row.get(names.get(name, name))
+                expected = values[placeholder]
+                if actual is None:
+                    return False
+                return {"=": actual == expected, ">": actual > expected, "<": actual < expected,
+                        ">=": actual >= expected, "<=": actual <= expected}[op]
+        raise ValueError(f"Unsupported key condition: {clause}")
+
+    def _typed(self, item, projection=None, names=None):
+        return {k: _serializer.serialize(v) for k, v in _projected(item, projection, names).items()}
+
+    def get_item(self, TableName, Key, **kwargs):
+        self._count("get_item")
+        key = {k: _deserializer.deserialize(v) for k, v in Key.items()}
+        with self._lock:
+            item = self.tables.get(TableName, {}).get(self._key(TableName, key))
+        return {"Item": self._typed(item)} if item else {}
+
+    def put_item(self, TableName, Item, ConditionExpression=None, ExpressionAttributeValues=None, **kwargs):
+        self._count("put_item")
+        item = {k: _deserializer.deserialize(v) for k, v in Item.items()}
+        key = self._key(TableName, item)
+        with self._lock:
+            # check and write under one lock, like DynamoDB's conditional writes
+            existing = self.tables.get(TableName, {}).get(key)
+            if ConditionExpression and not self._condition(existing, ConditionExpression, ExpressionAttributeValues or {}):
+                raise ClientError({"Error": {"Code": "ConditionalCheckFailedException",
+                                             "Message": "The conditional request failed"}}, "PutItem")
+            self.tables.setdefault(TableName, {})[key] = item
+            self.partitions.setdefault(TableName, {}).setdefault(key[0], {})[key] = item
+        return {}
+
+    def update_item(self, TableName, Key, UpdateExpression, ExpressionAttributeValues=None,
+                    ExpressionAttributeNames=None, ReturnValues=None, ConditionExpression=None, **kwargs):
+        # "ADD <attr> :n" and "SET <attr> = :v", comma separated
+        self._count("update_item")
+        names = ExpressionAttributeNames or {}
+        values = {k: _deserializer.deserialize(v) for k, v in (ExpressionAttributeValues or {}).items()}
+        key = {k: _deserializer.deserialize(v) for k, v in Key.items()}
+        action, _, clauses = UpdateExpression.strip().partition(" ")
+        with self._lock:
+            existing = self.tables.get(TableName, {}).get(self._key(TableName, key))
+            if ConditionExpression and not self._condition(existing, ConditionExpression, ExpressionAttributeValues or {}):
+                raise ClientError({"Error": {"Code": "ConditionalCheckFailedException",
+                                             "Message": "The conditional request failed"}}, "UpdateItem")
+            item = dict(existing or key)
+            updated = {}
+            for clause in clauses.split(","):
+                if action == "ADD":
+                    name, placeholder = clause.split()
+                    name = names.get(name, name)
+                    updated[name] = item.get(name, 0) + values[placeholder]
+                else:
+                    name, placeholder = [p.strip() for p in clause.split("=")]
+                    name = names.get(name, name)
+                    updated[name] = values[placeholder]
+            item.update(updated)
+            table_key = self._key(TableName, item)
+            self.tables.setdefault(TableName, {})[table_key] = item
+            self.partitions.setdefault(TableName, {}).setdefault(table_key[0], {})[table_key] = item
+        return {"Attributes": self._typed(updated)} if ReturnValues == "UPDATED_NEW" else {}
+
+    def _condition(self, existing, expression, values):
+        # the forms the code uses: attribute_exists(key), attribute_not_exists(key) and "<attribute> = :value"
+        if expression.startswith("attribute_not_exists"):
+            return existing is None
+        if expression.startswith("attribute_exists"):
+            return existing is not None
+        values = {k: _deserializer.deserialize(v) for k, v in values.items()}
+        return existing is not None and self._match(existing, expression, {}, values)
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        return self._batch_write(RequestItems, typed=True)
+
+    def describe_table(self, TableName, **kwargs):
+        return {"Table": {"TableName": TableName, "ItemCount": len(self.items(TableName))},
+                "ResponseMetadata": {"HTTPStatusCode": 200}}
+
+    def _batch_write(self, RequestItems, typed):
+        self._count("batch_write_item")
+        unprocessed = {}
+        for table_name, requests in RequestItems.items():
+            if len(requests) > 25:
+                raise ClientError({"Error": {"Code": "ValidationException",
+                                             "Message": "Too many items requested for the BatchWriteItem call"}},
+                                  "BatchWriteItem")
+            for request in requests:
+                if self.unprocessed_rate and self.random.random() < self.unprocessed_rate:
+                    unprocessed.setdefault(table_name, []).append(request)
+                    continue
+                if "PutRequest" in request:
+                    item = request["PutRequest"]["Item"]
+                    if typed:
+                        item = {k: _deserializer.deserialize(v) for k, v in item.items()}
+                    self.put(table_name, item)
+                else:
+                    key = request["DeleteRequest"]["Key"]
+                    if typed:
+                        key = {k: _deserializer.deserialize(v) for k, v in key.items()}
+                    self.delete(table_name, key)
+        return {"UnprocessedItems": unprocessed}
+
+    # resource API (plain python values)
+
+    def resource(self):
+        return FakeDynamoDBResource(self)
+
+
+class FakeTable:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        # table.meta.client is the resource's client, which takes plain values too
+        self.meta = types.SimpleNamespace(client=FakeDynamoDBResource(db))
+
+    def put_item(self, Item, **kwargs):
+        self.db._count("put_item")
+        self.db.put(self.name, {k: _plain(v) for k, v in Item.items()})
+        return {}
+
+    def update_item(self, Key, ExpressionAttributeValues=None, **kwargs):
+        return self.db.update_item(self.name, {k: _serializer.serialize(_plain(v)) for k, v in Key.items()},
+                                   ExpressionAttributeValues={k: _serializer.serialize(_plain(v))
+                                                              for k, v in (ExpressionAttributeValues or {}).items()},
+                                   **kwargs)
+
+    def get_item(self, Key, **kwargs):
+        self.db._count("get_item")
+        with self.db._lock:
+            item = self.db.tables.get(self.name, {}).get(self.db._key(self.name, Key))
+        return {"Item": dict(item)} if item else {}
+
+    def scan(self, ExclusiveStartKey=None, FilterExpression=None, ProjectionExpression=None,
+             ExpressionAttributeNames=None, **kwargs):
+        # pages of the low-level scan; a boto3 Attr() filter applies to each page before the projection
+        if ExclusiveStartKey:
+            kwargs["ExclusiveStartKey"] = {k: _serializer.serialize(_plain(v)) for k, v in ExclusiveStartKey.items()}
+        resp = self.db.scan(self.name, **kwargs)
+        items = [{k: _deserializer.deserialize(v) for k, v in i.items()} for i in resp["Items"]]
+        names = dict(ExpressionAttributeNames or {})
+        if FilterExpression is not None:
+            built = ConditionExpressionBuilder().build_expression(FilterExpression)
+            names.update(built.attribute_name_placeholders)
+            values = {k: _plain(v) for k, v in built.attribute_value_placeholders.items()}
+            items = [i for i in items if self.db._match(i, built.condition_expression, names, values)]
+        page = {"Items": [_projected(i, ProjectionExpression, names) for i in items], "Count": len(items)}
+        if "LastEvaluatedKey" in resp:
+            page["LastEvaluatedKey"] = {k: _deserializer.deserialize(v) for k, v in resp["LastEvaluatedKey"].items()}
+        return page
+
+    def query(self, KeyConditionExpression, ExpressionAttributeNames=None, ExpressionAttributeValues=None, **kwargs):
+        # boto3 Key() conditions are built into the expression strings the low-level query takes
+        if not isinstance(KeyConditionExpression, str):
+            built = ConditionExpressionBuilder().build_expression(KeyConditionExpression, is_key_condition=True)
+            KeyConditionExpression = built.condition_expression
+            ExpressionAttributeNames = {**(ExpressionAttributeNames or {}), **built.attribute_name_placeholders}
+            ExpressionAttributeValues = {**(ExpressionAttributeValues or {}), **built.attribute_value_placeholders}
+        resp = self.db.query(self.name, KeyConditionExpression,
+                             {k: _serializer.serialize(_plain(v)) for k, v in (ExpressionAttributeValues or {}).items()},
+                             ExpressionAttributeNames=ExpressionAttributeNames, **kwargs)
+        return dict(resp, Items=[{k: _deserializer.deserialize(v) for k, v in i.items()} for i in resp["Items"]])
+
+
+class FakeDynamoDBResource:
+    def __init__(self, db):
+        self.db = db
+
+    def Table(self, name):
+        return FakeTable(self.db, name)
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        return self.db._batch_write(RequestItems, typed=False)
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        self.db._count("batch_get_item")
+        responses = {}
+        for table_name, request in RequestItems.items():
+            if len(request["Keys"]) > 100:
+                raise ClientError({"Error": {"Code": "ValidationException",
+                                             "Message": "Too many items requested for the BatchGetItem call"}},
+                                  "BatchGetItem")
+            found = []
+            for key in request["Keys"]:
+                with self.db._lock:
+                    item = self.db.tables.get(table_name, {}).get(self.db._key(table_name, key))
+                if item:
+                    found.append(_projected(item, request.get("ProjectionExpression"),
+                                            request.get("ExpressionAttributeNames")))
+            responses[table_name] = found
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+
+class FakeS3:
+    """In-memory S3 bucket store: put/get/head/list objects."""
+
+    def __init__(self):
+        self.objects = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _count(self, operation):
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._count("put_object")
+        data = Body.encode("utf-8") if isinstance(Body, str) else Body if isinstance(Body, bytes) else Body.read()
+        with self._lock:
+            self.objects[(Bucket, Key)] = data
+        return {"ETag": hashlib.md5(data).hexdigest()}
+
+    def _missing(self, operation, code):
+        return ClientError({"Error": {"Code": code, "Message": "Not Found"}}, operation)
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self._count("get_object")
+        with self._lock:
+            if (Bucket, Key) not in self.objects:
+                raise self._missing("GetObject", "NoSuchKey")
+            data = self.objects[(Bucket, Key)]
+        return {"Body": StreamingBody(data), "ContentLength": len(data)}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._count("head_object")
+        with self._lock:
+            if (Bucket, Key) not in self.objects:
+                raise self._missing("HeadObject", "404")
+            return {"ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def list_objects_v2(self, Bucket, Prefix="", **kwargs):
+        self._count("list_objects_v2")
+        with self._lock:
+            keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix))
+        return {"Contents": [{"Key": k, "Size": len(self.objects[(Bucket, k)])} for k in keys], "KeyCount": len(keys)}
+
+
+class FakeBedrock:
+    """Stand-in for the bedrock control plane's batch inference jobs over a FakeS3.
+
+    Jobs stay Submitted until run_jobs(), which answers every input record with the given
+    runtime stand-in and writes the output files the way Bedrock lays them out, or until
+    fail_job() ends one without output.
+    """
+
+    def __init__(self, s3, runtime, error_rate=0.0, seed=None):
+        self.s3 = s3
+        self.runtime = runtime
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.jobs = {}
+
+    @staticmethod
+    def _split(uri):
+        bucket, _, key = uri[len("s3://"):].partition("/")
+        return bucket, key
+
+    def create_model_invocation_job(self, jobName, roleArn, modelId, inputDataConfig, outputDataConfig, **kwargs):
+        arn = f"arn:aws:bedrock:local:000000000000:model-invocation-job/{len(self.jobs):012d}"
+        self.jobs[arn] = {"name": jobName, "model": modelId, "status": "Submitted",
+                          "input": inputDataConfig["s3InputDataConfig"]["s3Uri"],
+                          "output": outputDataConfig["s3OutputDataConfig"]["s3Uri"]}
+        return {"jobArn": arn}
+
+    def get_model_invocation_job(self, jobIdentifier):
+        job = self.jobs[jobIdentifier]
+        state = {"jobArn": jobIdentifier, "jobName": job["name"], "status": job["status"]}
+        if "message" in job:
+            state["message"] = job["message"]
+        return state
+
+    def fail_job(self, jobIdentifier, status="Failed", message="Injected failure"):
+        self.jobs[jobIdentifier].update(status=status, message=message)
+
+    def run_jobs(self):
+        for arn, job in self.jobs.items():
+            if job["status"] != "Submitted":
+                continue
+            bucket, prefix = self._split(job["input"])
+            out_bucket, out_prefix = self._split(job["output"])
+            job_id = arn.rsplit("/", 1)[1]
+            for obj in self.s3.list_objects_v2(Bucket=bucket, Prefix=prefix)["Contents"]:
+                lines = []
+                for line in self.s3.get_object(Bucket=bucket, Key=obj["Key"])["Body"].iter_lines():
+                    record = json.loads(line)
+                    if self.random.random() < self.error_rate:
+                        record["error"] = {"errorCode": 400, "errorMessage": "Injected error"}
+                    else:
+                        resp = self.runtime.invoke_model(modelId=job["model"], body=json.dumps(record["modelInput"]))
+                        record["modelOutput"] = json.loads(resp["body"].read())
+                    lines.append(json.dumps(record))
+                name = obj["Key"].rsplit("/", 1)[1]
+                self.s3.put_object(Bucket=out_bucket, Key=f"{out_prefix.rstrip('/')}/{job_id}/{name}.out",
+                                   Body="\n".join(lines) + "\n")
+            job["status"] = "Completed"
+
+
+class LambdaContext:
+    """Minimal Lambda context object for running handlers locally."""
+
+    def __init__(self, timeout_s=900, function_name="local", memory_limit_in_mb=150):
+        self.function_name = function_name
+        self.memory_limit_in_mb = memory_limit_in_mb
+        self.aws_request_id = "local-request"
+        self.log_stream_name = "local"
+        self._deadline = time.monotonic() + timeout_s
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+def local_model_ids(prefix, count):
+    # the harness only writes cohere results for the exact command-r model ids
+    base = "cohere.command-r-v1:0" if prefix == "cohere.command-r" else prefix
+    return [f"{base}-local-{i}" for i in range(count)]
+
+
+def catalog_items(count, categories=("code", "creativity", "instruct", "knowledge", "reflexion")):
+    return [{"id": f"{categories[i % len(categories)]}_{(i + 1) * 100}",
+             "prompt": f"Synthetic prompt number {i}: explain topic {i % 97} in a few sentences.",
+             "category": categories[i % len(categories)]}
+            for i in range(count)]
+
+
+def load_app(runtime, db, models, shape=None, env=None, catalog=None, extra_clients=None):
+    """Imports functions/main/app.py against the stand-ins and returns the fresh module."""
+    if catalog is not None:
+        db.load("bedrockbenchmarkprompts", catalog)
+
+    environment = {
+        "prompt_catalog": "bedrockbenchmarkprompts",
+        "benchmark_table": "bedrockbenchmark",
+        "loadtest_table": "bedrockbenchmarkloadtest",
+        "ledger_table": "bedrockbenchmarkledger",
+        "rollup_table": "bedrockbenchmarkrollup",
+        "sketch_table": "bedrockbenchmarksketch",
+        "plan_location": "s3://local/plans",
+        "model_shape": json.dumps(shape or MODEL_SHAPES[family(models[0])]),
+        "supported_models": json.dumps(list(models)),
+        "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "us-west-2"),
+    }
+    environment.update(env or {})
+    os.environ.update(environment)
+
+    # an empty bucket store unless the caller brings its own, e.g. for the shard plans
+    clients = {"bedrock-runtime": runtime, "dynamodb": db, "s3": FakeS3()}
+    clients.update(extra_clients or {})
+
+    def client(service_name, *args, region_name=None, **kwargs):
+        # runtime may be {region: stand-in}, one local endpoint per region
+        service = clients.get(service_name)
+        if isinstance(service, dict):
+            return service[region_name or environment["AWS_DEFAULT_REGION"]]
+        return service
+
+    def resource(service_name, *args, **kwargs):
+        return db.resource()
+
+    boto3.client = client
+    boto3.resource = resource
+
+    if MAIN_FUNCTION_DIR not in sys.path:
+        sys.path.insert(0, MAIN_FUNCTION_DIR)
+    for name in list(sys.modules):
+        if name == "app":
+            del sys.modules[name]
+    return importlib.import_module("app")
+
+
+def restore_boto3():
+    boto3.client = _boto3_client
+    boto3.resource = _boto3_resource
@@ -0,0 +1,111 @@
+"""Diff-based sync of the prompt catalog table from JSONL/YAML files.
+
+JSONL: one {"category": ..., "prompt": ..., "id": optional} object per line.
+YAML:  {category: [prompt, ...]}, each prompt a string or a mapping with "prompt" and optional "id".
+
+Prompts without an explicit id get "<category>_<first 12 hex of sha256(prompt)>", so adding or
+removing a prompt never renumbers the others. Each item also carries its category (for the
+category_gsi index), and every applied change bumps the catalog version marker item, which the
+benchmark functions check before reusing their cached copy.
+"""
+import hashlib
+import json
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+LOG = logging.getLogger()
+
+# BatchWriteItem accepts at most 25 requests per call
+BATCH_SIZE = 25
+
+VERSION_KEY = {"id": {"S": "#catalog"}, "prompt": {"S": "#version"}}
+
+
+def prompt_id(category, prompt):
+    return f"{category}_{hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]}"
+
+
+def _entry(category, prompt):
+    if isinstance(prompt, str):
+        prompt = {"prompt": prompt}
+    return {"id": prompt.get("id") or prompt_id(category, prompt["prompt"]), "prompt": prompt["prompt"],
+            "category": category}
+
+
+def load_catalog(paths):
+    # (id, prompt) -> category over all files; a later file wins for the same id
+    catalog = {}
+    for path in paths:
+        if path.endswith((".yml", ".yaml")):
+            import yaml
+            with open(path, encoding="utf-8") as f:
+                entries = [_entry(category, p) for category, prompts in yaml.safe_load(f).items() for p in prompts]
+        else:
+            with open(path, encoding="utf-8") as f:
+                # blank lines, e.g. a trailing one, are not rows
+                entries = [_entry(row["category"], row) for row in (json.loads(line) for line in f if line.strip())]
+        for entry in entries:
+            catalog[entry["id"]] = entry
+    return {(e["id"], e["prompt"]): e["category"] for e in catalog.values()}
+
+
+def current_catalog(ddbclient, table_name):
+    # paginated scan of the keys and category; (id, prompt) is the table's whole primary key
+    kwargs = {"TableName": table_name, "ProjectionExpression": "id, prompt, category"}
+    items = {}
+    while True:
+        resp = ddbclient.scan(**kwargs)
+        for i in resp.get("Items", []):
+            if not i["id"]["S"].startswith("#"):
+                items[(i["id"]["S"], i["prompt"]["S"])] = i.get("category", {}).get("S")
+        if "LastEvaluatedKey" not in resp:
+            return items
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def diff(current, desired):
+    # a changed prompt text under the same id is a delete of the old key plus an insert;
+    # an item missing its category is put again in place
+    inserts = sorted((k, c) for k, c in desired.items() if current.get(k, "") != c)
+    deletes = sorted(k for k in current if k not in desired)
+    return inserts, deletes
+
+
+def _write_batch(ddbclient, table_name, requests, max_retries=8, base_delay=0.05):
+    attempt = 0
+    while requests:
+        resp = ddbclient.batch_write_item(RequestItems={table_name: requests})
+        requests = resp.get("UnprocessedItems", {}).get(table_name, [])
+        if requests:
+            attempt += 1
+            if attempt > max_retries:
+                raise RuntimeError(f"{len(requests)} catalog writes still unprocessed after {max_retries} retries")
+            time.sleep(random.uniform(0, base_delay * (2 ** attempt)))
+
+
+def apply(ddbclient, table_name, inserts, deletes, max_workers=8):
+    requests = [{"DeleteRequest": {"Key": {"id": {"S": i}, "prompt": {"S": p}}}} for i, p in deletes]
+    requests += [{"PutRequest": {"Item": {"id": {"S": i}, "prompt": {"S": p}, "category": {"S": c}}}}
+                 for (i, p), c in inserts]
+    batches = [requests[i:i + BATCH_SIZE] for i in range(0, len(requests), BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(lambda batch: _write_batch(ddbclient, table_name, batch), batches))
+    return len(batches)
+
+
+def bump_version(ddbclient, table_name):
+    resp = ddbclient.update_item(TableName=table_name, Key=VERSION_KEY, UpdateExpression="ADD version :one",
+                                 ExpressionAttributeValues={":one": {"N": "1"}}, ReturnValues="UPDATED_NEW")
+    return int(resp["Attributes"]["version"]["N"])
+
+
+def sync(ddbclient, table_name, desired, dry_run=False, max_workers=8):
+    inserts, deletes = diff(current_catalog(ddbclient, table_name), desired)
+    LOG.info(f"{table_name}: {len(desired)} prompts, {len(inserts)} to insert, {len(deletes)} to delete")
+    result = {"prompts": len(desired), "inserted": len(inserts), "deleted": len(deletes), "batches": 0}
+    if not dry_run and (inserts or deletes):
+        result["batches"] = apply(ddbclient, table_name, inserts, deletes, max_workers)
+        result["version"] = bump_version(ddbclient, table_name)
+    return result
@@ -1,32 +1,81 @@
+import time
+# module load time, from the first import to the end of this file
+init_started = time.perf_counter()
 import boto3
-from boto3.dynamodb.conditions import Attr
 import json
-import pandas as pd
-import time
+import resource
+import statistics
 import hashlib
-from datetime import date
+from datetime import date, datetime, timezone
 import os
 import ast
+import copy
 from botocore.config import Config
+from engine import InvocationEngine
+from ratelimit import AdaptiveRateLimiter, error_code, is_retryable
+from botocore.exceptions import ClientError
+from ledger import RunLedger
+from scheduler import DeadlineScheduler, estimate_costs
+from concurrent.futures import ThreadPoolExecutor
+from shards import add_spans, ordered_pairs, plan_shards, save_plan, shard_pairs
+from writer import BatchResultWriter, UpdateBuffer
+from blobstore import OutputStore, backend_for
+from catalog import CatalogSnapshot, iter_span
+from clients import LazyClient
+from streaming import stream_prompt_result, supports_streaming
+from loadtest import planned_duration_s, run_load_test
+from sketch import DDSketch, find_regressions, load_baseline, load_day, merge_into, periods
+from rollup import ROLLUP_METRICS, category_metric, rollup_items
+from sampling import SampleCollector, distribution, interleave
+from tracing import Tracer, emf_document, format_profile
+from regions import RegionComparison, endpoint, invocation_target, split_endpoint
+from decimal import Decimal
 
 
+# throttles are handled by the adaptive rate limiter and re-queued, so keep
+# botocore's own retries short instead of burning wall time on them
 config = Config(
    retries = {
-      'max_attempts': 5,
+      'max_attempts': int(os.environ.get('bedrock_max_attempts', '2')),
       'mode': 'standard'
-   }
+   },
+   max_pool_connections = int(os.environ.get('max_concurrency', '8')) + 2
 )
 
 
-bedrock = boto3.client("bedrock")
-bedrock_runtime = boto3.client("bedrock-runtime", config=config)
-ddb = boto3.resource('dynamodb')
-dynamodb = boto3.client('dynamodb')
+# built on first use, so a cold start only pays for the clients its mode needs
+bedrock_runtime = LazyClient(lambda: boto3.client("bedrock-runtime", config=config))
+ddb = LazyClient(lambda: boto3.resource('dynamodb'))
+dynamodb = LazyClient(lambda: boto3.client('dynamodb'))
+s3 = LazyClient(lambda: boto3.client('s3'))
+
+# regions to benchmark side by side, e.g. ["us-east-1", "us-west-2", "us"] ("us"/"eu"/"apac" for the
+# cross-region inference profiles); empty for this function's own region only
+benchmark_regions = ast.literal_eval(os.environ.get('regions', '[]'))
+home_region = os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION')
+# region -> bedrock-runtime client for that region, each with its own connection pool
+region_clients = {home_region: bedrock_runtime}
+
+def runtime_client(region):
+    if region not in region_clients:
+        region_clients.setdefault(region, LazyClient(
+            lambda: boto3.client("bedrock-runtime", region_name=region, config=config)))
+    return region_clients[region]
 
-response_s = dynamodb.scan(
-    TableName=os.environ['prompt_catalog'])
+# read on first use and reused by warm invocations until the catalog version marker changes
+prompt_catalog = CatalogSnapshot(dynamodb, os.environ['prompt_catalog'])
 
-table = ddb.Table(os.environ['benchmark_table'])
+# "s3://bucket/prefix" or a directory: output texts go there once, items only keep their key and length
+output_store = None
+if os.environ.get('output_store'):
+    output_store = OutputStore(backend_for(os.environ['output_store'], s3))
+
+result_writer = BatchResultWriter(ddb, os.environ['benchmark_table'],
+                                  before_flush=output_store.flush if output_store else None)
+# repeated-sample runs update the metric fields of the day's existing rows, sent with the results;
+# a day without a row gets a metrics-only row through result_writer instead
+metric_updates = UpdateBuffer(ddb, os.environ['benchmark_table'],
+                              on_missing=lambda key, values: result_writer.put({**key, **values, "output_unchanged": True}))
 
 model_shape = json.loads(os.environ['model_shape'])
 model_shape = ast.literal_eval(str(model_shape))
@@ -36,179 +85,952 @@ supported_models = ast.literal_eval(supported_models)
 
 today_date = date.today()
 
+max_concurrency = int(os.environ.get('max_concurrency', '8'))
+model_concurrency = ast.literal_eval(os.environ.get('model_concurrency', '{}'))
+default_model_concurrency = int(os.environ.get('default_model_concurrency', '4'))
+
+# category prefixes to benchmark, e.g. ["code_", "reflexion_"]; empty for the whole catalog
+catalog_categories = ast.literal_eval(os.environ.get('catalog_categories', '[]'))
+
+# 'invoke' for a blocking invoke_model, 'stream' for invoke_model_with_response_stream
+invocation_mode = os.environ.get('invocation_mode', 'invoke')
+
+# AIMD token bucket per model: {"initial": rps, "min": rps, "max": rps, "increase": rps, "decrease": factor}
+rate_limit = json.loads(os.environ.get('rate_limit', '{}'))
+model_rate_limits = ast.literal_eval(os.environ.get('model_rate_limits', '{}'))
+max_requeues = int(os.environ.get('max_requeues', '10'))
+
+# rows of history read per pair for the drift check and the cost estimates
+history_depth = int(os.environ.get('history_depth', '3'))
+deadline_margin_ms = int(os.environ.get('deadline_margin_ms', '60000'))
+default_pair_cost_ms = float(os.environ.get('default_pair_cost_ms', '20000'))
+# least time between run ledger checkpoints; each one merges the sketches into the shared day/week/month items
+checkpoint_interval_s = float(os.environ.get('checkpoint_interval_s', '10'))
+
+# pairs per shard and shards in flight when the state machine fans out with a Distributed Map
+shard_size = int(os.environ.get('shard_size', '50'))
+shard_concurrency = int(os.environ.get('shard_concurrency', '10'))
+
+# repeated-sample mode: invocations per pair, of which the first warmup_samples are discarded
+samples_per_pair = int(os.environ.get('samples', '1'))
+warmup_samples = int(os.environ.get('warmup_samples', '0'))
+
+# latency regression check: max growth per quantile over the last complete "week" or "month"
+regression_threshold = json.loads(os.environ.get('regression_threshold', '{"p50": 0.25, "p99": 0.5}'))
+regression_baseline = os.environ.get('regression_baseline', 'week')
+regression_min_count = int(os.environ.get('regression_min_count', '20'))
+
+# span timings for the hot path: printed as CloudWatch EMF metrics and returned as stats.profile.
+# Off by default; the event's "trace" flag overrides it per invocation
+tracing_enabled = os.environ.get('tracing', 'false').lower() == 'true'
+tracer = Tracer(tracing_enabled)
+
+# model_prompt_id -> output_hash of the newest stored row (None if never stored).
+# Both caches only live for one invocation, see reset_caches()
+latest_hashes = {}
+# model_prompt_id -> newest rows as {"model", "latency", "output_tokens"}
+pair_history = {}
+# model_prompt_id -> output_hash of rows buffered in result_writer but not yet written
+pending_hashes = {}
+# dropped_results() at the last checkpoint; more means the results since then were lost
+checkpoint_drops = 0
+
+def dropped_results():
+    # result items and metric updates given up by failed flushes so far
+    return result_writer.dropped + metric_updates.dropped
+
+def reset_caches():
+    # a warm container must not trust hashes from an earlier invocation: their rows may never
+    # have been written, and across shards the caches would grow without bound
+    latest_hashes.clear()
+    pair_history.clear()
+    pending_hashes.clear()
+
+def flush_results():
+    # a new hash only counts as stored once its row is written. The updates go first, since
+    # those on a day without a row turn into new rows
+    metric_updates.flush()
+    result_writer.flush()
+    latest_hashes.update(pending_hashes)
+    pending_hashes.clear()
+
+@tracer.traced("hash")
 def computeMD5hash(my_string):
     m = hashlib.md5()
     m.update(my_string.encode('utf-8'))
     return m.hexdigest()
 
-def get_prompt_result(model_id,body):
-    body = json.dumps(body)
+def latest_output_hash(model_prompt_id, model=None):
+    if model_prompt_id not in latest_hashes:
+        # newest rows for the key: descending on the date range key
+        with tracer.span("history.lookup"):
+            resp = dynamodb.query(
+                TableName=os.environ['benchmark_table'],
+                KeyConditionExpression='model_prompt_id = :id',
+                ExpressionAttributeValues={':id': {'S': model_prompt_id}},
+                ExpressionAttributeNames={'#h': 'output_hash', '#l': 'latency', '#t': 'output_token_count'},
+                ProjectionExpression='#h, #l, #t',
+                ScanIndexForward=False,
+                Limit=history_depth)
+        items = resp.get('Items', [])
+        pair_history[model_prompt_id] = [
+            {"model": model, "latency": float(i['latency']['S']), "output_tokens": int(i['output_token_count']['S'])}
+            for i in items if 'latency' in i and 'output_token_count' in i]
+        latest_hashes[model_prompt_id] = items[0]['output_hash']['S'] if items else None
+    return latest_hashes[model_prompt_id]
+
+def prefetch_history(pairs):
+    # one concurrent pass over the keys, so cost estimates exist before scheduling
+    # and the per-pair drift lookups later are served from latest_hashes
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        list(pool.map(lambda pair: latest_output_hash(pair_id(pair), pair[1]), pairs))
+
+def get_prompt_result(model_id,body,stream=False):
+    with tracer.span("serialize"):
+        body = json.dumps(body)
     print(body)
-    resp = bedrock_runtime.invoke_model(modelId=model_id, body=body)
-    return json.loads(resp['body'].read()), resp
+    # "model@region" endpoints go through that region's client
+    # models without response streaming stay on invoke_model, without a TTFT
+    stream = stream and supports_streaming(model_id)
+    model_id, region = invocation_target(model_id, home_region)
+    client = runtime_client(region)
+    started = time.perf_counter()
+    if stream:
+        with tracer.span("bedrock.call"):
+            result = stream_prompt_result(client, model_id, body)
+    else:
+        with tracer.span("bedrock.call"):
+            resp = client.invoke_model(modelId=model_id, body=body)
+        with tracer.span("bedrock.read"):
+            result = json.loads(resp['body'].read()), resp
+    client_ms = (time.perf_counter() - started) * 1000
+    # what the caller waited, network round trip included; regions are compared on this
+    result[1].setdefault("extra_attributes", {}).update(region=region, client_latency_ms=round(client_ms, 3))
+    if tracer.enabled:
+        # client wall time next to the server's own number: the difference is connection
+        # setup, network, queueing and response parsing
+        server_ms = float(result[1]["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-invocation-latency"])
+        tracer.record("bedrock.server", server_ms)
+        tracer.record("bedrock.overhead", client_ms - server_ms)
+    return result
+
+def decimal(value):
+    # the DynamoDB resource layer rejects floats, also inside lists
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, list):
+        return [decimal(v) for v in value]
+    return value
+
+def decimals(values):
+    return {k: decimal(v) for k, v in values.items() if v is not None}
+
+def output_attributes(text):
+    if output_store is None:
+        return {"output": text}
+    # the location lets the dashboard read the text without being configured for the store
+    return {"output_ref": output_store.put(text), "output_length": len(text),
+            "output_store": os.environ['output_store']}
+
+# item attribute -> response header it is copied from
+HEADER_ATTRIBUTES = {
+    "output_token_count": "x-amzn-bedrock-output-token-count",
+    "latency": "x-amzn-bedrock-invocation-latency",
+    "input_token_count": "x-amzn-bedrock-input-token-count",
+}
+
+def header_attributes(metadata):
+    # batch inference results come without a latency, so only the headers that are there
+    headers = metadata["ResponseMetadata"]["HTTPHeaders"]
+    return {name: headers[header] for name, header in HEADER_ATTRIBUTES.items() if header in headers}
+
+def extra_attributes(metadata):
+    # additional measurements for the item
+    return decimals(metadata.get("extra_attributes", {}))
     
+@tracer.traced("write")
 def put_item_anthropic(model, response, today_date, resp, metadata, model_shape):
-    table.put_item(
-    Item={
+    result_writer.put({
         "model_prompt_id" : model + "_" + response['id'].get('S') ,
         "date" : str(today_date),
-        "output_token_count" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-output-token-count"],
-        "output" : resp["content"][0]["text"],
+        **header_attributes(metadata),
+        **output_attributes(resp["content"][0]["text"]),
         "output_hash" : computeMD5hash(resp["content"][0]["text"]),
         "prompt_model_id" : response['id'].get('S') + "_" + model,
-        "latency" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-invocation-latency"],
         "model_config": str(model_shape),
-        "input_token_count" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-input-token-count"]
+        **extra_attributes(metadata)
     })
 
+@tracer.traced("write")
 def put_item_amazon(model, response, today_date, resp, metadata, model_shape):
-    table.put_item(
-        Item={
+    result_writer.put({
             "model_prompt_id" : model + "_" + response['id'].get('S'),
             "date" : str(today_date),
-            "output_token_count" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-output-token-count"],
-            "output" : resp["results"][0]["outputText"],
+            **header_attributes(metadata),
+            **output_attributes(resp["results"][0]["outputText"]),
             "output_hash" : computeMD5hash(resp["results"][0]["outputText"]),
             "prompt_model_id" : response['id'].get('S') + "_" + model,
-            "latency" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-invocation-latency"],
             "model_config": str(model_shape),
-            "input_token_count" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-input-token-count"],
-            
+            **extra_attributes(metadata)
     })  
 
+@tracer.traced("write")
 def put_item_ai21(model, response, today_date, resp, metadata, model_shape):
-    table.put_item(
-        Item={
+    result_writer.put({
             "model_prompt_id" : model + "_" + response['id'].get('S') ,
             "date" : str(today_date),
-            "output_token_count" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-output-token-count"],
-            "output" : resp["completions"][0]["data"]["text"],
+            **header_attributes(metadata),
+            **output_attributes(resp["completions"][0]["data"]["text"]),
             "output_hash" : computeMD5hash(resp["completions"][0]["data"]["text"]),
             "prompt_model_id" : response['id'].get('S') + "_" + model,
-            "latency" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-invocation-latency"],
             "model_config": str(model_shape),
-            "input_token_count" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-input-token-count"]
+            **extra_attributes(metadata)
     })
     
+@tracer.traced("write")
 def put_item_cohere(model, response, today_date, resp, metadata, model_shape):
-    table.put_item(
-        Item={
+    result_writer.put({
             "model_prompt_id" : model + "_" + response['id'].get('S') ,
             "date" : str(today_date),
-            "output_token_count" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-output-token-count"],
-            "output" : resp["text"],
+            **header_attributes(metadata),
+            **output_attributes(resp["text"]),
             "output_hash" : computeMD5hash(resp["text"]),
             "prompt_model_id" : response['id'].get('S') + "_" + model,
-            "latency" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-invocation-latency"],
             "model_config": str(model_shape),
-            "input_token_count" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-input-token-count"]
+            **extra_attributes(metadata)
     })
 
+@tracer.traced("write")
 def put_item_meta(model, response, today_date, resp, metadata, model_shape): 
-    table.put_item(
-        Item={
+    result_writer.put({
             "model_prompt_id" : model + "_" + response['id'].get('S') ,
             "date" : str(today_date),
-            "output_token_count" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-output-token-count"],
-            "output" : resp["generation"].lstrip(),
+            **header_attributes(metadata),
+            **output_attributes(resp["generation"].lstrip()),
             "output_hash" : computeMD5hash(resp["generation"].lstrip()),
             "prompt_model_id" : response['id'].get('S') + "_" + model,
-            "latency" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-invocation-latency"],
             "model_config": str(model_shape),
-            "input_token_count" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-input-token-count"]
+            **extra_attributes(metadata)
     })
 
+@tracer.traced("write")
 def put_item_mistral(model, response, today_date, resp, metadata, model_shape):
-    table.put_item(
-    Item={
+    result_writer.put({
         "model_prompt_id" : model + "_" + response['id'].get('S') ,
         "date" : str(today_date),
-        "output_token_count" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-output-token-count"],
-        "output" : resp['outputs'][0]['text'],
+        **header_attributes(metadata),
+        **output_attributes(resp['outputs'][0]['text']),
         "output_hash" : computeMD5hash(resp['outputs'][0]['text']),
         "prompt_model_id" : response['id'].get('S') + "_" + model,
-        "latency" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-invocation-latency"],
         "model_config": str(model_shape),
-        "input_token_count" : metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-input-token-count"]
+        **extra_attributes(metadata)
     })
 
-def try_prompts():
-    for response in response_s["Items"]:
-        for model in supported_models:
-            print(f"\tModel: {model}")
-            body = model_shape.copy()
-
-            if model.startswith("anthropic"):
-                body["messages"][0]["content"] = response['prompt'].get('S')
-            elif model.startswith("amazon.titan"):
-                body["inputText"] = response['prompt'].get('S')
-            elif model.startswith("ai21"):
-                body["prompt"] = response['prompt'].get('S')
-            elif model.startswith("cohere.command-r"):
-                body["message"] = response['prompt'].get('S')
-            elif model.startswith("meta"):
-                body["prompt"] = response['prompt'].get('S')
-            elif model.startswith("mistral"):
-                body["prompt"] = response['prompt'].get('S')
-            
-            resp, metadata = get_prompt_result(model, body)
-            
-            data_old = []
-            scan_kwargs = {
-                "FilterExpression": Attr('model_prompt_id').eq(f"{model}_{response['id'].get('S')}")
-            }
-            
-            done = False
-            start_key = None
-            while not done:
-                if start_key:
-                    scan_kwargs["ExclusiveStartKey"] = start_key
-                response_old = table.scan(**scan_kwargs)
-                data_old.extend(response_old.get("Items", []))
-                start_key = response_old.get("LastEvaluatedKey", None)
-                done = start_key is None
-            
-            if model.startswith("anthropic"):
-                if len(data_old) == 0:
-                    put_item_anthropic(model, response, today_date, resp, metadata, model_shape)
-                elif computeMD5hash(resp["content"][0]["text"]) != data_old[-1]['output_hash']:
-                    put_item_anthropic(model, response, today_date, resp, metadata, model_shape)
-    
-            elif model.startswith("amazon.titan"):
-                if len(data_old) == 0:
-                    put_item_amazon(model, response, today_date, resp, metadata, model_shape)
-                elif computeMD5hash(resp["results"][0]["outputText"]) != data_old[-1]['output_hash']:
-                    put_item_amazon(model, response, today_date, resp, metadata, model_shape)
-            
-            elif model.startswith("ai21"):
-                if len(data_old) == 0:
-                    put_item_ai21(model, response, today_date, resp, metadata, model_shape)
-                elif computeMD5hash(resp["completions"][0]["data"]["text"]) != data_old[-1]['output_hash']:
-                    put_item_ai21(model, response, today_date, resp, metadata, model_shape)
-                
-            elif model.startswith("cohere.command-r-v1:0") or model.startswith("cohere.command-r-plus-v1:0"):
-                if len(data_old) == 0:
-                    put_item_cohere(model, response, today_date, resp, metadata, model_shape)
-                elif computeMD5hash(resp["text"]) != data_old[-1]['output_hash']:
-                    put_item_cohere(model, response, today_date, resp, metadata, model_shape)
-
-            elif model.startswith("meta"):
-                if len(data_old) == 0:
-                    put_item_meta(model, response, today_date, resp, metadata, model_shape)
-                elif computeMD5hash(resp["generation"].lstrip()) != data_old[-1]['output_hash']:
-                    put_item_meta(model, response, today_date, resp, metadata, model_shape)
-
-            elif model.startswith("mistral"):
-                if len(data_old) == 0:
-                    put_item_mistral(model, response, today_date, resp, metadata, model_shape)
-                elif computeMD5hash(resp['outputs'][0]['text']) != data_old[-1]['output_hash']:
-                    put_item_mistral(model, response, today_date, resp, metadata, model_shape)
+@tracer.traced("write")
+def put_item_metrics(model, response, today_date, metadata, output_hash):
+    # repeated-sample runs keep the day's latency distribution even when the output did not change.
+    # If the day already has a row, only its metric fields are set, so its output and rating stay;
+    # otherwise the day gets a metrics-only row without the text. Both are buffered with the results
+    key = {"model_prompt_id" : model + "_" + response['id'].get('S'), "date" : str(today_date)}
+    metrics = {
+        **header_attributes(metadata),
+        "output_hash" : output_hash,
+        "prompt_model_id" : response['id'].get('S') + "_" + model,
+        "model_config": str(model_shape),
+        **extra_attributes(metadata)
+    }
+    metric_updates.update(key, metrics)
 
-def lambda_handler(event, context):
+def build_body(model, prompt):
+    # deep copy: the anthropic shape nests the prompt inside a shared list
+    body = copy.deepcopy(model_shape)
+
+    if model.startswith("anthropic"):
+        body["messages"][0]["content"] = prompt
+    elif model.startswith("amazon.titan"):
+        body["inputText"] = prompt
+    elif model.startswith("ai21"):
+        body["prompt"] = prompt
+    elif model.startswith("cohere.command-r"):
+        body["message"] = prompt
+    elif model.startswith("meta"):
+        body["prompt"] = prompt
+    elif model.startswith("mistral"):
+        body["prompt"] = prompt
+    return body
+
+def invoke_pair(pair, stream=False):
+    response, model = pair
+    print(f"\tModel: {model}")
+    body = build_body(model, response['prompt'].get('S'))
+    resp, metadata = get_prompt_result(model, body, stream)
+    return resp, metadata, latest_output_hash(pair_id(pair), model)
+
+def prompt_category(response):
+    # the catalog's category, or the prompt id prefix for items loaded without one
+    return response.get('category', {}).get('S') or response['id'].get('S').rsplit('_', 1)[0]
+
+def observe(run_sketches, model, metadata, category):
+    # every invocation counts towards the sketches, whether or not its output changed. The rollup
+    # metrics are also sketched per category, as "<category>#<metric>"
+    headers = metadata["ResponseMetadata"]["HTTPHeaders"]
+    latency = float(headers["x-amzn-bedrock-invocation-latency"])
+    output_tokens = headers.get("x-amzn-bedrock-output-token-count")
+    values = {
+        "latency": latency,
+        "ttft": metadata.get("extra_attributes", {}).get("ttft_ms"),
+        "input_tokens": headers.get("x-amzn-bedrock-input-token-count"),
+        "output_tokens": output_tokens,
+        "tokens_per_s": float(output_tokens) * 1000 / latency if output_tokens is not None and latency > 0 else None,
+    }
+    sketches = run_sketches.setdefault(model, {})
+    for metric, value in values.items():
+        if value is None:
+            continue
+        sketches.setdefault(metric, DDSketch()).add(value)
+        if metric in ROLLUP_METRICS:
+            sketches.setdefault(category_metric(category, metric), DDSketch()).add(value)
+
+def store_sketches(run_sketches, day):
+    # fold the sketches into the models' day, week and month items; shards and continuations add up there
+    for model, sketches in run_sketches.items():
+        sketches = {metric: sketch for metric, sketch in sketches.items() if sketch.count}
+        for period in periods(day) if sketches else []:
+            merge_into(dynamodb, os.environ['sketch_table'], model, period, sketches)
+
+def checkpoint_results(run_sketches, ledger=None):
+    # results and their sketch observations become durable together, before the ledger marks
+    # their pairs done, so a retry that skips those pairs does not leave the day's sketches short
+    global checkpoint_drops
+    flush_results()
+    if dropped_results() != checkpoint_drops:
+        # a flush since the last checkpoint lost its items: give up the window's sketches and ledger
+        # entries as well, so the retry runs those pairs again and counts them once
+        checkpoint_drops = dropped_results()
+        run_sketches.clear()
+        if ledger is not None:
+            ledger.discard()
+        return
+    if os.environ.get('sketch_table'):
+        store_sketches(run_sketches, today_date)
+        run_sketches.clear()
+
+def check_latency(day, day_sketches):
+    # compare each model's complete day with its baseline; run once per execution, after every shard
+    regressions = []
+    for model, current in day_sketches.items():
+        baseline = load_baseline(dynamodb, os.environ['sketch_table'], model, day, regression_baseline)
+        regressions += find_regressions(model, current, baseline, regression_threshold, regression_min_count)
+    for r in regressions:
+        print(f"LATENCY REGRESSION {r['model_id']} {r['metric']} {r['quantile']}: "
+              f"{r['baseline']} -> {r['current']} ms ({r['change']:+.0%})")
+    return regressions
+
+def sample_settings(options):
+    # (samples, warmup) of an event or state machine input; every pair needs a measured sample
+    samples = int(options.get('samples', samples_per_pair))
+    warmup = int(options.get('warmup_samples', warmup_samples))
+    if samples < 1 or not 0 <= warmup < samples:
+        raise ValueError(f"samples must be at least 1 and warmup_samples between 0 and samples - 1, "
+                         f"got samples={samples}, warmup_samples={warmup}")
+    return samples, warmup
+
+def summarize_samples(results, warmup):
+    # one result standing for all of a pair's measured samples: the last response and token
+    # counts, the median latency, and the latency (and TTFT) distribution as extra attributes
+    resp, metadata, previous_hash = results[-1]
+    latencies = [float(m["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-invocation-latency"]) for _, m, _ in results]
+    ttfts = [m["extra_attributes"]["ttft_ms"] for _, m, _ in results if "ttft_ms" in m.get("extra_attributes", {})]
+    client_latencies = [m["extra_attributes"]["client_latency_ms"] for _, m, _ in results
+                        if "client_latency_ms" in m.get("extra_attributes", {})]
+    metadata = copy.deepcopy(metadata)
+    metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-invocation-latency"] = str(round(statistics.median(latencies)))
+    metadata["extra_attributes"] = {
+        **metadata.get("extra_attributes", {}),
+        **({"client_latency_ms": round(statistics.median(client_latencies), 3)} if client_latencies else {}),
+        **distribution(latencies, "latency"),
+        **distribution(ttfts, "ttft_ms"),
+        "sample_count": len(results),
+        "warmup_count": warmup,
+    }
+    return resp, metadata, previous_hash
+
+def record_result(pair, result, keep_metrics=False):
+    response, model = pair
+    resp, metadata, previous_hash = result
+    model_prompt_id = f"{model}_{response['id'].get('S')}"
+
+    if model.startswith("anthropic"):
+        output_hash = computeMD5hash(resp["content"][0]["text"])
+        if output_hash != previous_hash:
+            put_item_anthropic(model, response, today_date, resp, metadata, model_shape)
+
+    elif model.startswith("amazon.titan"):
+        output_hash = computeMD5hash(resp["results"][0]["outputText"])
+        if output_hash != previous_hash:
+            put_item_amazon(model, response, today_date, resp, metadata, model_shape)
+
+    elif model.startswith("ai21"):
+        output_hash = computeMD5hash(resp["completions"][0]["data"]["text"])
+        if output_hash != previous_hash:
+            put_item_ai21(model, response, today_date, resp, metadata, model_shape)
+
+    elif model.startswith("cohere.command-r-v1:0") or model.startswith("cohere.command-r-plus-v1:0"):
+        output_hash = computeMD5hash(resp["text"])
+        if output_hash != previous_hash:
+            put_item_cohere(model, response, today_date, resp, metadata, model_shape)
+
+    elif model.startswith("meta"):
+        output_hash = computeMD5hash(resp["generation"].lstrip())
+        if output_hash != previous_hash:
+            put_item_meta(model, response, today_date, resp, metadata, model_shape)
+
+    elif model.startswith("mistral"):
+        output_hash = computeMD5hash(resp['outputs'][0]['text'])
+        if output_hash != previous_hash:
+            put_item_mistral(model, response, today_date, resp, metadata, model_shape)
+
+    else:
+        return
+
+    if keep_metrics and output_hash == previous_hash:
+        put_item_metrics(model, response, today_date, metadata, output_hash)
+    pending_hashes[model_prompt_id] = output_hash
+
+def pair_id(pair):
+    response, model = pair
+    return f"{model}_{response['id'].get('S')}"
+
+def endpoint_models(regions=None):
+    # every other region's endpoint is benchmarked as its own "model@region" model. This function's
+    # region keeps the plain model id, so its history and drift check carry on as before
+    if not regions:
+        return list(supported_models)
+    return [model if region == home_region else endpoint(model, region)
+            for model in supported_models for region in regions]
+
+def per_endpoint(settings, models):
+    # an endpoint gets its model's setting, but its own concurrency slots and token bucket
+    return {**settings, **{name: settings[split_endpoint(name)[0]] for name in models
+                           if split_endpoint(name)[0] in settings}}
+
+def invocation_engine(models=()):
+    limiter = AdaptiveRateLimiter(
+        initial=rate_limit.get('initial', 5.0),
+        min_rate=rate_limit.get('min', 0.1),
+        max_rate=rate_limit.get('max', 50.0),
+        increase=rate_limit.get('increase', 0.2),
+        decrease=rate_limit.get('decrease', 0.5),
+        model_rates=per_endpoint(model_rate_limits, models))
+    return InvocationEngine(max_concurrency, per_endpoint(model_concurrency, models), default_model_concurrency,
+                            limiter, max_requeues)
+
+def try_prompts(mode=None, ledger=None, scheduler=None, shard=None, sketches=None, categories=None,
+                samples=1, warmup=0, regions=None, comparison=None):
+    stream = (mode or invocation_mode) == 'stream'
+    with tracer.span("catalog.load"):
+        if shard is not None and shard.get("span"):
+            # only this shard's own prompts
+            prompts = list(iter_span(dynamodb, os.environ['prompt_catalog'], shard["span"]))
+        else:
+            prompts = prompt_catalog.items(categories)
+    models = endpoint_models(regions)
+    pairs = ordered_pairs(prompts, models)
+    if shard is not None:
+        pairs = shard_pairs(pairs, shard, len(prompts))
+
+    skipped = 0
+    if ledger is not None:
+        # resume: leave out pairs an earlier attempt of this run already finished
+        done = ledger.completed()
+        remaining = [pair for pair in pairs if pair_id(pair) not in done]
+        skipped = len(pairs) - len(remaining)
+        pairs = remaining
+        print(f"Run {ledger.run_id}: {skipped} pairs already done, {len(pairs)} to go")
+
+    def handle_pair(pair, result):
+        record_result(pair, result)
+        if sketches is not None:
+            observe(sketches, pair[1], result[1], prompt_category(pair[0]))
+        if comparison is not None:
+            comparison.add(pair[1], result[1])
+        if ledger is not None:
+            ledger.record(pair_id(pair))
 
-    try_prompts()
+    # a pair is recorded once its last sample is in
+    collector = SampleCollector(samples, warmup)
+
+    def handle_sample(task, result):
+        pair, index = task
+        if sketches is not None and index >= warmup:
+            observe(sketches, pair[1], result[1], prompt_category(pair[0]))
+        if comparison is not None and index >= warmup:
+            comparison.add(pair[1], result[1])
+        results = collector.add(pair_id(pair), index, result)
+        if results is not None:
+            record_result(pair, summarize_samples(results, warmup), keep_metrics=True)
+            if ledger is not None:
+                ledger.record(pair_id(pair))
+
+    # longest first, so the slow pairs don't end up alone at the tail of the run
+    prefetch_history(pairs)
+    costs = estimate_costs([(pair_id(pair), pair[1]) for pair in pairs], pair_history, default_pair_cost_ms)
+    pairs.sort(key=lambda pair: costs[pair_id(pair)], reverse=True)
+
+    engine = invocation_engine(models)
+    if samples > 1:
+        # a pair's samples are admitted as one unit, against samples x its cost, when its first
+        # sample comes up; the rest follow without asking. A pair cut off halfway would never be
+        # recorded, and every continuation would start it again
+        admitted = set()
+
+        def admit_sample(task):
+            pair, index = task
+            if index == 0 and (scheduler is None or scheduler.admit(costs[pair_id(pair)] * samples)):
+                admitted.add(pair_id(pair))
+            return pair_id(pair) in admitted
+
+        # interleaved within windows of max_concurrency pairs, so a pair's samples stay within
+        # about samples x its cost of each other
+        stats = engine.run(interleave(pairs, samples, max_concurrency), lambda task: invoke_pair(task[0], stream),
+                           lambda task: task[0][1], handle_sample, admit_sample)
+        deferred = {pair_id(pair) for pair, _ in engine.deferred}
+    else:
+        admit = None
+        if scheduler is not None:
+            admit = lambda pair: scheduler.admit(costs[pair_id(pair)])
+        stats = engine.run(pairs, lambda pair: invoke_pair(pair, stream), lambda pair: pair[1], handle_pair, admit)
+        deferred = {pair_id(pair) for pair in engine.deferred}
+    stats["skipped"] = skipped
+    stats["deferred_pairs"] = sorted(deferred)
+    stats["samples_per_pair"] = samples
+    return stats
+
+def load_test_handler(event, context):
+    model = event.get('model_id', supported_models[0])
+    levels = [int(c) for c in event.get('levels', [1, 2, 4, 8, 16, 32])]
+    duration_s = float(event.get('step_duration_s', 30))
+    prompt_limit = int(event.get('prompt_limit', 20))
+
+    prompts = prompt_catalog.items(event.get('categories') or catalog_categories)
+    bodies = [json.dumps(build_body(model, item['prompt'].get('S'))) for item in prompts[:prompt_limit]]
+    if not bodies:
+        return {'statusCode': 400, 'body': json.dumps('No prompts in the catalog for these categories')}
+    # a ramp that cannot finish before the deadline is refused rather than cut off mid-step
+    budget_s = (DeadlineScheduler(context).remaining_ms() - deadline_margin_ms) / 1000
+    if planned_duration_s(levels, duration_s) > budget_s:
+        return {'statusCode': 400, 'body': json.dumps(
+            f"{len(levels)} levels of {duration_s}s do not fit in the {max(budget_s, 0):.0f}s left; "
+            f"run fewer levels or shorter steps")}
+
+    # no client retries, so throttles show up in the measurements instead of as latency
+    load_client = boto3.client("bedrock-runtime", config=Config(
+        retries={'total_max_attempts': 1},
+        max_pool_connections=max(levels)))
+
+    def invoke(body):
+        resp = load_client.invoke_model(modelId=model, body=body)
+        resp['body'].read()
+
+    run_id = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+    writer = BatchResultWriter(ddb, os.environ['loadtest_table'], key_names=("model_id", "run_step"))
+
+    def store_step(step):
+        writer.put(decimals({
+            "model_id": model,
+            "run_step": f"{run_id}#{step['concurrency']:04d}",
+            "date": str(today_date),
+            "model_config": str(model_shape),
+            **step
+        }))
+        writer.flush()
+
+    print(f"Load test: {model} at {levels}")
+    steps, knee = run_load_test(invoke, bodies, levels, duration_s, on_step=store_step)
+    print(f"Saturation knee: {knee}")
+
+    writer.put(decimals({
+        "model_id": model,
+        "run_step": f"{run_id}#summary",
+        "date": str(today_date),
+        "levels": str(levels),
+        "step_duration_s": duration_s,
+        **knee
+    }))
+    writer.flush()
 
     return {
         'statusCode': 200,
-        'body': json.dumps('Done!')
+        'body': json.dumps({'steps': steps, 'knee': knee})
     }
+
+def plan_handler(event, context):
+    # event['input'] is the state machine input, which may override the shard settings
+    options = event.get('input', {})
+    samples, warmup = sample_settings(options)
+    categories = options.get('categories') or catalog_categories
+    regions = options.get('regions') or benchmark_regions
+    prompts = prompt_catalog.items(categories)
+    pair_count = len(prompts) * len(endpoint_models(regions))
+    shards = plan_shards(pair_count, options.get('shard_size', shard_size), len(prompts))
+    shards = add_spans(shards, prompts, len(endpoint_models(regions)))
+    # one plan per execution and branch: "<execution name>/<function name>.json"
+    name = f"{run_id(event, context).rsplit(':', 1)[-1]}/{getattr(context, 'function_name', 'local')}.json"
+    plan = save_plan(s3, os.environ['plan_location'], name, shards)
+    print(f"Planned {len(shards)} shards for {pair_count} pairs in s3://{plan['bucket']}/{plan['key']}")
+    return {
+        'shard_plan': plan,
+        'shard_count': len(shards),
+        'shard_concurrency': int(options.get('shard_concurrency', shard_concurrency)),
+        'invocation_mode': options.get('invocation_mode') or invocation_mode,
+        'categories': categories,
+        'regions': regions,
+        # passed to every shard through the Map's ItemSelector, and on through its continuations
+        'samples': samples,
+        'warmup_samples': warmup,
+        'trace': bool(options.get('trace', tracing_enabled))
+    }
+
+def rollup_handler(event, context):
+    # per model/day/category latency and token stats for the given dates (default: today), from the
+    # daily sketches every run merges into, so each invocation counts whether or not its output changed
+    dates = event.get('dates') or [str(today_date)]
+    writer = BatchResultWriter(ddb, os.environ['rollup_table'], key_names=("model_id", "date_category"))
+    invocations = 0
+    regressions = []
+    for day in dates:
+        day_sketches = dict(load_day(dynamodb, os.environ['sketch_table'], date.fromisoformat(day)))
+        for model, sketches in day_sketches.items():
+            for item in rollup_items(model, day, sketches):
+                writer.put(item)
+            invocations += sketches["latency"].count if "latency" in sketches else 0
+        regressions += check_latency(date.fromisoformat(day), day_sketches)
+    writer.flush()
+    print(f"Rolled up {invocations} invocations into {writer.written} items for {dates}")
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'dates': dates, 'invocations': invocations, 'rollups': writer.written,
+                            'regressions': regressions})
+    }
+
+def sweep_handler(event, context):
+    # latency over a grid of prompt lengths and output caps per model, fitted to
+    # latency = intercept + prefill * input_tokens + decode * output_tokens.
+    # numpy is only imported here, so the benchmark runs don't pay for it at cold start
+    from sweep import geometric, set_max_output, synthetic_prompt
+
+    models = event.get('models') or supported_models
+    input_sizes = event.get('input_tokens') or geometric(256, int(event.get('max_input_tokens', 32768)), 4)
+    output_caps = event.get('output_tokens') or [16, 128, 512]
+    repeats = int(event.get('repeats', 1))
+    prompts = {size: synthetic_prompt(size) for size in input_sizes}
+    # interleaved like the repeated samples, so drift over the run spreads across the grid
+    tasks = [(model, size, cap) for _ in range(repeats) for size in input_sizes for cap in output_caps
+             for model in models]
+    points = {model: [] for model in models}
+    rejected = {model: [] for model in models}
+    # model -> [{"input_tokens", "output_tokens", "error"}] of the grid points that failed for good
+    failed = {model: [] for model in models}
+
+    def invoke(task):
+        model, size, cap = task
+        body = set_max_output(build_body(model, prompts[size]), model, cap)
+        try:
+            resp = bedrock_runtime.invoke_model(modelId=model, body=json.dumps(body))
+        except ClientError as e:
+            # throttles and transient errors go back to the engine's queue; the others (e.g.
+            # ModelErrorException) only cost this grid point instead of the whole sweep
+            if is_retryable(e):
+                raise
+            return {'error': error_code(e)}
+        resp['body'].read()
+        return resp['ResponseMetadata']['HTTPHeaders']
+
+    def handle(task, headers):
+        model, size, cap = task
+        if headers.get('error') == 'ValidationException':
+            # prompts past the model's context window are left out of its fit
+            rejected[model].append(size)
+            return
+        if 'error' in headers:
+            failed[model].append({'input_tokens': size, 'output_tokens': cap, 'error': headers['error']})
+            return
+        points[model].append((int(headers['x-amzn-bedrock-input-token-count']),
+                              int(headers['x-amzn-bedrock-output-token-count']),
+                              float(headers['x-amzn-bedrock-invocation-latency'])))
+
+    print(f"Latency sweep: {models} over input {input_sizes} and output caps {output_caps}, {repeats}x")
+    scheduler = DeadlineScheduler(context, deadline_margin_ms)
+    try:
+        stats = invocation_engine().run(tasks, invoke, lambda task: task[0], handle,
+                                        lambda task: scheduler.admit(default_pair_cost_ms))
+    finally:
+        # e.g. after requeues ran out, the points measured so far are still fitted and stored
+        fits = store_fits(points, rejected, failed)
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'fits': fits, 'invocations': stats['invocations'], 'deferred': stats['deferred'],
+                            'failed': {model: rows for model, rows in failed.items() if rows}})
+    }
+
+def store_fits(points, rejected, failed):
+    from sweep import fit_latency
+
+    # stored next to the daily rollups, under the "fit" category
+    writer = BatchResultWriter(ddb, os.environ['rollup_table'], key_names=("model_id", "date_category"))
+    fits = {}
+    for model, rows in points.items():
+        if len(rows) < 3:
+            print(f"{model}: {len(rows)} points, not enough for a fit")
+            continue
+        input_tokens, output_tokens, latency = zip(*rows)
+        fits[model] = fit_latency(input_tokens, output_tokens, latency)
+        fits[model]['rejected_input_sizes'] = sorted(set(rejected[model]))
+        fits[model]['failed_points'] = len(failed[model])
+        print(f"{model}: {fits[model]}")
+        if fits[model]['rank'] < 3:
+            # e.g. every output hit the same cap: the split between the terms is not meaningful
+            print(f"{model}: input and output lengths did not vary independently, fit is underdetermined")
+        writer.put(decimals({
+            "model_id": model,
+            "date_category": f"{today_date}#fit",
+            "date": str(today_date),
+            "category": "fit",
+            "model_config": str(model_shape),
+            **fits[model],
+            "sample_input_tokens": list(input_tokens),
+            "sample_output_tokens": list(output_tokens),
+            "sample_latency_ms": list(latency),
+        }))
+    writer.flush()
+    return fits
+
+def batch_submit_handler(event, context):
+    # the catalog x model matrix as batch inference input files, one job per model, instead of
+    # on-demand calls that compete with production traffic for the same quota
+    from batch import MIN_RECORDS_PER_JOB, job_files_for, job_name, write_requests
+
+    location = event.get('batch_location') or os.environ['batch_location']
+    files = job_files_for(location, s3)
+    run = event.get('run_id') or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    prompts = sorted(prompt_catalog.items(event.get('categories') or catalog_categories),
+                     key=lambda item: item['id'].get('S'))
+    # "submit": false only writes the files, e.g. against a local directory
+    submit = event.get('submit', True)
+    bedrock = boto3.client('bedrock') if submit else None
+
+    jobs = []
+    for model in event.get('models') or supported_models:
+        name = job_name(run, model)
+        records = ((item['id'].get('S'), build_body(model, item['prompt'].get('S'))) for item in prompts)
+        job = {'model_id': model, 'job_name': name, **write_requests(files, name, records)}
+        if job['records'] < MIN_RECORDS_PER_JOB:
+            job['status'] = 'TooFewRecords'
+            print(f"{model}: {job['records']} records, a batch job needs at least {MIN_RECORDS_PER_JOB}")
+        elif submit:
+            job['job_arn'] = bedrock.create_model_invocation_job(
+                jobName=name,
+                roleArn=os.environ['batch_role_arn'],
+                modelId=model,
+                inputDataConfig={'s3InputDataConfig': {'s3Uri': files.uri(f"{name}/input/")}},
+                outputDataConfig={'s3OutputDataConfig': {'s3Uri': files.uri(f"{name}/output/")}})['jobArn']
+        print(f"Batch job {name}: {job}")
+        jobs.append(job)
+
+    return {'statusCode': 200, 'batch_location': location, 'jobs': jobs}
+
+def batch_ingest_handler(event, context):
+    # streams the jobs' output files into the benchmark table through the same items and drift
+    # check as on-demand results. Jobs still running are reported back for a later call; jobs that
+    # failed, were stopped or expired are reported with their error and not waited for
+    from batch import (FAILED_STATUSES, FINISHED_STATUSES, batches, job_files_for, read_manifest, read_results,
+                       token_counts)
+
+    files = job_files_for(event.get('batch_location') or os.environ['batch_location'], s3)
+    bedrock = LazyClient(lambda: boto3.client('bedrock'))
+    written = result_writer.written
+    jobs = []
+    for job in event['jobs']:
+        if job.get('status') == 'TooFewRecords':
+            continue
+        if job.get('status') == 'Ingested' or job.get('status') in FAILED_STATUSES:
+            # already in the table from an earlier call, or never will be; ingesting again would only rewrite it
+            jobs.append(job)
+            continue
+        if job.get('job_arn'):
+            state = bedrock.get_model_invocation_job(jobIdentifier=job['job_arn'])
+            status = state['status']
+            if status in FAILED_STATUSES:
+                error = state.get('message') or status
+                print(f"Batch job {job['job_name']} {status}: {error}")
+                jobs.append({**job, 'status': status, 'error': error})
+                continue
+            if status not in FINISHED_STATUSES:
+                jobs.append({**job, 'status': status})
+                continue
+
+        model = job['model_id']
+        record_ids = read_manifest(files, job['job_name'])
+        counts = {'ingested': 0, 'errors': 0}
+        for chunk in batches(read_results(files, job['job_name']), 100):
+            pairs = [({'id': {'S': record_ids[int(record['recordId'])]}}, model) for record in chunk]
+            prefetch_history(pairs)
+            for pair, record in zip(pairs, chunk):
+                if 'modelOutput' not in record:
+                    counts['errors'] += 1
+                    print(f"\tFailed {pair_id(pair)}: {record.get('error')}")
+                    continue
+                input_tokens, output_tokens = token_counts(model, record['modelOutput'])
+                headers = {header: str(value) for header, value in (
+                    ('x-amzn-bedrock-input-token-count', input_tokens),
+                    ('x-amzn-bedrock-output-token-count', output_tokens)) if value is not None}
+                metadata = {'ResponseMetadata': {'HTTPHeaders': headers},
+                            'extra_attributes': {'invocation_mode': 'batch', 'batch_job': job['job_name']}}
+                record_result(pair, (record['modelOutput'], metadata, latest_hashes.get(pair_id(pair))))
+                counts['ingested'] += 1
+            # the lookups are only needed for this chunk, so the caches stay small
+            for pair in pairs:
+                latest_hashes.pop(pair_id(pair), None)
+                pair_history.pop(pair_id(pair), None)
+                pending_hashes.pop(pair_id(pair), None)
+        flush_results()
+        jobs.append({**job, 'status': 'Ingested', **counts})
+        print(f"Batch job {job['job_name']}: {counts}")
+
+    pending = [job for job in jobs if job['status'] != 'Ingested' and job['status'] not in FAILED_STATUSES]
+    failed = [job for job in jobs if job['status'] in FAILED_STATUSES]
+    return {
+        'statusCode': 200,
+        'done': not pending,
+        'jobs': jobs,
+        'pending': pending,
+        'failed': failed,
+        'items_written': result_writer.written - written
+    }
+
+def run_id(event, context=None):
+    # explicit run_id for manual re-runs, otherwise the Step Functions execution id,
+    # otherwise this request's id so a continuation can still pick up from the ledger
+    return (event.get('run_id') or event.get('run', {}).get('execution_id')
+            or getattr(context, 'aws_request_id', None))
+
+def peak_memory_mb():
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def publish_init(context, cold):
+    # every mode reports whether it started the container: under the state machine most containers
+    # start with a plan or rollup invocation, not a benchmark run
+    metrics = {'ColdStart': (int(cold), 'Count')}
+    if cold:
+        metrics['InitDuration'] = (init_ms, 'Milliseconds')
+    dimensions = {'function': getattr(context, 'function_name', None) or 'local'}
+    print(json.dumps(emf_document('BedrockBenchmark', dimensions, metrics)))
+
+def lambda_handler(event, context):
+    global cold_start, checkpoint_drops
+    cold, cold_start = cold_start, False
+    publish_init(context, cold)
+    reset_caches()
+    if event.get('mode') == 'load_test':
+        return load_test_handler(event, context)
+    if event.get('mode') == 'plan':
+        return plan_handler(event, context)
+    if event.get('mode') == 'rollup':
+        return rollup_handler(event, context)
+    if event.get('mode') == 'sweep':
+        return sweep_handler(event, context)
+    if event.get('mode') == 'batch_submit':
+        return batch_submit_handler(event, context)
+    if event.get('mode') == 'batch_ingest':
+        return batch_ingest_handler(event, context)
+
+    # model id -> {metric or "<category>#<metric>": DDSketch} for the invocations since the last checkpoint
+    sketches = {}
+    checkpoint_drops = dropped_results()
+    shard = event.get('shard')
+    ledger = None
+    if run_id(event, context) and os.environ.get('ledger_table'):
+        # one ledger partition per shard keeps each resume lookup small
+        ledger_id = run_id(event, context) + (f"#shard-{shard['shard_id']}" if shard else "")
+        ledger = RunLedger(ddb, dynamodb, os.environ['ledger_table'], ledger_id,
+                           before_checkpoint=lambda: checkpoint_results(sketches, ledger),
+                           min_interval_s=checkpoint_interval_s)
+    scheduler = DeadlineScheduler(context, deadline_margin_ms)
+    regions = event.get('regions') or benchmark_regions
+    comparison = RegionComparison(home_region) if regions else None
+    samples, warmup = sample_settings(event)
+    tracer.enabled = bool(event.get('trace', tracing_enabled))
+    tracer.reset()
+    written, batches = result_writer.written, result_writer.batches
+    try:
+        stats = try_prompts(event.get('invocation_mode'), ledger, scheduler, shard, sketches,
+                            event.get('categories') or catalog_categories,
+                            samples, warmup, regions, comparison)
+    finally:
+        with tracer.span("write.flush"):
+            checkpoint_results(sketches, ledger)
+        if ledger is not None:
+            ledger.checkpoint()
+    stats["items_written"] = result_writer.written - written
+    stats["write_batches"] = result_writer.batches - batches
+    if comparison is not None:
+        stats["regions"] = comparison.summary()
+        for model, row in stats["regions"].items():
+            print(f"Regions {model}: fastest {row['fastest']} by {row['p50_gain_ms']} ms p50, {row['regions']}")
+
+    # cold start cost and memory headroom of this function, next to its throughput
+    stats["init"] = {
+        'function': getattr(context, 'function_name', None),
+        'cold_start': cold,
+        'init_ms': init_ms,
+        'peak_memory_mb': peak_memory_mb(),
+        'memory_limit_mb': int(getattr(context, 'memory_limit_in_mb', 0) or 0)
+    }
+    print(f"Init: {stats['init']}")
+    # the state machine drops the function's output, so the memory high-water mark after the run goes
+    # to CloudWatch as an EMF metric, next to the ColdStart/InitDuration published before dispatch
+    dimensions = {'function': stats['init']['function'] or 'local'}
+    print(json.dumps(emf_document('BedrockBenchmark', dimensions,
+                                  {'PeakMemory': (stats['init']['peak_memory_mb'], 'Megabytes')})))
+
+    if tracer.enabled:
+        for document in tracer.emf('BedrockBenchmark', dimensions):
+            print(json.dumps(document))
+        stats["profile"] = tracer.summary()
+        print(format_profile(stats["profile"]))
+
+    # out of time with work left: hand the state machine an input for the next invocation
+    done = stats["deferred"] == 0 or ledger is None
+    output = {
+        'statusCode': 200,
+        'body': json.dumps('Done!' if done else f"{len(stats['deferred_pairs'])} pairs left"),
+        'stats': stats,
+        'done': done
+    }
+    if stats["deferred"] and ledger is None:
+        # without a ledger a continuation would start over, so the pairs that did not fit are
+        # reported instead of being dropped silently
+        print(f"WARNING: {len(stats['deferred_pairs'])} pairs not run before the deadline and no "
+              f"ledger_table to resume them: {stats['deferred_pairs']}")
+        output['statusCode'] = 206
+        output['body'] = json.dumps(f"{len(stats['deferred_pairs'])} pairs not run, set ledger_table to resume them")
+        output['incomplete'] = True
+    if not done:
+        output['continuation'] = {
+            'run_id': run_id(event, context),
+            'invocation_mode': event.get('invocation_mode') or invocation_mode,
+            'categories': event.get('categories') or catalog_categories,
+            'regions': regions,
+            'samples': samples,
+            'warmup_samples': warmup,
+            'trace': tracer.enabled
+        }
+        if shard:
+            output['continuation']['shard'] = shard
+    return output
+
+# true until the first invocation of this container
+cold_start = True
+init_ms = round((time.perf_counter() - init_started) * 1000, 1)
@@ -0,0 +1,163 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+
+# Bedrock batch inference quotas: records per input file, and the minimum records per job
+RECORDS_PER_FILE = 50000
+MIN_RECORDS_PER_JOB = 100
+
+# job statuses with output to ingest, and the ones a job never leaves without any
+FINISHED_STATUSES = ("Completed", "PartiallyCompleted")
+FAILED_STATUSES = ("Failed", "Stopped", "Expired")
+
+# job names allow letters, digits and hyphens, up to 63 characters
+_JOB_NAME_INVALID = re.compile(r"[^a-zA-Z0-9-]+")
+
+
+def job_name(run, model):
+    return _JOB_NAME_INVALID.sub("-", f"{run}-{model}").strip("-")[:63]
+
+
+class LocalJobFiles:
+    def __init__(self, root):
+        self.root = root
+
+    def uri(self, name):
+        return os.path.join(self.root, name)
+
+    def save(self, name, path):
+        os.makedirs(os.path.dirname(self.uri(name)), exist_ok=True)
+        shutil.move(path, self.uri(name))
+
+    def names(self, prefix):
+        base = self.uri(prefix)
+        found = []
+        for directory, _, files in os.walk(base):
+            found += [os.path.relpath(os.path.join(directory, f), self.root) for f in files]
+        return sorted(found)
+
+    def lines(self, name):
+        with open(self.uri(name), "rb") as f:
+            yield from f
+
+
+class S3JobFiles:
+    def __init__(self, s3, bucket, prefix=""):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    def _key(self, name):
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def uri(self, name):
+        return f"s3://{self.bucket}/{self._key(name)}"
+
+    def save(self, name, path):
+        with open(path, "rb") as f:
+            self.s3.put_object(Bucket=self.bucket, Key=self._key(name), Body=f)
+        os.remove(path)
+
+    def names(self, prefix):
+        kwargs = {"Bucket": self.bucket, "Prefix": self._key(prefix)}
+        found = []
+        while True:
+            resp = self.s3.list_objects_v2(**kwargs)
+            found += [o["Key"][len(self._key("")):] for o in resp.get("Contents", [])]
+            if not resp.get("IsTruncated"):
+                return found
+            kwargs["ContinuationToken"] = resp["NextContinuationToken"]
+
+    def lines(self, name):
+        # streamed line by line from the response body
+        yield from self.s3.get_object(Bucket=self.bucket, Key=self._key(name))["Body"].iter_lines()
+
+
+def job_files_for(location, s3=None):
+    # "s3://bucket/prefix" or a local directory, like the output store
+    if location.startswith("s3://"):
+        bucket, _, prefix = location[len("s3://"):].partition("/")
+        if s3 is None:
+            import boto3
+            s3 = boto3.client("s3")
+        return S3JobFiles(s3, bucket, prefix)
+    return LocalJobFiles(location)
+
+
+def _spool():
+    fd, path = tempfile.mkstemp(suffix=".jsonl")
+    return path, os.fdopen(fd, "w", encoding="utf-8")
+
+
+def write_requests(files, name, records, records_per_file=RECORDS_PER_FILE):
+    # records: iterable of (source id, model input). Lines go to a temporary file and each
+    # finished part is uploaded, so memory holds one record at a time whatever the catalog size.
+    # recordIds are the running index; the manifest maps them back to the source ids
+    manifest_path, manifest = _spool()
+    inputs = []
+    part, path, out = None, None, None
+    count = 0
+    for count, (source_id, model_input) in enumerate(records, start=1):
+        if out is None or (count - 1) % records_per_file == 0:
+            if out is not None:
+                out.close()
+                files.save(part, path)
+            part = f"{name}/input/part-{len(inputs):05d}.jsonl"
+            inputs.append(part)
+            path, out = _spool()
+        record_id = f"{count - 1:011d}"
+        out.write(json.dumps({"recordId": record_id, "modelInput": model_input}) + "\n")
+        manifest.write(json.dumps({"recordId": record_id, "id": source_id}) + "\n")
+    if out is not None:
+        out.close()
+        files.save(part, path)
+    manifest.close()
+    files.save(f"{name}/manifest.jsonl", manifest_path)
+    return {"input_files": inputs, "records": count}
+
+
+def read_manifest(files, name):
+    # the source ids indexed by recordId, which is the running index. This is the one part of a job
+    # held whole in memory: one short id per record, not the records themselves
+    return [row["id"] for row in map(json.loads, files.lines(f"{name}/manifest.jsonl"))]
+
+
+def read_results(files, name):
+    # one output record at a time: {"recordId", "modelOutput"} or {"recordId", "error"}.
+    # The echoed modelInput is dropped right away
+    for result_file in files.names(f"{name}/output/"):
+        if not result_file.endswith(".jsonl.out"):
+            continue
+        for line in files.lines(result_file):
+            if line.strip():
+                record = json.loads(line)
+                record.pop("modelInput", None)
+                yield record
+
+
+def token_counts(model, output):
+    # batch results carry no HTTP headers; the token counts are in some providers' bodies
+    if model.startswith("anthropic"):
+        usage = output.get("usage", {})
+        return usage.get("input_tokens"), usage.get("output_tokens")
+    if model.startswith("amazon.titan"):
+        return output.get("inputTextTokenCount"), (output.get("results") or [{}])[0].get("tokenCount")
+    if model.startswith("meta"):
+        return output.get("prompt_token_count"), output.get("generation_token_count")
+    if model.startswith("cohere"):
+        units = output.get("meta", {}).get("billed_units", {})
+        return units.get("input_tokens"), units.get("output_tokens")
+    return None, None
+
+
+def batches(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
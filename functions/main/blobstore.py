@@ -0,0 +1,162 @@
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+try:
+    import zstandard
+except ImportError:  # zlib still works, just with a lower ratio
+    zstandard = None
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def compress(data):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 9)
+
+
+def decompress(blob):
+    # the frame header tells the codecs apart, so stores written with either stay readable
+    if blob.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this output")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return zlib.decompress(blob)
+
+
+def content_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LocalBackend:
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def write(self, key, blob):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write then rename, so a reader never sees half a blob
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, path)
+
+    def read(self, key):
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+
+class S3Backend:
+    def __init__(self, s3, bucket, prefix=""):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    def _key(self, key):
+        return f"{self.prefix}/{key[:2]}/{key}" if self.prefix else f"{key[:2]}/{key}"
+
+    def exists(self, key):
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def write(self, key, blob):
+        self.s3.put_object(Bucket=self.bucket, Key=self._key(key), Body=blob)
+
+    def read(self, key):
+        return self.s3.get_object(Bucket=self.bucket, Key=self._key(key))["Body"].read()
+
+
+def backend_for(location, s3=None):
+    # "s3://bucket/prefix" or a local directory
+    if location.startswith("s3://"):
+        bucket, _, prefix = location[len("s3://"):].partition("/")
+        if s3 is None:
+            import boto3
+            s3 = boto3.client("s3")
+        return S3Backend(s3, bucket, prefix)
+    return LocalBackend(location)
+
+
+class OutputStore:
+    """Content-addressed, compressed output texts with a read-through LRU cache."""
+
+    def __init__(self, backend, cache_size=256, max_workers=4):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.uploaded = 0
+        self.deduplicated = 0
+        self._cache = OrderedDict()
+        self._known = set()
+        self._uploading = set()
+        self._pending = []
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def put(self, text):
+        # returns the key at once; the upload runs in the background until flush()
+        key = content_key(text)
+        with self._lock:
+            self._remember(key, text)
+            # stored, or on its way in this batch; a failed upload leaves both sets
+            if key in self._known or key in self._uploading:
+                self.deduplicated += 1
+                return key
+            self._uploading.add(key)
+            self._pending.append(self._pool.submit(self._upload, key, text))
+        return key
+
+    def _upload(self, key, text):
+        try:
+            # identical outputs from other runs or dates are already there
+            if self.backend.exists(key):
+                with self._lock:
+                    self.deduplicated += 1
+            else:
+                self.backend.write(key, compress(text.encode("utf-8")))
+                with self._lock:
+                    self.uploaded += 1
+        finally:
+            with self._lock:
+                self._uploading.discard(key)
+        # only now may later puts of the same text skip the upload
+        with self._lock:
+            self._known.add(key)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        text = decompress(self.backend.read(key)).decode("utf-8")
+        with self._lock:
+            self._remember(key, text)
+        return text
+
+    def _remember(self, key, text):
+        self._cache[key] = text
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
@@ -0,0 +1,86 @@
+import threading
+
+# written by the catalog sync after every change; never returned as a prompt
+VERSION_KEY = {"id": {"S": "#catalog"}, "prompt": {"S": "#version"}}
+CATEGORY_INDEX = "category_gsi"
+
+
+def category_of(prefix):
+    # "code_" and "code" both select the code category
+    return prefix.rstrip("_")
+
+
+def iter_catalog(dynamodb, table_name, categories=None):
+    # one page at a time: a category query per selected category, else a scan of the table
+    if categories:
+        requests = [{"TableName": table_name, "IndexName": CATEGORY_INDEX,
+                     "KeyConditionExpression": "category = :c",
+                     "ExpressionAttributeValues": {":c": {"S": category_of(c)}}} for c in categories]
+    else:
+        requests = [{"TableName": table_name}]
+    yield from _pages(dynamodb, requests)
+
+
+def iter_span(dynamodb, table_name, span):
+    # the prompts between span["first"] and span["last"], both (category, id), one id range
+    # query per category on the index. DynamoDB takes a single range condition per query
+    (first_category, first_id), (last_category, last_id) = span["first"], span["last"]
+    requests = []
+    for category in span["categories"]:
+        kwargs = {"TableName": table_name, "IndexName": CATEGORY_INDEX,
+                  "KeyConditionExpression": "category = :c", "ExpressionAttributeValues": {":c": {"S": category}}}
+        if category == first_category and category == last_category:
+            kwargs["KeyConditionExpression"] += " AND id BETWEEN :first AND :last"
+        elif category == first_category:
+            kwargs["KeyConditionExpression"] += " AND id >= :first"
+        elif category == last_category:
+            kwargs["KeyConditionExpression"] += " AND id <= :last"
+        if category == first_category:
+            kwargs["ExpressionAttributeValues"][":first"] = {"S": first_id}
+        if category == last_category:
+            kwargs["ExpressionAttributeValues"][":last"] = {"S": last_id}
+        requests.append(kwargs)
+    yield from _pages(dynamodb, requests)
+
+
+def _pages(dynamodb, requests):
+    for kwargs in requests:
+        operation = dynamodb.query if "KeyConditionExpression" in kwargs else dynamodb.scan
+        while True:
+            resp = operation(**kwargs)
+            for item in resp.get("Items", []):
+                if not item["id"]["S"].startswith("#"):
+                    yield item
+            if "LastEvaluatedKey" not in resp:
+                break
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def catalog_version(dynamodb, table_name):
+    resp = dynamodb.get_item(TableName=table_name, Key=VERSION_KEY, ProjectionExpression="version")
+    return resp.get("Item", {}).get("version", {}).get("N")
+
+
+class CatalogSnapshot:
+    """The prompt catalog as of a version marker, kept across warm invocations."""
+
+    def __init__(self, dynamodb, table_name):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.loads = 0
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def items(self, categories=None):
+        # one cheap GetItem per call; the table is only read again after the marker moves.
+        # Without a marker (catalog never synced) every call reloads.
+        key = tuple(sorted(category_of(c) for c in categories or []))
+        version = catalog_version(self.dynamodb, self.table_name)
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is None or version is None or snapshot[0] != version:
+                snapshot = (version, list(iter_catalog(self.dynamodb, self.table_name, key)))
+                self._snapshots[key] = snapshot
+                self.loads += 1
+                print(f"Loaded {len(snapshot[1])} prompts (catalog version {version}, categories {list(key) or 'all'})")
+            return snapshot[1]
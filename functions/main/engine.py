@@ -0,0 +1,114 @@
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ratelimit import is_retryable, is_throttle
+
+
+class InvocationEngine:
+    """Runs invocations on a thread pool, capping in-flight calls per model id."""
+
+    def __init__(self, max_workers, model_limits=None, default_limit=4, limiter=None, max_requeues=10):
+        self.max_workers = max(1, int(max_workers))
+        self.model_limits = model_limits or {}
+        self.default_limit = max(1, int(default_limit))
+        self.limiter = limiter
+        self.max_requeues = int(max_requeues)
+        # tasks that admit() turned away, for the caller to hand to a later run
+        self.deferred = []
+
+    def limit(self, model_id):
+        return max(1, int(self.model_limits.get(model_id, self.default_limit)))
+
+    def _call(self, invoke, model_id, task):
+        if self.limiter is None:
+            return invoke(task)
+        self.limiter.acquire(model_id)
+        try:
+            result = invoke(task)
+        except Exception as e:
+            if is_throttle(e):
+                self.limiter.on_throttle(model_id)
+            raise
+        self.limiter.on_success(model_id)
+        return result
+
+    def _next_model(self, queues, in_flight):
+        # the model with spare capacity whose next task comes earliest in the given order
+        best = None
+        for model_id, queue in queues.items():
+            if queue and in_flight.get(model_id, 0) < self.limit(model_id):
+                if best is None or queue[0][0] < queues[best][0][0]:
+                    best = model_id
+        return best
+
+    def run(self, tasks, invoke, key, handle, admit=None):
+        # invoke runs on the pool; handle runs on the calling thread so the
+        # drift check and writes for each pair stay sequential. Tasks are
+        # started in the order given, as far as the per-model caps allow.
+        stats = {"invocations": 0, "failures": 0, "requeued": 0}
+        errors = []
+        start = time.perf_counter()
+
+        queues = {}
+        for index, task in enumerate(tasks):
+            queues.setdefault(key(task), deque()).append((index, task, 0))
+        in_flight = {}
+        pending = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+
+            def fill():
+                while len(pending) < self.max_workers:
+                    model_id = self._next_model(queues, in_flight)
+                    if model_id is None:
+                        return
+                    index, task, requeues = queues[model_id].popleft()
+                    if admit is not None and not admit(task):
+                        self.deferred.append(task)
+                        continue
+                    in_flight[model_id] = in_flight.get(model_id, 0) + 1
+                    pending[pool.submit(self._call, invoke, model_id, task)] = (index, task, requeues)
+
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, task, requeues = pending.pop(future)
+                    model_id = key(task)
+                    in_flight[model_id] -= 1
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if is_retryable(e) and requeues < self.max_requeues:
+                            # throttled or transient: put the pair back instead of failing it
+                            stats["requeued"] += 1
+                            queues[model_id].appendleft((index, task, requeues + 1))
+                            continue
+                        stats["failures"] += 1
+                        errors.append(e)
+                        print(f"\tFailed {model_id}: {e!r}")
+                        continue
+                    stats["invocations"] += 1
+                    try:
+                        handle(task, result)
+                    except Exception as e:
+                        stats["failures"] += 1
+                        errors.append(e)
+                        print(f"\tFailed {model_id}: {e!r}")
+                fill()
+
+        elapsed = time.perf_counter() - start
+        stats["deferred"] = len(self.deferred)
+        stats["elapsed_s"] = round(elapsed, 3)
+        stats["throughput"] = round(stats["invocations"] / elapsed, 3) if elapsed > 0 else 0.0
+        print(f"Invocations: {stats['invocations']} in {stats['elapsed_s']}s "
+              f"({stats['throughput']} inv/s, {stats['failures']} failed, {stats['requeued']} requeued, "
+              f"{stats['deferred']} deferred)")
+        if self.limiter is not None:
+            stats["rate_limiter"] = self.limiter.metrics()
+            print(f"Rate limiter: {stats['rate_limiter']}")
+
+        if errors:
+            raise errors[0]
+        return stats
@@ -0,0 +1,23 @@
+import math
+
+
+def percentile(values, q):
+    # linear interpolation between closest ranks, q in [0, 100]
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100.0
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return ordered[low]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values, prefix, quantiles=(50, 90, 99)):
+    summary = {}
+    for q in quantiles:
+        value = percentile(values, q)
+        if value is not None:
+            summary[f"{prefix}_p{q}"] = round(value, 3)
+    return summary
@@ -0,0 +1,63 @@
+import time
+
+from writer import BatchResultWriter
+
+
+class RunLedger:
+    """Records completed (model, prompt) pairs per run so retries can skip them."""
+
+    def __init__(self, ddb, dynamodb, table_name, run_id, before_checkpoint=None, batch_size=25, ttl_days=14,
+                 min_interval_s=0):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.run_id = run_id
+        # called before every checkpoint so results are durable before their pairs are marked done
+        self.before_checkpoint = before_checkpoint
+        self.batch_size = batch_size
+        self.ttl_days = ttl_days
+        # a batch waits until this long after the previous checkpoint, so each checkpoint (and the
+        # sketch merges before it) covers more pairs
+        self.min_interval_s = min_interval_s
+        self._checkpointed_at = time.monotonic()
+        self.writer = BatchResultWriter(ddb, table_name, key_names=("run_id", "pair_id"))
+        self.recorded = 0
+        self._pending = []
+
+    def completed(self):
+        done = set()
+        kwargs = {
+            "TableName": self.table_name,
+            "KeyConditionExpression": "run_id = :run",
+            "ExpressionAttributeValues": {":run": {"S": self.run_id}},
+            "ProjectionExpression": "pair_id",
+        }
+        while True:
+            resp = self.dynamodb.query(**kwargs)
+            done.update(item["pair_id"]["S"] for item in resp.get("Items", []))
+            if "LastEvaluatedKey" not in resp:
+                return done
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    def record(self, pair_id):
+        self._pending.append(pair_id)
+        if (len(self._pending) >= self.batch_size
+                and time.monotonic() - self._checkpointed_at >= self.min_interval_s):
+            self.checkpoint()
+
+    def discard(self):
+        # forget the pairs recorded since the last checkpoint, so a retry runs them again
+        self._pending = []
+
+    def checkpoint(self):
+        if not self._pending:
+            return
+        if self.before_checkpoint:
+            # may discard() the pending pairs when their results could not be made durable
+            self.before_checkpoint()
+        expires_at = int(time.time()) + self.ttl_days * 86400
+        for pair_id in self._pending:
+            self.writer.put({"run_id": self.run_id, "pair_id": pair_id, "expires_at": expires_at})
+        self.writer.flush()
+        self.recorded += len(self._pending)
+        self._pending = []
+        self._checkpointed_at = time.monotonic()
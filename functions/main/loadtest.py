@@ -0,0 +1,94 @@
+import itertools
+import threading
+import time
+
+from latency import percentile
+from ratelimit import is_throttle
+
+
+def run_step(invoke, bodies, concurrency, duration_s):
+    # closed loop: each worker sends its next request as soon as the previous one returns
+    if not bodies:
+        raise ValueError("A load test step needs at least one request body")
+    deadline = time.perf_counter() + duration_s
+    cycle = itertools.cycle(bodies)
+    cycle_lock = threading.Lock()
+    latencies = []
+    counts = {"requests": 0, "throttles": 0, "errors": 0}
+    results_lock = threading.Lock()
+
+    def worker():
+        while time.perf_counter() < deadline:
+            with cycle_lock:
+                body = next(cycle)
+            start = time.perf_counter()
+            outcome = "ok"
+            try:
+                invoke(body)
+            except Exception as e:
+                outcome = "throttles" if is_throttle(e) else "errors"
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with results_lock:
+                counts["requests"] += 1
+                if outcome == "ok":
+                    latencies.append(elapsed_ms)
+                else:
+                    counts[outcome] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_s = time.perf_counter() - started
+
+    requests = counts["requests"]
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(wall_s, 3),
+        "requests": requests,
+        "successes": len(latencies),
+        "rps": round(len(latencies) / wall_s, 3) if wall_s > 0 else 0.0,
+        "latency_p50_ms": round(percentile(latencies, 50), 3) if latencies else None,
+        "latency_p90_ms": round(percentile(latencies, 90), 3) if latencies else None,
+        "latency_p99_ms": round(percentile(latencies, 99), 3) if latencies else None,
+        "throttle_rate": round(counts["throttles"] / requests, 4) if requests else 0.0,
+        "error_rate": round(counts["errors"] / requests, 4) if requests else 0.0,
+    }
+
+
+def find_knee(steps, min_gain=0.1, max_throttle_rate=0.05, max_error_rate=0.05):
+    # the knee is the last level that still bought throughput without throttling or errors
+    knee = None
+    for step in steps:
+        if step["throttle_rate"] > max_throttle_rate or step["error_rate"] > max_error_rate:
+            break
+        if knee is not None and step["rps"] < knee["rps"] * (1 + min_gain):
+            break
+        knee = step
+    saturated = knee is not steps[-1] if steps else False
+    return {
+        "knee_concurrency": knee["concurrency"] if knee else None,
+        "knee_rps": knee["rps"] if knee else None,
+        "saturated": saturated,
+    }
+
+
+def planned_duration_s(levels, duration_s, cooldown_s=0):
+    return len(levels) * (duration_s + cooldown_s)
+
+
+def run_load_test(invoke, bodies, levels, duration_s, cooldown_s=0, on_step=None):
+    # on_step(step) is called as each level finishes, so its summary is kept even if a later one is cut short
+    steps = []
+    for concurrency in levels:
+        print(f"\tConcurrency {concurrency} for {duration_s}s")
+        step = run_step(invoke, bodies, concurrency, duration_s)
+        print(f"\t{step}")
+        steps.append(step)
+        if on_step:
+            on_step(step)
+        if cooldown_s:
+            time.sleep(cooldown_s)
+    return steps, find_knee(steps)
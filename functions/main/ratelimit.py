@@ -0,0 +1,104 @@
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+THROTTLE_CODES = ("ThrottlingException", "TooManyRequestsException", "ServiceQuotaExceededException")
+TRANSIENT_CODES = ("ModelTimeoutException", "ModelNotReadyException", "ServiceUnavailableException",
+                   "InternalServerException")
+
+
+def error_code(exc):
+    if isinstance(exc, ClientError):
+        return exc.response.get("Error", {}).get("Code")
+    return None
+
+
+def is_throttle(exc):
+    return error_code(exc) in THROTTLE_CODES
+
+
+def is_retryable(exc):
+    return error_code(exc) in THROTTLE_CODES + TRANSIENT_CODES
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = self.capacity()
+        self.updated = time.monotonic()
+        self.waited_s = 0.0
+        self.lock = threading.Lock()
+
+    def capacity(self):
+        # roughly one second's worth of requests, never less than one
+        return self.burst if self.burst else max(1.0, self.rate)
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity(), self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                self.waited_s += wait
+            time.sleep(wait)
+
+
+class AdaptiveRateLimiter:
+    """Per-model token buckets whose rate follows AIMD on throttling feedback."""
+
+    def __init__(self, initial=2.0, min_rate=0.1, max_rate=50.0, increase=0.1, decrease=0.5, model_rates=None):
+        self.initial = float(initial)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.increase = float(increase)
+        self.decrease = float(decrease)
+        self.model_rates = model_rates or {}
+        self._buckets = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, model_id):
+        with self._lock:
+            if model_id not in self._buckets:
+                rate = float(self.model_rates.get(model_id, self.initial))
+                self._buckets[model_id] = TokenBucket(min(self.max_rate, max(self.min_rate, rate)))
+                self._counts[model_id] = {"successes": 0, "throttles": 0, "min_rate": rate, "max_rate": rate}
+            return self._buckets[model_id]
+
+    def acquire(self, model_id):
+        self.bucket(model_id).acquire()
+
+    def _adjust(self, model_id, rate, outcome):
+        bucket = self.bucket(model_id)
+        with bucket.lock:
+            bucket.rate = min(self.max_rate, max(self.min_rate, rate(bucket.rate)))
+            bucket.tokens = min(bucket.tokens, bucket.capacity())
+            new_rate = bucket.rate
+        with self._lock:
+            counts = self._counts[model_id]
+            counts[outcome] += 1
+            counts["min_rate"] = min(counts["min_rate"], new_rate)
+            counts["max_rate"] = max(counts["max_rate"], new_rate)
+
+    def on_success(self, model_id):
+        self._adjust(model_id, lambda r: r + self.increase, "successes")
+
+    def on_throttle(self, model_id):
+        self._adjust(model_id, lambda r: r * self.decrease, "throttles")
+
+    def metrics(self):
+        with self._lock:
+            return {
+                model_id: {
+                    "rate": round(bucket.rate, 3),
+                    "waited_s": round(bucket.waited_s, 3),
+                    **{k: round(v, 3) if isinstance(v, float) else v for k, v in self._counts[model_id].items()},
+                }
+                for model_id, bucket in self._buckets.items()
+            }
@@ -0,0 +1,78 @@
+import threading
+
+from latency import summarize
+
+# a "model@region" endpoint benchmarks the model through that region's bedrock-runtime
+ENDPOINT_SEPARATOR = "@"
+
+# geography prefixes of the cross-region inference profiles, e.g. "us.anthropic.claude-3-haiku-...".
+# A region entry like "us" invokes the profile from this function's own region
+INFERENCE_PROFILE_GEOS = ("us", "eu", "apac")
+
+
+def endpoint(model, region):
+    return f"{model}{ENDPOINT_SEPARATOR}{region}"
+
+
+def split_endpoint(name):
+    model, _, region = name.partition(ENDPOINT_SEPARATOR)
+    return model, region or None
+
+
+def invocation_target(name, home_region):
+    # (modelId, region of the client to call it through)
+    model, region = split_endpoint(name)
+    if region in INFERENCE_PROFILE_GEOS:
+        return f"{region}.{model}", home_region
+    return model, region or home_region
+
+
+class RegionComparison:
+    """Latency and output throughput of one run per model and region.
+
+    Regions are ranked on the latency the client observed, which includes the network round
+    trip; the server-side invocation latency header does not and is reported next to it.
+    """
+
+    def __init__(self, home_region):
+        self.home_region = home_region
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, metadata):
+        model, region = split_endpoint(name)
+        headers = metadata["ResponseMetadata"]["HTTPHeaders"]
+        extra = metadata.get("extra_attributes", {})
+        server_ms = float(headers["x-amzn-bedrock-invocation-latency"])
+        sample = (float(extra.get("client_latency_ms", server_ms)), server_ms,
+                  int(headers["x-amzn-bedrock-output-token-count"]), extra.get("ttft_ms"))
+        with self._lock:
+            self._samples.setdefault(model, {}).setdefault(region or self.home_region, []).append(sample)
+
+    def summary(self):
+        with self._lock:
+            samples = {model: {region: list(s) for region, s in regions.items()}
+                       for model, regions in self._samples.items()}
+        comparison = {}
+        for model, regions in sorted(samples.items()):
+            rows = {}
+            for region, values in sorted(regions.items()):
+                latencies = [latency for latency, _, _, _ in values]
+                server_latencies = [server for _, server, _, _ in values]
+                ttfts = [ttft for _, _, _, ttft in values if ttft is not None]
+                rows[region] = {
+                    "count": len(values),
+                    **summarize(latencies, "latency"),
+                    **summarize(server_latencies, "server_latency", (50, 90)),
+                    **summarize(ttfts, "ttft_ms", (50, 90)),
+                    # generated tokens per second of server time, summed over the run
+                    "output_tokens_per_s": round(sum(t for _, _, t, _ in values) * 1000 / sum(server_latencies), 3)
+                    if sum(server_latencies) > 0 else None,
+                }
+            ranked = sorted(rows, key=lambda region: rows[region]["latency_p50"])
+            comparison[model] = {
+                "regions": rows,
+                "fastest": ranked[0],
+                "p50_gain_ms": round(rows[ranked[-1]]["latency_p50"] - rows[ranked[0]]["latency_p50"], 3),
+            }
+        return comparison
@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+# every model/day also gets a row across all categories under this name
+ALL_CATEGORIES = "all"
+
+QUANTILES = (50, 90, 99)
+
+# per-invocation values the benchmark runs sketch for each model, overall and per category
+ROLLUP_METRICS = ("latency", "input_tokens", "output_tokens", "tokens_per_s")
+
+
+def category_metric(category, metric):
+    # sketch attribute of one metric within one category, e.g. "code#latency"
+    return f"{category}#{metric}"
+
+
+def split_categories(sketches):
+    # {category: {metric: sketch}} out of a day item, with the model-wide sketches under "all"
+    by_category = {}
+    for name, sketch in sketches.items():
+        category, _, metric = name.rpartition("#")
+        by_category.setdefault(category or ALL_CATEGORIES, {})[metric] = sketch
+    return by_category
+
+
+def _number(value):
+    return Decimal(str(round(float(value), 3)))
+
+
+def summarize(sketches):
+    # count, means, totals and quantiles from the sketches' counts and sums; quantiles are
+    # within the sketches' relative error (1%)
+    latency = sketches.get("latency")
+    if latency is None or not latency.count:
+        return None
+    row = {"count": latency.count, "latency_mean": _number(latency.mean())}
+    for q in QUANTILES:
+        row[f"latency_p{q}"] = _number(latency.quantile(q))
+    for name in ("input_tokens", "output_tokens"):
+        sketch = sketches.get(name)
+        if sketch is not None and sketch.count:
+            row[f"{name}_mean"] = _number(sketch.mean())
+            row[f"{name}_total"] = int(round(sketch.sum))
+    tokens_per_s = sketches.get("tokens_per_s")
+    if tokens_per_s is not None and tokens_per_s.count:
+        row["tokens_per_s_mean"] = _number(tokens_per_s.mean())
+        for q in QUANTILES:
+            row[f"tokens_per_s_p{q}"] = _number(tokens_per_s.quantile(q))
+    return row
+
+
+def rollup_items(model_id, day, sketches):
+    # typed numeric items for the rollup table, keyed by model_id and "date#category"
+    items = []
+    for category, metrics in sorted(split_categories(sketches).items()):
+        row = summarize(metrics)
+        if row is None:
+            continue
+        items.append({
+            "model_id": model_id,
+            "date_category": f"{day}#{category}",
+            "date": str(day),
+            "category": category,
+            **row,
+        })
+    return items
@@ -0,0 +1,47 @@
+import statistics
+import threading
+
+from latency import summarize
+
+
+def interleave(pairs, samples, window=None):
+    # round-major within windows of `window` pairs: every pair's first sample before any pair's
+    # second in its window, so a pair's samples are not back to back. The windows bound how far
+    # apart they get, so a run cut short by its deadline still leaves whole pairs behind
+    window = window or len(pairs) or 1
+    return [(pair, index) for start in range(0, len(pairs), window)
+            for index in range(samples) for pair in pairs[start:start + window]]
+
+
+def distribution(values, prefix):
+    # compact per-pair summary plus the raw samples, which stay small for a handful of repeats
+    if not values:
+        return {}
+    return {
+        f"{prefix}_samples": [round(v, 3) for v in values],
+        f"{prefix}_min": round(min(values), 3),
+        f"{prefix}_max": round(max(values), 3),
+        f"{prefix}_mean": round(statistics.fmean(values), 3),
+        f"{prefix}_stddev": round(statistics.pstdev(values), 3),
+        **summarize(values, prefix, (50, 90)),
+    }
+
+
+class SampleCollector:
+    """Gathers the repeated samples of each pair and releases the pair once all have arrived."""
+
+    def __init__(self, samples, warmup):
+        self.samples = samples
+        self.warmup = warmup
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, index, result):
+        with self._lock:
+            results = self._results.setdefault(key, {})
+            results[index] = result
+            if len(results) < self.samples:
+                return None
+            del self._results[key]
+        # warmup samples are the first ones sent for the pair, not the first ones to finish
+        return [results[i] for i in sorted(results) if i >= self.warmup]
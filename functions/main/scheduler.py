@@ -0,0 +1,53 @@
+import math
+
+
+def estimate_costs(pair_ids, history, default_ms):
+    # expected ms per pair: its usual output length times its model's ms per output
+    # token, else its own mean latency, else its model's mean latency, else default_ms.
+    # history maps pair id -> [{"model": ..., "latency": ms, "output_tokens": n}, ...]
+    per_model = {}
+    for rows in history.values():
+        for row in rows:
+            totals = per_model.setdefault(row["model"], {"latency": 0.0, "tokens": 0, "rows": 0})
+            totals["latency"] += row["latency"]
+            totals["tokens"] += row["output_tokens"]
+            totals["rows"] += 1
+
+    costs = {}
+    for pair_id, model in pair_ids:
+        rows = history.get(pair_id, [])
+        totals = per_model.get(model)
+        if rows and totals and totals["tokens"]:
+            tokens = sum(r["output_tokens"] for r in rows) / len(rows)
+            costs[pair_id] = tokens * totals["latency"] / totals["tokens"]
+        elif rows:
+            costs[pair_id] = sum(r["latency"] for r in rows) / len(rows)
+        elif totals:
+            costs[pair_id] = totals["latency"] / totals["rows"]
+        else:
+            costs[pair_id] = default_ms
+    return costs
+
+
+class DeadlineScheduler:
+    """Admits work only while the Lambda has time left to finish it."""
+
+    def __init__(self, context, margin_ms=60000):
+        self.context = context
+        self.margin_ms = margin_ms
+        self.admitted = 0
+
+    def remaining_ms(self):
+        if self.context is None or not hasattr(self.context, "get_remaining_time_in_millis"):
+            return math.inf
+        return self.context.get_remaining_time_in_millis()
+
+    def admit(self, cost_ms):
+        budget_ms = self.remaining_ms() - self.margin_ms
+        if budget_ms <= 0:
+            return False
+        # the first pair always goes, so every invocation makes progress
+        if cost_ms <= budget_ms or self.admitted == 0:
+            self.admitted += 1
+            return True
+        return False
@@ -0,0 +1,67 @@
+import json
+
+
+def prompt_key(item):
+    # (category, id) is the order of the category_gsi index, so the prompts of any
+    # contiguous range of pairs are one id range per category
+    return (item.get('category', {}).get('S', ''), item['id'].get('S'))
+
+
+def ordered_pairs(catalog_items, models):
+    # a stable order over the catalog x models matrix, so a shard's index range
+    # names the same pairs in the planner and in the shard's own invocation.
+    # Models vary fastest, which spreads every model across every shard.
+    items = sorted(catalog_items, key=prompt_key)
+    return [(item, model) for item in items for model in models]
+
+
+def plan_shards(pair_count, shard_size, catalog_size):
+    shard_size = max(1, int(shard_size))
+    return [
+        {"shard_id": shard_id, "start": start, "end": min(start + shard_size, pair_count), "catalog_size": catalog_size}
+        for shard_id, start in enumerate(range(0, pair_count, shard_size))
+    ]
+
+
+def add_spans(shards, catalog_items, model_count):
+    # the (category, id) bounds of the prompts behind each shard's pair range, so the shard
+    # queries just those prompts instead of reading the whole catalog. Prompts without a
+    # category are not in the index; then the shards fall back to the full catalog
+    items = sorted(catalog_items, key=prompt_key)
+    if not all(prompt_key(item)[0] for item in items):
+        return shards
+    for shard in shards:
+        first, last = shard["start"] // model_count, (shard["end"] - 1) // model_count
+        keys = [prompt_key(item) for item in items[first:last + 1]]
+        shard["span"] = {
+            "first": list(keys[0]),
+            "last": list(keys[-1]),
+            "categories": sorted({category for category, _ in keys}),
+            "prompts": len(keys),
+            # index of the span's first pair in the whole matrix
+            "offset": first * model_count,
+        }
+    return shards
+
+
+def shard_pairs(pairs, shard, catalog_size):
+    # pairs covers the whole catalog, or only the shard's span when it has one
+    span = shard.get("span")
+    expected = span["prompts"] if span else shard.get("catalog_size")
+    if expected not in (None, catalog_size):
+        print(f"Catalog changed since planning ({expected} -> {catalog_size} prompts)")
+    offset = span["offset"] if span else 0
+    return pairs[shard["start"] - offset:shard["end"] - offset]
+
+
+def save_plan(s3, location, name, shards):
+    # the shard list goes to "s3://bucket/prefix/<name>" as one JSON array, which the Distributed
+    # Map's ItemReader reads, so the plan never passes through the 256 KB state payload
+    bucket, _, prefix = location[len("s3://"):].partition("/")
+    key = "/".join(part for part in (prefix.strip("/"), name) if part)
+    s3.put_object(Bucket=bucket, Key=key, Body=json.dumps(shards, separators=(",", ":")).encode("utf-8"))
+    return {"bucket": bucket, "key": key}
+
+
+def load_plan(s3, plan):
+    return json.loads(s3.get_object(Bucket=plan["bucket"], Key=plan["key"])["Body"].read())
@@ -0,0 +1,195 @@
+import json
+import math
+import random
+import time
+from datetime import timedelta
+
+from botocore.exceptions import ClientError
+
+# the sketched metrics where growth is a regression; token counts and throughput are not
+REGRESSION_METRICS = ("latency", "ttft")
+
+
+class DDSketch:
+    """Quantile sketch with relative error alpha; sketches merge by adding bucket counts."""
+
+    def __init__(self, alpha=0.01, max_bins=2048):
+        self.alpha = alpha
+        self.max_bins = max_bins
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        # bucket k holds values in (gamma^(k-1), gamma^k]
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value, weight=1):
+        if value is None:
+            return
+        value = float(value)
+        if value <= 1e-9:
+            self.zero_count += weight
+        else:
+            k = math.ceil(math.log(value) / self.log_gamma)
+            self.bins[k] = self.bins.get(k, 0) + weight
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        self.count += weight
+        self.sum += value * weight
+
+    def _collapse(self):
+        # fold the lowest buckets together; the high quantiles keep their accuracy
+        keys = sorted(self.bins)
+        extra = keys[:len(keys) - self.max_bins + 1]
+        target = keys[len(extra)]
+        self.bins[target] += sum(self.bins.pop(k) for k in extra)
+
+    def merge(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError(f"Cannot merge sketches with alpha {self.alpha} and {other.alpha}")
+        for k, c in other.bins.items():
+            self.bins[k] = self.bins.get(k, 0) + c
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        return self
+
+    def quantile(self, q):
+        # q in [0, 100], like latency.percentile
+        if self.count == 0:
+            return None
+        rank = (self.count - 1) * q / 100.0
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for k in sorted(self.bins):
+            seen += self.bins[k]
+            if rank < seen:
+                return 2 * self.gamma ** k / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def to_json(self):
+        # dense counts from the lowest bucket up: a few hundred ints for latencies from 10 ms to 100 s
+        low = min(self.bins) if self.bins else 0
+        high = max(self.bins) if self.bins else -1
+        return json.dumps({"a": self.alpha, "z": self.zero_count, "n": self.count, "s": round(self.sum, 3),
+                           "o": low, "b": [self.bins.get(k, 0) for k in range(low, high + 1)]},
+                          separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text, max_bins=2048):
+        data = json.loads(text)
+        sketch = cls(data["a"], max_bins)
+        sketch.bins = {data["o"] + i: c for i, c in enumerate(data["b"]) if c}
+        sketch.zero_count = data["z"]
+        sketch.count = data["n"]
+        sketch.sum = data["s"]
+        return sketch
+
+
+def day_period(day):
+    return f"day#{day}"
+
+
+def week_period(day):
+    year, week, _ = day.isocalendar()
+    return f"week#{year}-W{week:02d}"
+
+
+def month_period(day):
+    return f"month#{day:%Y-%m}"
+
+
+def periods(day):
+    # the daily item plus the ISO week and calendar month it rolls into
+    return [day_period(day), week_period(day), month_period(day)]
+
+
+def baseline_period(day, span="week"):
+    # the last complete ISO week or calendar month before `day`
+    if span == "month":
+        return month_period(day.replace(day=1) - timedelta(days=1))
+    return week_period(day - timedelta(days=day.isoweekday()))
+
+
+def merge_into(dynamodb, table_name, model_id, period, sketches, max_attempts=10, base_delay=0.02, max_delay=2.0):
+    # read-merge-write guarded by a version number, since shards of one run update the same items
+    for attempt in range(max_attempts):
+        resp = dynamodb.get_item(TableName=table_name, Key={"model_id": {"S": model_id}, "period": {"S": period}})
+        item = resp.get("Item", {})
+        version = int(item["version"]["N"]) if "version" in item else 0
+        merged = {}
+        for metric, sketch in sketches.items():
+            merged[metric] = DDSketch.from_json(item[metric]["S"]) if metric in item else DDSketch(sketch.alpha)
+            merged[metric].merge(sketch)
+        new_item = dict(item, model_id={"S": model_id}, period={"S": period}, version={"N": str(version + 1)})
+        new_item.update({metric: {"S": sketch.to_json()} for metric, sketch in merged.items()})
+        try:
+            if version:
+                dynamodb.put_item(TableName=table_name, Item=new_item, ConditionExpression="version = :v",
+                                  ExpressionAttributeValues={":v": {"N": str(version)}})
+            else:
+                dynamodb.put_item(TableName=table_name, Item=new_item, ConditionExpression="attribute_not_exists(model_id)")
+            return merged
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
+            # exponential backoff with full jitter, so shards that collided do not collide again
+            time.sleep(random.uniform(0, min(max_delay, base_delay * (2 ** attempt))))
+    raise RuntimeError(f"Could not update sketch {model_id} {period} after {max_attempts} attempts")
+
+
+def _sketches(item):
+    return {metric: DDSketch.from_json(value["S"]) for metric, value in item.items()
+            if metric not in ("model_id", "period", "version")}
+
+
+def load_day(dynamodb, table_name, day):
+    # (model id, sketches) of every model benchmarked on `day`, through the period index
+    kwargs = {
+        "TableName": table_name,
+        "IndexName": "period_gsi",
+        "KeyConditionExpression": "#p = :p",
+        "ExpressionAttributeNames": {"#p": "period"},
+        "ExpressionAttributeValues": {":p": {"S": day_period(day)}},
+    }
+    while True:
+        resp = dynamodb.query(**kwargs)
+        for item in resp.get("Items", []):
+            yield item["model_id"]["S"], _sketches(item)
+        if "LastEvaluatedKey" not in resp:
+            return
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def load_baseline(dynamodb, table_name, model_id, day, span="week"):
+    # the model's sketches of the last complete week or month before `day`: one item, however
+    # many days it holds
+    resp = dynamodb.get_item(TableName=table_name,
+                             Key={"model_id": {"S": model_id}, "period": {"S": baseline_period(day, span)}})
+    return _sketches(resp.get("Item", {}))
+
+
+def find_regressions(model_id, current, baseline, thresholds, min_count=20):
+    # quantiles of `current` that grew more than thresholds[f"p{q}"] (a fraction) over the baseline
+    regressions = []
+    for metric, sketch in current.items():
+        if metric not in REGRESSION_METRICS:
+            continue
+        base = baseline.get(metric)
+        if base is None or sketch.count < min_count or base.count < min_count:
+            continue
+        for name, threshold in thresholds.items():
+            q = float(name.lstrip("p"))
+            before, now = base.quantile(q), sketch.quantile(q)
+            if before and now > before * (1 + threshold):
+                regressions.append({"model_id": model_id, "metric": metric, "quantile": name,
+                                    "baseline": round(before, 3), "current": round(now, 3),
+                                    "change": round(now / before - 1, 3)})
+    return regressions
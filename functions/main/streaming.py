@@ -0,0 +1,90 @@
+import json
+import time
+
+from latency import summarize
+
+# Bedrock has no response streaming for Jurassic-2; stream mode invokes these with invoke_model
+NON_STREAMING_MODELS = ("ai21",)
+
+
+def supports_streaming(model_id):
+    return not model_id.startswith(NON_STREAMING_MODELS)
+
+
+def chunk_text(model_id, chunk):
+    if model_id.startswith("anthropic"):
+        if chunk.get("type") == "content_block_delta":
+            return chunk["delta"].get("text", "")
+        return chunk.get("completion", "")
+    elif model_id.startswith("amazon.titan"):
+        return chunk.get("outputText", "")
+    elif model_id.startswith("cohere.command-r"):
+        if chunk.get("event_type") == "text-generation":
+            return chunk.get("text", "")
+        return ""
+    elif model_id.startswith("meta"):
+        return chunk.get("generation", "")
+    elif model_id.startswith("mistral"):
+        return "".join(o.get("text", "") for o in chunk.get("outputs", []))
+    return ""
+
+
+def response_shape(model_id, text):
+    # same shape invoke_model returns, so the put_item_* writers and drift check stay unchanged
+    if model_id.startswith("anthropic"):
+        return {"content": [{"type": "text", "text": text}]}
+    elif model_id.startswith("amazon.titan"):
+        return {"results": [{"outputText": text}]}
+    elif model_id.startswith("cohere.command-r"):
+        return {"text": text}
+    elif model_id.startswith("meta"):
+        return {"generation": text}
+    elif model_id.startswith("mistral"):
+        return {"outputs": [{"text": text}]}
+    return {}
+
+
+def stream_prompt_result(bedrock_runtime, model_id, body):
+    start = time.perf_counter()
+    resp = bedrock_runtime.invoke_model_with_response_stream(modelId=model_id, body=body)
+
+    parts = []
+    chunk_times = []
+    invocation_metrics = {}
+    for event in resp["body"]:
+        if "chunk" not in event:
+            continue
+        chunk = json.loads(event["chunk"]["bytes"])
+        invocation_metrics = chunk.get("amazon-bedrock-invocationMetrics", invocation_metrics)
+        text = chunk_text(model_id, chunk)
+        if text:
+            parts.append(text)
+            chunk_times.append(time.perf_counter())
+    end = time.perf_counter()
+
+    duration_ms = (end - start) * 1000
+    ttft_ms = (chunk_times[0] - start) * 1000 if chunk_times else duration_ms
+    gaps_ms = [(b - a) * 1000 for a, b in zip(chunk_times, chunk_times[1:])]
+    output_tokens = int(invocation_metrics.get("outputTokenCount", 0))
+    decode_s = (duration_ms - ttft_ms) / 1000
+
+    # the streaming response carries no token/latency headers; rebuild them from the
+    # invocation metrics sent with the final chunk so metadata looks like invoke_model's
+    headers = dict(resp.get("ResponseMetadata", {}).get("HTTPHeaders", {}))
+    headers["x-amzn-bedrock-input-token-count"] = str(invocation_metrics.get("inputTokenCount", 0))
+    headers["x-amzn-bedrock-output-token-count"] = str(output_tokens)
+    headers["x-amzn-bedrock-invocation-latency"] = str(invocation_metrics.get("invocationLatency", round(duration_ms)))
+
+    stream_metrics = {
+        "ttft_ms": round(ttft_ms, 3),
+        "stream_duration_ms": round(duration_ms, 3),
+        "chunk_count": len(chunk_times),
+        "output_tokens_per_s": round(output_tokens / decode_s, 3) if decode_s > 0 else None,
+    }
+    stream_metrics.update(summarize(gaps_ms, "inter_chunk_ms"))
+
+    metadata = {
+        "ResponseMetadata": {**resp.get("ResponseMetadata", {}), "HTTPHeaders": headers},
+        "extra_attributes": {k: v for k, v in stream_metrics.items() if v is not None},
+    }
+    return response_shape(model_id, "".join(parts)), metadata
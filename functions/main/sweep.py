@@ -0,0 +1,63 @@
+import numpy as np
+
+# filler with roughly one token per word for every provider's tokenizer
+FILLER_WORDS = ("alpha", "river", "stone", "light", "paper", "green", "music", "field", "cloud", "table",
+                "north", "glass", "horse", "bread", "chair", "ocean", "metal", "sugar", "plant", "train")
+
+
+def geometric(low, high, factor=2):
+    # low, low*factor, ... up to and including high
+    sizes = []
+    size = low
+    while size < high:
+        sizes.append(int(size))
+        size *= factor
+    return sizes + [int(high)]
+
+
+def synthetic_prompt(input_tokens):
+    words = " ".join(FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(max(0, input_tokens - 24)))
+    # the instruction asks for more text than any output cap, so the cap decides the output length
+    return (f"{words}\n\nIgnore the words above. Write a long, detailed story about a lighthouse keeper, "
+            f"at least 5000 words.")
+
+
+def set_max_output(body, model, max_tokens):
+    # stop sequences would end the output early, so only the cap decides its length
+    for config in (body, body.get("textGenerationConfig", {})):
+        for field in ("stop_sequences", "stopSequences"):
+            if field in config:
+                config[field] = []
+    if model.startswith("amazon.titan"):
+        body["textGenerationConfig"]["maxTokenCount"] = max_tokens
+    elif model.startswith("ai21"):
+        body["maxTokens"] = max_tokens
+    elif model.startswith("meta"):
+        body["max_gen_len"] = max_tokens
+    else:
+        # anthropic, cohere and mistral
+        body["max_tokens"] = max_tokens
+    return body
+
+
+def fit_latency(input_tokens, output_tokens, latency_ms):
+    # least squares for latency = intercept + prefill * input_tokens + decode * output_tokens
+    x = np.column_stack([np.ones(len(latency_ms)), np.asarray(input_tokens, dtype=float),
+                         np.asarray(output_tokens, dtype=float)])
+    y = np.asarray(latency_ms, dtype=float)
+    coef, _, rank, _ = np.linalg.lstsq(x, y, rcond=None)
+    residual = y - x @ coef
+    total = ((y - y.mean()) ** 2).sum()
+    return {
+        "intercept_ms": float(coef[0]),
+        "prefill_ms_per_token": float(coef[1]),
+        "decode_ms_per_token": float(coef[2]),
+        "r2": float(1 - (residual ** 2).sum() / total) if total > 0 else 1.0,
+        "rmse_ms": float(np.sqrt((residual ** 2).mean())),
+        "points": int(len(y)),
+        "rank": int(rank),
+    }
+
+
+def predict_latency(fit, input_tokens, output_tokens):
+    return fit["intercept_ms"] + fit["prefill_ms_per_token"] * input_tokens + fit["decode_ms_per_token"] * output_tokens
@@ -0,0 +1,133 @@
+import functools
+import math
+import threading
+import time
+
+from latency import percentile
+
+# CloudWatch takes at most 100 values per metric in one EMF document
+EMF_MAX_VALUES = 100
+
+
+class _NoSpan:
+    """Shared do-nothing span handed out while tracing is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class _Span:
+    """Times one block of code and records it on the tracer."""
+
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class Tracer:
+    """Collects wall-time spans by name for one run; a flag check and nothing else when disabled."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        if not self.enabled:
+            return NO_SPAN
+        return _Span(self, name)
+
+    def traced(self, name):
+        # decorator form of span for whole functions
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Span(self, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record(self, name, ms):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._spans.setdefault(name, []).append(ms)
+
+    def reset(self):
+        with self._lock:
+            self._spans = {}
+
+    def _snapshot(self):
+        with self._lock:
+            return {name: list(values) for name, values in sorted(self._spans.items())}
+
+    def summary(self):
+        summary = {}
+        for name, values in self._snapshot().items():
+            summary[name] = {
+                "count": len(values),
+                "total_ms": round(sum(values), 3),
+                "mean_ms": round(sum(values) / len(values), 3),
+                "p50_ms": round(percentile(values, 50), 3),
+                "p99_ms": round(percentile(values, 99), 3),
+                "max_ms": round(max(values), 3),
+            }
+        return summary
+
+    def emf(self, namespace, dimensions):
+        # CloudWatch embedded metric format: each document printed to the log becomes one
+        # datapoint per value, so CloudWatch can compute percentiles across invocations
+        spans = self._snapshot()
+        chunks = max((math.ceil(len(v) / EMF_MAX_VALUES) for v in spans.values()), default=0)
+        timestamp = int(time.time() * 1000)
+        documents = []
+        for i in range(chunks):
+            values = {name: [round(v, 3) for v in vs[i * EMF_MAX_VALUES:(i + 1) * EMF_MAX_VALUES]]
+                      for name, vs in spans.items() if len(vs) > i * EMF_MAX_VALUES}
+            documents.append(emf_document(namespace, dimensions,
+                                          {name: (vs, "Milliseconds") for name, vs in values.items()}, timestamp))
+        return documents
+
+
+def emf_document(namespace, dimensions, metrics, timestamp=None):
+    # one CloudWatch embedded metric format document; metrics maps name -> (value or values, unit)
+    return {
+        "_aws": {
+            "Timestamp": timestamp or int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": namespace,
+                "Dimensions": [sorted(dimensions)],
+                "Metrics": [{"Name": name, "Unit": unit} for name, (_, unit) in metrics.items()],
+            }],
+        },
+        **dimensions,
+        **{name: value for name, (value, _) in metrics.items()},
+    }
+
+
+def format_profile(summary):
+    # one line per span, largest total first, for reading a local run at a glance. Totals are
+    # summed over threads and spans nest (hash inside write), so they don't add up to the wall time
+    lines = [f"{'span':<20}{'count':>8}{'total ms':>12}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+    for name, s in sorted(summary.items(), key=lambda item: item[1]["total_ms"], reverse=True):
+        lines.append(f"{name:<20}{s['count']:>8}{s['total_ms']:>12.1f}{s['mean_ms']:>10.3f}"
+                     f"{s['p50_ms']:>10.3f}{s['p99_ms']:>10.3f}{s['max_ms']:>10.3f}")
+    return "\n".join(lines)
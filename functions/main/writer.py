@@ -0,0 +1,132 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+# BatchWriteItem accepts at most 25 put requests per call
+MAX_BATCH_SIZE = 25
+
+
+class BatchResultWriter:
+    """Buffers benchmark items and writes them with BatchWriteItem."""
+
+    def __init__(self, ddb, table_name, batch_size=MAX_BATCH_SIZE, max_retries=8, base_delay=0.05,
+                 key_names=("model_prompt_id", "date"), before_flush=None):
+        self.ddb = ddb
+        self.table_name = table_name
+        self.batch_size = min(int(batch_size), MAX_BATCH_SIZE)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.key_names = key_names
+        # called before every batch goes out, e.g. so the blobs an item points to exist first
+        self.before_flush = before_flush
+        self.written = 0
+        self.batches = 0
+        # items given up by a flush that raised: before_flush failed, or a batch could not be written
+        self.dropped = 0
+        self._buffer = {}
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        with self._lock:
+            # a batch may not hold the same key twice; the newest row wins
+            self._buffer[tuple(item.get(k) for k in self.key_names)] = item
+            if len(self._buffer) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        # the buffer is taken first: if before_flush fails, its items are dropped with the error
+        # instead of going out with the next flush, e.g. pointing to blobs that were never written
+        items = list(self._buffer.values())
+        self._buffer = {}
+        written = self.written
+        try:
+            if items and self.before_flush:
+                self.before_flush()
+            for i in range(0, len(items), self.batch_size):
+                self._write_batch(items[i:i + self.batch_size])
+        except Exception:
+            # every item not written is counted, including the batches after a failed one
+            self.dropped += len(items) - (self.written - written)
+            raise
+
+    def _write_batch(self, items):
+        requests = [{"PutRequest": {"Item": item}} for item in items]
+        attempt = 0
+        while requests:
+            resp = self.ddb.batch_write_item(RequestItems={self.table_name: requests})
+            self.batches += 1
+            unprocessed = resp.get("UnprocessedItems", {}).get(self.table_name, [])
+            self.written += len(requests) - len(unprocessed)
+            requests = unprocessed
+            if requests:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise RuntimeError(f"{len(requests)} items still unprocessed after {self.max_retries} retries")
+                # exponential backoff with full jitter
+                time.sleep(random.uniform(0, self.base_delay * (2 ** attempt)))
+
+
+class UpdateBuffer:
+    """Buffers UpdateItem calls on existing items and sends them concurrently on flush.
+
+    Each update only sets the given attributes, on the condition that the item exists. When it
+    does not, on_missing(key, values) is called instead, e.g. to write a new item.
+    """
+
+    def __init__(self, ddb, table_name, batch_size=MAX_BATCH_SIZE, max_workers=8, on_missing=None):
+        self.ddb = ddb
+        self.table_name = table_name
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.on_missing = on_missing
+        self.updated = 0
+        # updates given up by a flush that raised
+        self.dropped = 0
+        self._buffer = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, values):
+        with self._lock:
+            # the newest values win for the same key
+            self._buffer[tuple(key.items())] = (key, values)
+            if len(self._buffer) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        updates = list(self._buffer.values())
+        self._buffer = {}
+        if not updates:
+            return
+        table = self.ddb.Table(self.table_name)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(updates))) as pool:
+            futures = [pool.submit(self._update, table, key, values) for key, values in updates]
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        self.updated += len(updates) - len(errors)
+        if errors:
+            self.dropped += len(errors)
+            raise errors[0]
+
+    def _update(self, table, key, values):
+        names = {f"#m{i}": name for i, name in enumerate(values)}
+        try:
+            table.update_item(
+                Key=key,
+                UpdateExpression="SET " + ", ".join(f"#m{i} = :m{i}" for i in range(len(values))),
+                ConditionExpression=f"attribute_exists({next(iter(key))})",
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues={f":m{i}": value for i, value in enumerate(values.values())})
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException" or not self.on_missing:
+                raise
+            self.on_missing(key, values)
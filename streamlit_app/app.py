@@ -2,73 +2,59 @@ import streamlit as st
 import pandas as pd
 from datetime import timedelta, datetime
 import boto3
+import os
+from data import BenchmarkStore, load_rollups, scan_all
 
 ddb = boto3.resource('dynamodb')
 dynamodb = boto3.client('dynamodb')
 
+# seconds a cached copy of the tables is reused before checking for new items
+CACHE_TTL = 300
+
+# local directory or s3:// prefix written by history.py; the trend then comes from raw Parquet rows
+HISTORY_PATH = os.environ.get('HISTORY_PATH')
+
+@st.cache_data(ttl=CACHE_TTL)
 def fetch_prompts():
     prompt_table = ddb.Table('bedrockbenchmarkprompts')
 
-    prompts = prompt_table.scan()
-
-    df = pd.json_normalize(prompts['Items'])
+    df = pd.json_normalize(list(scan_all(prompt_table)))
 
     return df
 
-def fetch_data():
-    
-    table = ddb.Table('bedrockbenchmark')
+@st.cache_resource
+def benchmark_store():
+    # shared across reruns and sessions; refresh() only pulls items newer than the last seen date
+    return BenchmarkStore('bedrockbenchmark', ttl_s=CACHE_TTL, output_store=os.environ.get('OUTPUT_STORE'))
 
-    response = table.scan()
-
-    data = response['Items']
-    while 'LastEvaluatedKey' in response:
-        response = table.scan(
-            ExclusiveStartKey=response['LastEvaluatedKey']
-            )
-    data.extend(response['Items'])
-    
-    df = pd.json_normalize(response['Items'])
-
-    if 'Rating' in df.columns:
-        df1 = df.drop(columns=['output_hash', 'output_token_count', 'input_token_count', 'prompt_model_id', 'Rating'])
-    else:
-        df1 = df.drop(columns=['output_hash', 'output_token_count', 'input_token_count', 'prompt_model_id'])
+def fetch_data():
 
-    df2 = df['model_prompt_id'].str.split('_', n=1, expand=True)
-    df2.columns = ['model','prompt']
-    
-    df3 = pd.concat([df1,df2], axis=1)
+    store = benchmark_store()
+    store.refresh()
 
-    df4 = df3.copy()
-    
-    df4 = df4.drop_duplicates(subset=['date', 'model', 'prompt']).reset_index(drop=True)
+    return store.frame()
 
-    df4['date']= pd.to_datetime(df4['date'])
-    
-    
-    # get the latest record per model/prompt category
-    latest_records = df4.sort_values(by=['date'], ascending=False).groupby(['model','prompt']).nth(0)
-    latest_records.reset_index(inplace=True)
-    latest_records = latest_records.sort_values(by=['prompt', 'model'])
-    latest_records['output'] = latest_records['output'].str.replace('\n', ' ')
 
-    unique_values = latest_records['model_prompt_id'].values
-    
-    # get the prior record per model/prompt category
-    latest_records_1 = df4.sort_values(by=['date'], ascending=False).groupby(['model','prompt']).nth(1)
-    latest_records_1.reset_index(inplace=True)
+@st.cache_data(ttl=CACHE_TTL)
+def fetch_rollups(model_id, since):
+    return load_rollups(ddb.Table('bedrockbenchmarkrollup'), model_id, since)
 
-    # only for the records in the latest dataframe (above)
-    latest_records_1 = latest_records_1[latest_records_1['model_prompt_id'].isin(unique_values)]
+@st.cache_data(ttl=CACHE_TTL)
+def fetch_history(model_id, since):
+    from history import read_history
+    df = read_history(HISTORY_PATH, models=[model_id], start=since, columns=['date', 'latency'])
+    daily = df.groupby('date')['latency'].quantile([0.5, 0.9, 0.99]).unstack()
+    daily.columns = ['latency_p50', 'latency_p90', 'latency_p99']
+    daily.index = pd.to_datetime(daily.index)
+    return daily
 
-    latest_records_1 = latest_records_1.sort_values(by=['prompt', 'model'])
-    latest_records_1['output'] = latest_records_1['output'].str.replace('\n', ' ')
-    
-    result = pd.merge(latest_records, latest_records_1[['prompt','model','date','output']], on=["model","prompt"])
-    result.drop(columns=['model_config', 'model_prompt_id'], inplace=True)
-    
-    return result
+def show_trend(model_id):
+    # latency trend for the model on screen, from the Parquet export if there is one, else the per-day rollups
+    since = datetime.today().date() - timedelta(days=30)
+    rollups = fetch_history(model_id, since) if HISTORY_PATH else fetch_rollups(model_id, since)
+    if len(rollups):
+        st.sidebar.write(f"{model_id}: latency over the last 30 days (ms)")
+        st.sidebar.line_chart(rollups[['latency_p50', 'latency_p90', 'latency_p99']])
 
 
 def put_item(key, new_attributes):
@@ -154,18 +140,24 @@ def main():
         
         # Display old and new responsess
         st.write("model: ", df.iloc[st.session_state.row_index, 0])
+        show_trend(df.iloc[st.session_state.row_index, 0])
         st.write(f"{st.session_state.row_index+1} out of {len(df)}")
         
 
         col1.markdown(prompts[prompts.id == df.iloc[st.session_state.row_index, 1] ]['prompt'].values[0], unsafe_allow_html=True)
 
+        output_x, output_y = benchmark_store().row_outputs(df, st.session_state.row_index)
+        if benchmark_store().outputs.unresolved:
+            st.warning("Some outputs are only stored in the output store and their items don't name it. "
+                       "Set OUTPUT_STORE to the stack's outputstore output to read them.")
+
         with col2:
             row1.header("latest response")
-            row1.markdown(df.loc[st.session_state.row_index, "output_x"], unsafe_allow_html=True)
+            row1.markdown(output_x, unsafe_allow_html=True)
 
             row2.header("previous response")
             if (df.date_x != df.date_y).all():
-                row2.markdown(df.iloc[st.session_state.row_index, df.columns.get_loc("output_y")], unsafe_allow_html=True)
+                row2.markdown(output_y, unsafe_allow_html=True)
             else:
                 row2.markdown("no prior evaluation exist yet", unsafe_allow_html=True)
             
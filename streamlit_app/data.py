@@ -0,0 +1,248 @@
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import boto3
+import pandas as pd
+from boto3.dynamodb.conditions import Attr, Key
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# beyond this many days since the last refresh, one filtered scan beats a query per day
+MAX_QUERY_DAYS = 31
+
+# everything the dashboard lists; the output texts are fetched per row on demand
+METADATA_PROJECTION = {
+    'ProjectionExpression': '#k, #d, #h, #l, #i, #o, #u',
+    'ExpressionAttributeNames': {'#k': 'model_prompt_id', '#d': 'date', '#h': 'output_hash', '#l': 'latency',
+                                 '#i': 'input_token_count', '#o': 'output_token_count', '#u': 'output_unchanged'},
+}
+
+
+def scan_all(table, **kwargs):
+    # every page of a scan, not just the last one
+    while True:
+        response = table.scan(**kwargs)
+        yield from response['Items']
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def query_all(table, **kwargs):
+    while True:
+        response = table.query(**kwargs)
+        yield from response['Items']
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def load_rollups(table, model_id, since, category='all'):
+    # one item per day from the rollup table instead of every raw result since that day
+    items = query_all(table, KeyConditionExpression=Key('model_id').eq(model_id) & Key('date_category').gte(str(since)))
+    df = pd.DataFrame([i for i in items if i['category'] == category])
+    if len(df) == 0:
+        return df
+    df['date'] = pd.to_datetime(df['date'])
+    numeric = [c for c in df.columns if c not in ('model_id', 'date_category', 'date', 'category')]
+    df[numeric] = df[numeric].astype(float)
+    return df.set_index('date').sort_index()
+
+
+class BlobReader:
+    """Reads outputs from the content-addressed store the benchmark functions write to (output_store)."""
+
+    def __init__(self, location):
+        self.location = location
+        if location.startswith('s3://'):
+            self.bucket, _, self.prefix = location[len('s3://'):].partition('/')
+            self.s3 = boto3.client('s3')
+
+    def read(self, key):
+        if self.location.startswith('s3://'):
+            path = f"{self.prefix.strip('/')}/{key[:2]}/{key}".lstrip('/')
+            blob = self.s3.get_object(Bucket=self.bucket, Key=path)['Body'].read()
+        else:
+            with open(os.path.join(self.location, key[:2], key), 'rb') as f:
+                blob = f.read()
+        if blob.startswith(b'\x28\xb5\x2f\xfd'):
+            return zstandard.ZstdDecompressor().decompress(blob).decode('utf-8')
+        return zlib.decompress(blob).decode('utf-8')
+
+
+# shown in place of a referenced output whose store location is unknown
+MISSING_STORE_TEXT = "*(output stored in the output store as {ref}; set OUTPUT_STORE to the stack's outputstore output to read it)*"
+
+
+class OutputCache:
+    """Small LRU of output texts keyed by (model_prompt_id, date), filled with BatchGetItem.
+
+    Items written with an output store only carry output_ref, and the store's location as
+    output_store; their text is read from there, or from output_store given here for older items.
+    """
+
+    def __init__(self, table, maxsize=32, output_store=None):
+        self.table = table
+        self.output_store = output_store
+        self.maxsize = maxsize
+        # outputs that could not be read because no store location was known
+        self.unresolved = 0
+        self._readers = {}
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._prefetcher = ThreadPoolExecutor(max_workers=1)
+
+    def get_many(self, keys):
+        with self._lock:
+            missing = [k for k in keys if k not in self._items]
+        if missing:
+            self._load(missing)
+        with self._lock:
+            for k in keys:
+                self._items.move_to_end(k)
+            return [self._items[k] for k in keys]
+
+    def prefetch(self, keys):
+        self._prefetcher.submit(self.get_many, keys)
+
+    def _text(self, item):
+        if 'output_ref' not in item:
+            return item.get('output', '')
+        location = item.get('output_store') or self.output_store
+        if not location:
+            with self._lock:
+                self.unresolved += 1
+            return MISSING_STORE_TEXT.format(ref=item['output_ref'])
+        if location not in self._readers:
+            self._readers[location] = BlobReader(location)
+        return self._readers[location].read(item['output_ref'])
+
+    def _load(self, keys):
+        request = {
+            'Keys': [{'model_prompt_id': k, 'date': d} for k, d in dict.fromkeys(keys)],
+            'ProjectionExpression': '#k, #d, #out, #ref, #st',
+            'ExpressionAttributeNames': {'#k': 'model_prompt_id', '#d': 'date', '#out': 'output', '#ref': 'output_ref',
+                                         '#st': 'output_store'},
+        }
+        found = {}
+        request_items = {self.table.name: request}
+        while request_items:
+            response = self.table.meta.client.batch_get_item(RequestItems=request_items)
+            for item in response['Responses'].get(self.table.name, []):
+                found[(item['model_prompt_id'], item['date'])] = self._text(item)
+            request_items = response.get('UnprocessedKeys') or {}
+        with self._lock:
+            for k in keys:
+                self._items[k] = found.get(k, '')
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+
+class BenchmarkStore:
+    """Latest and previous result per (model, prompt), kept up to date incrementally.
+
+    The first refresh scans the table once; later refreshes only query the
+    date index for the days since the newest date already seen. Only key,
+    date and metric attributes are read; output texts go through OutputCache.
+    """
+
+    def __init__(self, table_name='bedrockbenchmark', date_index='date_gsi', ttl_s=300, output_store=None):
+        self.table = boto3.resource('dynamodb').Table(table_name)
+        self.date_index = date_index
+        self.ttl_s = ttl_s
+        # (model, prompt) -> [latest, previous] items, newest first
+        self.top2 = {}
+        self.last_date = None
+        self.refreshed_at = 0.0
+        self._frame = None
+        self._lock = threading.Lock()
+        self.outputs = OutputCache(self.table, output_store=output_store)
+
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and time.time() - self.refreshed_at < self.ttl_s:
+                return False
+            if self.last_date is None:
+                items = scan_all(self.table, **METADATA_PROJECTION)
+            else:
+                items = self._items_since(self.last_date)
+            changed = False
+            for item in items:
+                changed = self._add(item) or changed
+            self.refreshed_at = time.time()
+            if changed:
+                self._frame = None
+            return changed
+
+    def _items_since(self, last_date):
+        # the day already seen is read again: more results may have landed on it since
+        day = date.fromisoformat(last_date)
+        if (date.today() - day).days > MAX_QUERY_DAYS:
+            yield from scan_all(self.table, FilterExpression=Attr('date').gte(last_date), **METADATA_PROJECTION)
+            return
+        while day <= date.today():
+            yield from query_all(self.table, IndexName=self.date_index,
+                                 KeyConditionExpression=Key('date').eq(str(day)), **METADATA_PROJECTION)
+            day += timedelta(days=1)
+
+    def _add(self, item):
+        # metrics-only rows of repeated-sample runs have no new output to compare
+        if item.get('output_unchanged'):
+            return False
+        model, prompt = item['model_prompt_id'].split('_', 1)
+        records = self.top2.get((model, prompt), [])
+        if any(r['date'] == item['date'] and r.get('output_hash') == item.get('output_hash') for r in records):
+            return False
+        records = [r for r in records if r['date'] != item['date']] + [item]
+        records.sort(key=lambda r: r['date'], reverse=True)
+        self.top2[(model, prompt)] = records[:2]
+        if self.last_date is None or item['date'] > self.last_date:
+            self.last_date = item['date']
+        return True
+
+    def frame(self):
+        with self._lock:
+            if self._frame is None:
+                self._frame = self._build_frame()
+            return self._frame.copy()
+
+    def _build_frame(self):
+        # only pairs with a previous result to compare against
+        rows = []
+        for (model, prompt), records in self.top2.items():
+            if len(records) < 2:
+                continue
+            latest, previous = records
+            rows.append({
+                'model': model,
+                'prompt': prompt,
+                'date_x': latest['date'],
+                'latency': latest.get('latency'),
+                'input_token_count': latest.get('input_token_count'),
+                'output_token_count': latest.get('output_token_count'),
+                'date_y': previous['date'],
+            })
+        columns = ['model', 'prompt', 'date_x', 'latency', 'input_token_count', 'output_token_count', 'date_y']
+        df = pd.DataFrame(rows, columns=columns)
+        df['date_x'] = pd.to_datetime(df['date_x'])
+        df['date_y'] = pd.to_datetime(df['date_y'])
+        return df.sort_values(by=['prompt', 'model']).reset_index(drop=True)
+
+    def row_outputs(self, df, index):
+        # latest and previous output for one row, then warm the cache for the next row
+        def keys(i):
+            model_prompt_id = df.loc[i, 'model'] + '_' + df.loc[i, 'prompt']
+            return [(model_prompt_id, str(df.loc[i, column]).split()[0]) for column in ('date_x', 'date_y')]
+
+        output_x, output_y = self.outputs.get_many(keys(index))
+        if index + 1 < len(df):
+            self.outputs.prefetch(keys(index + 1))
+        return output_x.replace('\n', ' '), output_y.replace('\n', ' ')
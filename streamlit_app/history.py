@@ -0,0 +1,135 @@
+"""Parquet export of the bedrockbenchmark table, partitioned by date and model.
+
+    python history.py ./history                      # first run: everything; later runs: only new dates
+    python history.py s3://my-bucket/bedrock-history
+    python history.py ./history 2024-05-01           # first run from that date instead of the oldest one
+
+Read it back with read_history(), which only opens the partitions the filters select.
+"""
+import os
+import sys
+from datetime import date, timedelta
+
+import boto3
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+from boto3.dynamodb.conditions import Key
+
+from data import query_all, scan_all
+
+PARTITIONING = ds.partitioning(pa.schema([('date', pa.string()), ('model', pa.string())]), flavor='hive')
+
+# DynamoDB attribute -> column type; header values arrive as strings and are cast here
+NUMERIC_COLUMNS = {
+    'latency': pa.float64(),
+    'input_token_count': pa.int64(),
+    'output_token_count': pa.int64(),
+    'ttft_ms': pa.float64(),
+    'stream_duration_ms': pa.float64(),
+    'chunk_count': pa.int64(),
+    'output_tokens_per_s': pa.float64(),
+    'inter_chunk_ms_p50': pa.float64(),
+    'inter_chunk_ms_p90': pa.float64(),
+    'inter_chunk_ms_p99': pa.float64(),
+    'Rating': pa.int64(),
+}
+
+SCHEMA = pa.schema([('prompt', pa.string()), ('category', pa.string()), ('output_hash', pa.string())]
+                   + list(NUMERIC_COLUMNS.items())
+                   + [('date', pa.string()), ('model', pa.string())])
+
+EXPORTED_ATTRIBUTES = ['model_prompt_id', 'date', 'output_hash'] + list(NUMERIC_COLUMNS)
+EXPORT_PROJECTION = {
+    'ProjectionExpression': ', '.join(f'#a{i}' for i in range(len(EXPORTED_ATTRIBUTES))),
+    'ExpressionAttributeNames': {f'#a{i}': name for i, name in enumerate(EXPORTED_ATTRIBUTES)},
+}
+
+
+def to_table(items):
+    rows = {name: [] for name in SCHEMA.names}
+    for item in items:
+        model, prompt = item['model_prompt_id'].split('_', 1)
+        rows['model'].append(model)
+        rows['prompt'].append(prompt)
+        rows['category'].append(prompt.rsplit('_', 1)[0])
+        rows['date'].append(item['date'])
+        rows['output_hash'].append(item.get('output_hash'))
+        for name in NUMERIC_COLUMNS:
+            rows[name].append(item.get(name))
+    df = pd.DataFrame(rows)
+    for name, kind in NUMERIC_COLUMNS.items():
+        df[name] = pd.to_numeric(df[name], errors='coerce')
+        if pa.types.is_integer(kind):
+            df[name] = df[name].astype('Int64')
+    return pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+
+def filesystem_for(root):
+    if '://' in root:
+        return pafs.FileSystem.from_uri(root)
+    return pafs.LocalFileSystem(), os.path.abspath(root)
+
+
+def exported_dates(root):
+    filesystem, path = filesystem_for(root)
+    infos = filesystem.get_file_info(pafs.FileSelector(path, allow_not_found=True))
+    return sorted(i.base_name.split('=', 1)[1] for i in infos
+                  if i.type == pafs.FileType.Directory and i.base_name.startswith('date='))
+
+
+def first_date(table):
+    # the oldest date in the table, from a scan that reads only that attribute and keeps one value
+    oldest = None
+    for item in scan_all(table, ProjectionExpression='#d', ExpressionAttributeNames={'#d': 'date'}):
+        if oldest is None or item['date'] < oldest:
+            oldest = item['date']
+    return oldest
+
+
+def items_by_day(table, since, date_index='date_gsi'):
+    # (day, items) per day from `since` through today, one date index query per day, so only one
+    # day's rows are in memory however long the range. A first export starts at the oldest date
+    if since is None:
+        since = first_date(table)
+        if since is None:
+            return
+    day = date.fromisoformat(since)
+    while day <= date.today():
+        yield str(day), list(query_all(table, IndexName=date_index, KeyConditionExpression=Key('date').eq(str(day)),
+                                       **EXPORT_PROJECTION))
+        day += timedelta(days=1)
+
+
+def export(root, table_name='bedrockbenchmark', start=None):
+    # only the dates not exported yet, plus the newest exported date, which may have gained rows since
+    existing = exported_dates(root)
+    since = existing[-1] if existing else start
+    table = boto3.resource('dynamodb').Table(table_name)
+    written = 0
+    for day, items in items_by_day(table, since):
+        if not items:
+            continue
+        # one day at a time keeps memory flat; rewriting a day replaces its partitions
+        ds.write_dataset(to_table(items), root, format='parquet', partitioning=PARTITIONING,
+                         basename_template=f'{day}-{{i}}.parquet', existing_data_behavior='delete_matching')
+        written += len(items)
+        print(f"{day}: {len(items)} rows")
+    return written
+
+
+def read_history(root, models=None, start=None, end=None, columns=None):
+    # partition filters on date and model skip whole files; the rest is pushed down to row groups
+    dataset = ds.dataset(root, format='parquet', partitioning=PARTITIONING)
+    condition = None
+    for part in (ds.field('model').isin(models) if models else None,
+                 ds.field('date') >= str(start) if start else None,
+                 ds.field('date') <= str(end) if end else None):
+        if part is not None:
+            condition = part if condition is None else condition & part
+    return dataset.to_table(filter=condition, columns=columns).to_pandas()
+
+
+if __name__ == '__main__':
+    print(f"Exported {export(sys.argv[1], start=sys.argv[2] if len(sys.argv) > 2 else None)} rows to {sys.argv[1]}")
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pytest
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+if BENCHMARKS_DIR not in sys.path:
+    sys.path.insert(0, BENCHMARKS_DIR)
+
+from standins import MAIN_FUNCTION_DIR, FakeBedrockRuntime, FakeDynamoDB, LambdaContext, load_app, restore_boto3  # noqa: E402
+
+# the function's own modules (sketch, batch, shards, ...) for the unit-level checks
+if MAIN_FUNCTION_DIR not in sys.path:
+    sys.path.insert(0, MAIN_FUNCTION_DIR)
+# the catalog sync; appended, so "app" stays the benchmark function's module
+CATALOG_FUNCTION_DIR = os.path.normpath(os.path.join(MAIN_FUNCTION_DIR, "..", "dynamodb"))
+if CATALOG_FUNCTION_DIR not in sys.path:
+    sys.path.append(CATALOG_FUNCTION_DIR)
+# the dashboard's data layer (data, history), appended for the same reason
+STREAMLIT_APP_DIR = os.path.normpath(os.path.join(MAIN_FUNCTION_DIR, "..", "..", "streamlit_app"))
+if STREAMLIT_APP_DIR not in sys.path:
+    sys.path.append(STREAMLIT_APP_DIR)
+
+# the rate limiter would otherwise pace every local run at 5 rps, and the run ledger would
+# checkpoint only at the end of these sub-second runs
+LOCAL_ENV = {"rate_limit": '{"initial": 1000, "max": 1000}', "checkpoint_interval_s": "0"}
+
+
+@pytest.fixture(autouse=True)
+def standin_environment():
+    # load_app() patches boto3 and the environment for the app under test; undo both after each test
+    environ = dict(os.environ)
+    yield
+    restore_boto3()
+    os.environ.clear()
+    os.environ.update(environ)
+
+
+@pytest.fixture
+def local_app():
+    """Loads app.py against the stand-ins: an instant runtime and an empty table store unless given."""
+    def load(models, runtime=None, db=None, env=None, **kwargs):
+        runtime = runtime if runtime is not None else FakeBedrockRuntime(time_scale=0, seed=0)
+        db = db if db is not None else FakeDynamoDB()
+        return load_app(runtime, db, models, env={**LOCAL_ENV, **(env or {})}, **kwargs)
+    return load
+
+
+@pytest.fixture
+def handle():
+    """Calls the handler with a local Lambda context; pytest captures what it prints."""
+    def call(app, event, timeout_s=900):
+        return app.lambda_handler(event, LambdaContext(timeout_s))
+    return call
@@ -0,0 +1,89 @@
+import pytest
+
+from batch import LocalJobFiles, read_manifest, read_results, write_requests
+from standins import FakeBedrock, FakeBedrockRuntime, FakeDynamoDB, FakeS3, catalog_items, local_model_ids
+
+MODELS = local_model_ids("anthropic", 2)
+
+
+@pytest.fixture
+def batch_app(local_app):
+    def load(prompts, error_rate=0.0):
+        db, s3 = FakeDynamoDB(), FakeS3()
+        runtime = FakeBedrockRuntime(time_scale=0, seed=0)
+        bedrock = FakeBedrock(s3, runtime, error_rate=error_rate, seed=1)
+        app = local_app(MODELS, runtime, db, catalog=catalog_items(prompts),
+                        env={"ledger_table": "", "batch_location": "s3://bucket/batch",
+                             "batch_role_arn": "arn:aws:iam::0:role/batch"},
+                        extra_clients={"s3": s3, "bedrock": bedrock})
+        return app, db, bedrock
+    return load
+
+
+def test_submit_then_ingest_round_trip(batch_app, handle):
+    app, db, bedrock = batch_app(150, error_rate=0.05)
+    submitted = handle(app, {"mode": "batch_submit", "run_id": "r1"})
+    assert [job["records"] for job in submitted["jobs"]] == [150, 150]
+    assert all(job.get("job_arn") for job in submitted["jobs"])
+
+    # still running: nothing is written and the jobs come back as pending
+    waiting = handle(app, {"mode": "batch_ingest", "jobs": submitted["jobs"]})
+    assert not waiting["done"] and len(waiting["pending"]) == 2 and waiting["items_written"] == 0
+
+    bedrock.run_jobs()
+    done = handle(app, {"mode": "batch_ingest", "jobs": waiting["jobs"]})
+    assert done["done"]
+    for job in done["jobs"]:
+        assert job["status"] == "Ingested"
+        assert job["ingested"] + job["errors"] == 150
+    rows = db.items("bedrockbenchmark")
+    assert len(rows) == done["items_written"] == sum(job["ingested"] for job in done["jobs"])
+    assert all(row["invocation_mode"] == "batch" and row["output_token_count"] for row in rows)
+    # every row maps back to a catalog prompt through the manifest
+    ids = {item["id"] for item in catalog_items(150)}
+    assert {row["model_prompt_id"].split("_", 1)[1] for row in rows} <= ids
+
+
+def test_ingested_jobs_are_not_read_again(batch_app, handle):
+    app, db, bedrock = batch_app(120)
+    submitted = handle(app, {"mode": "batch_submit", "run_id": "r1"})
+    bedrock.run_jobs()
+    done = handle(app, {"mode": "batch_ingest", "jobs": submitted["jobs"]})
+    calls = dict(db.calls)
+    again = handle(app, {"mode": "batch_ingest", "jobs": done["jobs"]})
+    assert again["done"] and again["items_written"] == 0
+    assert again["jobs"] == done["jobs"]
+    assert db.calls == calls
+
+
+def test_failed_jobs_finish_the_ingest_with_their_error(batch_app, handle):
+    app, db, bedrock = batch_app(120)
+    submitted = handle(app, {"mode": "batch_submit", "run_id": "r1"})
+    failed, expired = (job["job_arn"] for job in submitted["jobs"])
+    bedrock.fail_job(failed, message="Input file is invalid")
+    bedrock.fail_job(expired, status="Expired", message="Job timed out")
+    done = handle(app, {"mode": "batch_ingest", "jobs": submitted["jobs"]})
+    assert done["done"] and done["pending"] == [] and done["items_written"] == 0
+    assert [(job["status"], job["error"]) for job in done["failed"]] == [
+        ("Failed", "Input file is invalid"), ("Expired", "Job timed out")]
+    # sent again, the failed jobs are not looked up a second time
+    bedrock.jobs.clear()
+    assert handle(app, {"mode": "batch_ingest", "jobs": done["jobs"]})["done"]
+
+
+def test_small_catalogs_are_not_submitted(batch_app, handle):
+    app, db, bedrock = batch_app(20)
+    submitted = handle(app, {"mode": "batch_submit", "run_id": "r1"})
+    assert all(job["status"] == "TooFewRecords" and "job_arn" not in job for job in submitted["jobs"])
+    assert not bedrock.jobs
+    assert handle(app, {"mode": "batch_ingest", "jobs": submitted["jobs"]})["jobs"] == []
+
+
+def test_requests_split_into_parts_and_map_back(tmp_path):
+    files = LocalJobFiles(str(tmp_path))
+    records = ((f"p_{i}", {"prompt": f"Prompt {i}"}) for i in range(25))
+    job = write_requests(files, "job", records, records_per_file=10)
+    assert job["records"] == 25
+    assert job["input_files"] == [f"job/input/part-{i:05d}.jsonl" for i in range(3)]
+    assert read_manifest(files, "job") == [f"p_{i}" for i in range(25)]
+    assert list(read_results(files, "job")) == []
@@ -0,0 +1,80 @@
+import pytest
+
+from blobstore import LocalBackend, OutputStore, content_key
+from sketch import DDSketch
+from standins import FakeDynamoDB, catalog_items, local_model_ids
+from writer import BatchResultWriter
+
+
+class FlakyBackend(LocalBackend):
+    """Fails the first `failures` writes, like an S3 outage."""
+
+    def __init__(self, root, failures=1):
+        super().__init__(root)
+        self.failures = failures
+
+    def write(self, key, blob):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("upload failed")
+        super().write(key, blob)
+
+
+def test_identical_texts_are_stored_once(tmp_path):
+    store = OutputStore(LocalBackend(str(tmp_path)))
+    keys = [store.put("same output") for _ in range(3)]
+    store.flush()
+    assert len(set(keys)) == 1 and store.uploaded == 1 and store.deduplicated == 2
+    # a fresh container finds the blob there already
+    again = OutputStore(LocalBackend(str(tmp_path)))
+    again.put("same output")
+    again.flush()
+    assert again.uploaded == 0 and again.get(keys[0]) == "same output"
+
+
+def test_a_failed_upload_is_retried_by_the_next_put(tmp_path):
+    backend = FlakyBackend(str(tmp_path))
+    store = OutputStore(backend)
+    key = store.put("lost output")
+    with pytest.raises(ConnectionError):
+        store.flush()
+    assert not backend.exists(key)
+
+    store.put("lost output")
+    store.flush()
+    assert backend.exists(key) and store.uploaded == 1
+    assert OutputStore(backend).get(key) == "lost output"
+
+
+def test_items_are_dropped_when_their_blobs_fail(tmp_path):
+    db = FakeDynamoDB()
+    store = OutputStore(FlakyBackend(str(tmp_path)))
+    writer = BatchResultWriter(db.resource(), "bedrockbenchmark", before_flush=store.flush)
+    writer.put({"model_prompt_id": "m_code_100", "date": "2026-10-18", "output_ref": store.put("lost output")})
+    with pytest.raises(ConnectionError):
+        writer.flush()
+    # the failed batch does not go out with the next flush, pointing to a missing blob
+    writer.put({"model_prompt_id": "m_code_200", "date": "2026-10-18", "output_ref": store.put("kept output")})
+    writer.flush()
+    assert [item["model_prompt_id"] for item in db.items("bedrockbenchmark")] == ["m_code_200"]
+    assert store.backend.exists(content_key("kept output"))
+
+
+def test_a_failed_upload_leaves_its_pairs_to_the_retry(local_app, handle, tmp_path):
+    db = FakeDynamoDB()
+    models = local_model_ids("anthropic", 2)
+    app = local_app(models, db=db, catalog=catalog_items(30), env={"output_store": str(tmp_path)})
+    app.output_store.backend = FlakyBackend(str(tmp_path))
+    with pytest.raises(ConnectionError):
+        handle(app, {"run_id": "a"})
+    written = len(db.items("bedrockbenchmark"))
+    assert written < 60
+
+    # the retry runs every pair without a stored item, and counts each invocation once
+    app = local_app(models, db=db, env={"output_store": str(tmp_path)})
+    assert handle(app, {"run_id": "a"})["stats"]["skipped"] <= written
+    rows = db.items("bedrockbenchmark")
+    assert len(rows) == 60
+    assert all(app.output_store.backend.exists(row["output_ref"]) for row in rows)
+    for item in db.items("bedrockbenchmarksketch"):
+        assert DDSketch.from_json(item["latency"]).count == 30
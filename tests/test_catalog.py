@@ -0,0 +1,54 @@
+from catalog import CatalogSnapshot
+from catalog_sync import bump_version
+from standins import FakeDynamoDB, catalog_items
+
+TABLE = "bedrockbenchmarkprompts"
+
+
+def catalog_db(prompts):
+    db = FakeDynamoDB()
+    db.load(TABLE, catalog_items(prompts))
+    return db
+
+
+def test_without_a_version_marker_every_call_reloads():
+    snapshot = CatalogSnapshot(catalog_db(10), TABLE)
+    snapshot.items()
+    snapshot.items()
+    assert snapshot.loads == 2
+
+
+def test_warm_calls_only_read_the_marker():
+    db = catalog_db(10)
+    bump_version(db, TABLE)
+    snapshot = CatalogSnapshot(db, TABLE)
+    assert len(snapshot.items()) == 10
+    scans, gets = db.calls.get("scan", 0), db.calls.get("get_item", 0)
+    assert len(snapshot.items()) == 10
+    assert snapshot.loads == 1
+    assert db.calls.get("scan", 0) == scans and db.calls["get_item"] == gets + 1
+
+
+def test_a_moved_marker_reloads_the_catalog():
+    db = catalog_db(10)
+    bump_version(db, TABLE)
+    snapshot = CatalogSnapshot(db, TABLE)
+    snapshot.items()
+    db.load(TABLE, catalog_items(15))
+    # the new prompts stay invisible until a sync moves the marker
+    assert len(snapshot.items()) == 10
+    bump_version(db, TABLE)
+    assert len(snapshot.items()) == 15
+    assert snapshot.loads == 2
+
+
+def test_category_selections_are_cached_separately():
+    db = catalog_db(20)
+    bump_version(db, TABLE)
+    snapshot = CatalogSnapshot(db, TABLE)
+    code = snapshot.items(["code_"])
+    assert {item["category"]["S"] for item in code} == {"code"} and len(code) == 4
+    # "code_" and "code" are the same selection
+    assert snapshot.items(["code"]) is code
+    assert len(snapshot.items()) == 20
+    assert snapshot.loads == 2
@@ -0,0 +1,62 @@
+import json
+
+from catalog_sync import diff, load_catalog, prompt_id, sync
+from standins import FakeDynamoDB
+
+TABLE = "bedrockbenchmarkprompts"
+
+
+def test_diff_inserts_deletes_and_recategorizes():
+    current = {("code_1", "old text"): "code", ("code_2", "kept"): "code", ("misc_3", "no category"): None,
+               ("gone_4", "removed"): "gone"}
+    desired = {("code_1", "new text"): "code", ("code_2", "kept"): "code", ("misc_3", "no category"): "misc",
+               ("new_5", "added"): "new"}
+    inserts, deletes = diff(current, desired)
+    # a changed text is a delete of the old key plus an insert; a missing category is put again
+    assert inserts == [(("code_1", "new text"), "code"), (("misc_3", "no category"), "misc"), (("new_5", "added"), "new")]
+    assert deletes == [("code_1", "old text"), ("gone_4", "removed")]
+    assert diff(desired, desired) == ([], [])
+
+
+def test_generated_ids_do_not_depend_on_position(tmp_path):
+    path = tmp_path / "catalog.jsonl"
+    rows = [{"category": "code", "prompt": "a"}, {"category": "code", "prompt": "b", "id": "code_100"}]
+    path.write_text("".join(json.dumps(r) + "\n" for r in rows))
+    first = load_catalog([str(path)])
+    path.write_text("".join(json.dumps(r) + "\n" for r in [{"category": "code", "prompt": "new"}] + rows))
+    second = load_catalog([str(path)])
+    assert set(first) < set(second)
+    assert (prompt_id("code", "a"), "a") in first and ("code_100", "b") in first
+
+
+def test_a_later_file_wins_for_the_same_id(tmp_path):
+    base, override = tmp_path / "base.jsonl", tmp_path / "override.jsonl"
+    base.write_text(json.dumps({"category": "code", "prompt": "v1", "id": "code_1"}) + "\n")
+    override.write_text(json.dumps({"category": "code", "prompt": "v2", "id": "code_1"}) + "\n")
+    assert load_catalog([str(base), str(override)]) == {("code_1", "v2"): "code"}
+
+
+def test_blank_lines_are_skipped(tmp_path):
+    path = tmp_path / "catalog.jsonl"
+    path.write_text("\n" + json.dumps({"category": "code", "prompt": "a", "id": "code_1"}) + "\n  \n\t\n")
+    assert load_catalog([str(path)]) == {("code_1", "a"): "code"}
+
+
+def test_sync_writes_only_the_changes_and_bumps_the_version():
+    db = FakeDynamoDB()
+    desired = {(f"code_{i}", f"prompt {i}"): "code" for i in range(60)}
+    first = sync(db, TABLE, desired)
+    assert (first["inserted"], first["deleted"], first["batches"], first["version"]) == (60, 0, 3, 1)
+
+    unchanged = sync(db, TABLE, desired)
+    assert (unchanged["inserted"], unchanged["deleted"], unchanged["batches"]) == (0, 0, 0)
+    assert "version" not in unchanged
+
+    del desired[("code_0", "prompt 0")]
+    desired[("code_1", "prompt one")] = desired.pop(("code_1", "prompt 1"))
+    changed = sync(db, TABLE, desired)
+    assert (changed["inserted"], changed["deleted"], changed["version"]) == (1, 2, 2)
+    assert sorted((i["id"], i["prompt"]) for i in db.items(TABLE) if not i["id"].startswith("#")) == sorted(desired)
+
+    assert sync(db, TABLE, {}, dry_run=True)["deleted"] == 59
+    assert len([i for i in db.items(TABLE) if not i["id"].startswith("#")]) == 59
@@ -0,0 +1,124 @@
+from datetime import date, timedelta
+
+import boto3
+import pytest
+
+pytest.importorskip("pandas")
+
+from blobstore import LocalBackend, OutputStore  # noqa: E402
+from data import MISSING_STORE_TEXT, BenchmarkStore, OutputCache  # noqa: E402
+from standins import FakeDynamoDB  # noqa: E402
+
+
+def day(offset):
+    return str(date.today() - timedelta(days=offset))
+
+
+def row(model, prompt, days_ago, output_hash, latency=100, **extra):
+    return {"model_prompt_id": f"{model}_{prompt}", "date": day(days_ago), "output_hash": output_hash,
+            "latency": latency, "output": f"text {output_hash}", **extra}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    def load(rows, **kwargs):
+        db = FakeDynamoDB()
+        db.load("bedrockbenchmark", rows)
+        monkeypatch.setattr(boto3, "resource", lambda *args, **kw: db.resource())
+        return db, BenchmarkStore(**kwargs)
+    return load
+
+
+def test_the_first_refresh_scans_and_keeps_the_two_newest_results(store):
+    db, benchmarks = store([row("m1", "code_100", 3, "a"), row("m1", "code_100", 2, "b"), row("m1", "code_100", 1, "c"),
+                            row("m2", "code_100", 1, "d")])
+    assert benchmarks.refresh()
+    assert db.calls == {"scan": 1}
+    assert [r["output_hash"] for r in benchmarks.top2[("m1", "code_100")]] == ["c", "b"]
+    # only pairs with a previous result are compared; outputs are not part of the listing
+    df = benchmarks.frame()
+    assert list(df["model"]) == ["m1"] and str(df.loc[0, "date_y"].date()) == day(2)
+    assert "output" not in benchmarks.top2[("m1", "code_100")][0]
+
+
+def test_later_refreshes_query_only_the_days_since_the_newest_one(store):
+    db, benchmarks = store([row("m1", "code_100", 3, "a"), row("m1", "code_100", 2, "b")], ttl_s=300)
+    benchmarks.refresh()
+    # within the TTL nothing is read
+    assert not benchmarks.refresh() and db.calls == {"scan": 1}
+
+    db.put("bedrockbenchmark", row("m1", "code_100", 0, "c"))
+    # a metrics-only row of a repeated-sample run has no output to compare
+    db.put("bedrockbenchmark", row("m1", "code_100", 1, "b", output_unchanged=True))
+    assert benchmarks.refresh(force=True)
+    # the newest day seen is read again, then every day through today
+    assert db.calls == {"scan": 1, "query": 3}
+    assert [r["date"] for r in benchmarks.top2[("m1", "code_100")]] == [day(0), day(2)]
+    assert str(benchmarks.frame().loc[0, "date_x"].date()) == day(0)
+
+    # the same row again changes nothing, and the frame is kept
+    frame = benchmarks._frame
+    assert not benchmarks.refresh(force=True) and benchmarks._frame is frame
+
+
+def test_a_new_output_on_the_same_day_replaces_the_latest_result(store):
+    db, benchmarks = store([row("m1", "code_100", 2, "a"), row("m1", "code_100", 0, "b")])
+    benchmarks.refresh()
+    db.put("bedrockbenchmark", row("m1", "code_100", 0, "c"))
+    assert benchmarks.refresh(force=True)
+    assert [(r["date"], r["output_hash"]) for r in benchmarks.top2[("m1", "code_100")]] == [(day(0), "c"), (day(2), "a")]
+
+
+def test_a_long_gap_is_read_with_one_filtered_scan(store):
+    db, benchmarks = store([row("m1", "code_100", 60, "a"), row("m1", "code_100", 50, "b")])
+    benchmarks.refresh()
+    db.put("bedrockbenchmark", row("m1", "code_100", 0, "c"))
+    db.put("bedrockbenchmark", row("m2", "code_100", 70, "old"))
+    assert benchmarks.refresh(force=True)
+    assert db.calls == {"scan": 2}
+    # rows older than the newest date seen are filtered out
+    assert ("m2", "code_100") not in benchmarks.top2
+    assert [r["output_hash"] for r in benchmarks.top2[("m1", "code_100")]] == ["c", "b"]
+
+
+def test_outputs_are_fetched_in_one_batch_and_kept_in_an_lru(store):
+    db, benchmarks = store([row("m1", f"code_{i}", 0, str(i)) for i in range(4)])
+    cache = OutputCache(benchmarks.table, maxsize=3)
+    keys = [(f"m1_code_{i}", day(0)) for i in range(3)]
+    assert cache.get_many(keys) == ["text 0", "text 1", "text 2"]
+    assert db.calls == {"batch_get_item": 1}
+    # cached: no read; the lookup also makes code_0 the most recently used
+    assert cache.get_many(keys[:1]) == ["text 0"] and db.calls == {"batch_get_item": 1}
+    # a fourth output evicts the least recently used one, code_1
+    cache.get_many([("m1_code_3", day(0))])
+    assert [k for k, _ in cache._items] == ["m1_code_2", "m1_code_0", "m1_code_3"]
+    # an unknown key is cached as empty rather than read again
+    assert cache.get_many([("m1_code_9", day(0))]) == [""]
+
+
+def test_referenced_outputs_are_read_from_their_store(store, tmp_path):
+    blobs = OutputStore(LocalBackend(str(tmp_path)))
+    ref = blobs.put("stored text")
+    blobs.flush()
+    db, benchmarks = store([
+        {"model_prompt_id": "m1_code_1", "date": day(0), "output_ref": ref, "output_store": str(tmp_path)},
+        # written before items carried their store location
+        {"model_prompt_id": "m1_code_2", "date": day(0), "output_ref": ref},
+    ])
+    cache = OutputCache(benchmarks.table)
+    assert cache.get_many([("m1_code_1", day(0)), ("m1_code_2", day(0))]) == [
+        "stored text", MISSING_STORE_TEXT.format(ref=ref)]
+    assert cache.unresolved == 1
+    assert OutputCache(benchmarks.table, output_store=str(tmp_path)).get_many([("m1_code_2", day(0))]) == ["stored text"]
+
+
+def test_a_row_prefetches_the_next_rows_outputs(store):
+    db, benchmarks = store([row("m1", f"code_{i}", days_ago, f"{i}{days_ago}")
+                            for i in range(2) for days_ago in (0, 1)])
+    benchmarks.refresh()
+    df = benchmarks.frame()
+    assert benchmarks.row_outputs(df, 0) == ("text 00", "text 01")
+    benchmarks.outputs._prefetcher.shutdown(wait=True)
+    calls = db.calls["batch_get_item"]
+    assert benchmarks.row_outputs(df, 1) == ("text 10", "text 11")
+    assert db.calls["batch_get_item"] == calls == 2
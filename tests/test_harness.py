@@ -0,0 +1,25 @@
+from bench_harness import run_case
+from standins import local_model_ids
+
+# the harness benchmark's own settings: the rate limiter would otherwise pace the run at 5 rps
+ENV = {"max_concurrency": "8", "tracing": "false", "rate_limit": '{"initial": 1000, "max": 1000}'}
+
+
+def test_every_pair_is_stored():
+    row = run_case(50, local_model_ids("anthropic", 2), 0.0, 1, ENV)
+    assert row["status"] == 200
+    assert row["items"] == row["pairs"] == 100
+
+
+def test_writes_are_batched():
+    row = run_case(100, local_model_ids("anthropic", 2), 0.0, 1, ENV)
+    # 200 results and 200 run ledger entries at 25 per BatchWriteItem; a put per item would be 400 calls
+    assert row["ddb_calls"].get("batch_write_item", 0) <= 16
+    assert row["ddb_calls"].get("put_item", 0) < row["pairs"]
+
+
+def test_invocations_overlap():
+    # 200 pairs at 20 ms are 4 s one after the other and 0.5 s on 8 threads
+    row = run_case(100, local_model_ids("anthropic", 2), 20.0, 1, ENV)
+    assert row["items"] == 200
+    assert row["wall_s"] < 2.0
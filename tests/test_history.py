@@ -0,0 +1,54 @@
+from datetime import date, timedelta
+
+import boto3
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from history import export, read_history  # noqa: E402
+from standins import FakeDynamoDB  # noqa: E402
+
+
+def day(offset):
+    return str(date.today() - timedelta(days=offset))
+
+
+def rows(days_ago, models=("m1", "m2"), prompts=3):
+    return [{"model_prompt_id": f"{model}_code_{i}", "date": day(days_ago), "output_hash": f"{model}{i}",
+             "latency": 100.0 + i, "input_token_count": "12", "output_token_count": 40 + i, "output": "text"}
+            for model in models for i in range(prompts)]
+
+
+@pytest.fixture
+def table(monkeypatch):
+    db = FakeDynamoDB()
+    monkeypatch.setattr(boto3, "resource", lambda *args, **kwargs: db.resource())
+    return db
+
+
+def test_export_round_trip_by_date_and_model(table, tmp_path):
+    table.load("bedrockbenchmark", rows(2) + rows(0))
+    assert export(str(tmp_path)) == 12
+    # the first export starts at the oldest date and queries each day through today
+    assert table.calls == {"scan": 1, "query": 3}
+
+    df = read_history(str(tmp_path), models=["m1"], start=day(0))
+    assert len(df) == 3 and set(df["model"]) == {"m1"} and set(df["date"]) == {day(0)}
+    assert list(df.sort_values("prompt")["latency"]) == [100.0, 101.0, 102.0]
+    # header values stored as strings come back typed; the category is the prompt id's prefix
+    assert list(df["input_token_count"]) == [12, 12, 12] and set(df["category"]) == {"code"}
+    assert len(read_history(str(tmp_path), end=day(1), columns=["date", "latency"])) == 6
+
+
+def test_later_exports_rewrite_the_newest_date_and_add_new_ones(table, tmp_path):
+    table.load("bedrockbenchmark", rows(3) + rows(1))
+    export(str(tmp_path))
+    # more rows land on the newest exported day, and a new day follows
+    table.load("bedrockbenchmark", rows(1, models=("m3",)) + rows(0))
+    calls = dict(table.calls)
+    assert export(str(tmp_path)) == 9 + 6
+    assert table.calls["query"] - calls["query"] == 2 and table.calls["scan"] == calls["scan"]
+    df = read_history(str(tmp_path))
+    # the rewritten day holds each row once
+    assert len(df) == 6 + 9 + 6
+    assert sorted(df.loc[df["date"] == day(1), "model"].unique()) == ["m1", "m2", "m3"]
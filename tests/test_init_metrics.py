@@ -0,0 +1,39 @@
+import json
+
+from standins import catalog_items, local_model_ids
+
+
+def emf_documents(output, metric):
+    documents = [json.loads(line) for line in output.splitlines() if line.startswith('{"_aws"')]
+    return [d for d in documents if metric in d]
+
+
+def test_init_metrics_are_published_as_emf(local_app, handle, capsys):
+    app = local_app(local_model_ids("anthropic", 1), catalog=catalog_items(3), env={"ledger_table": ""})
+    cold = handle(app, {})
+    warm = handle(app, {})
+    output = capsys.readouterr().out
+    first, second = emf_documents(output, "ColdStart")
+
+    assert cold["stats"]["init"]["cold_start"] and not warm["stats"]["init"]["cold_start"]
+    assert first["function"] == "local"
+    assert first["ColdStart"] == 1 and first["InitDuration"] == app.init_ms
+    assert second["ColdStart"] == 0 and "InitDuration" not in second
+    metrics = {m["Name"]: m["Unit"] for m in first["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+    assert metrics == {"ColdStart": "Count", "InitDuration": "Milliseconds"}
+    assert first["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["function"]]
+
+    memory = emf_documents(output, "PeakMemory")
+    assert [d["PeakMemory"] for d in memory] == [cold["stats"]["init"]["peak_memory_mb"],
+                                                 warm["stats"]["init"]["peak_memory_mb"]]
+    assert memory[0]["_aws"]["CloudWatchMetrics"][0]["Metrics"] == [{"Name": "PeakMemory", "Unit": "Megabytes"}]
+
+
+def test_a_container_started_by_the_planner_reports_its_cold_start(local_app, handle, capsys):
+    app = local_app(local_model_ids("anthropic", 1), catalog=catalog_items(3), env={"ledger_table": ""})
+    handle(app, {"mode": "plan", "input": {}, "run": {"execution_id": "local:plan"}})
+    handle(app, {"mode": "rollup"})
+    handle(app, {})
+    plan, rollup, run = emf_documents(capsys.readouterr().out, "ColdStart")
+    assert plan["ColdStart"] == 1 and plan["InitDuration"] == app.init_ms
+    assert rollup["ColdStart"] == run["ColdStart"] == 0
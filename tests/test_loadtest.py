@@ -0,0 +1,71 @@
+import itertools
+
+import pytest
+from botocore.exceptions import ClientError
+
+from loadtest import find_knee, run_step
+from standins import FakeDynamoDB, catalog_items, local_model_ids
+
+
+def step(concurrency, rps, throttle_rate=0.0, error_rate=0.0):
+    return {"concurrency": concurrency, "rps": rps, "throttle_rate": throttle_rate, "error_rate": error_rate}
+
+
+def test_a_step_counts_throttles_and_errors_apart_from_latencies():
+    calls = itertools.count()
+
+    def invoke(body):
+        n = next(calls)
+        if n % 4 == 1:
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "slow down"}}, "InvokeModel")
+        if n % 4 == 2:
+            raise ValueError("bad response")
+
+    result = run_step(invoke, ["a", "b"], concurrency=2, duration_s=0.05)
+    assert result["concurrency"] == 2 and result["requests"] >= 4
+    # a quarter of the requests throttled, a quarter failed; only the successes have latencies
+    assert result["successes"] == pytest.approx(result["requests"] / 2, abs=2)
+    assert result["throttle_rate"] == pytest.approx(0.25, abs=0.1) and result["error_rate"] == pytest.approx(0.25, abs=0.1)
+    assert result["latency_p50_ms"] is not None
+
+
+def test_a_step_needs_request_bodies():
+    with pytest.raises(ValueError):
+        run_step(lambda body: None, [], concurrency=2, duration_s=0.01)
+
+
+@pytest.mark.parametrize("steps, knee, saturated", [
+    ([step(1, 10), step(2, 19), step(4, 36)], 4, False),
+    # throughput flattened out: the knee is the last level that still paid off
+    ([step(1, 10), step(2, 19), step(4, 20)], 2, True),
+    # throttled from level 4 on
+    ([step(1, 10), step(2, 19), step(4, 30, throttle_rate=0.2)], 2, True),
+    ([step(1, 10, error_rate=0.5)], None, True),
+])
+def test_the_knee_is_the_last_level_that_paid_off(steps, knee, saturated):
+    assert find_knee(steps) == {"knee_concurrency": knee,
+                                "knee_rps": next((s["rps"] for s in steps if s["concurrency"] == knee), None),
+                                "saturated": saturated}
+
+
+def test_each_step_is_stored_as_it_finishes(local_app, handle):
+    db = FakeDynamoDB()
+    model = local_model_ids("anthropic", 1)[0]
+    app = local_app([model], db=db, catalog=catalog_items(5), env={"deadline_margin_ms": "1000"})
+    output = handle(app, {"mode": "load_test", "model_id": model, "levels": [1, 2], "step_duration_s": 0.05})
+    assert output["statusCode"] == 200
+    rows = sorted(row["run_step"].rsplit("#", 1)[1] for row in db.items("bedrockbenchmarkloadtest"))
+    assert rows == ["0001", "0002", "summary"]
+
+
+def test_plans_longer_than_the_deadline_are_refused(local_app, handle):
+    db = FakeDynamoDB()
+    model = local_model_ids("anthropic", 1)[0]
+    app = local_app([model], db=db, catalog=catalog_items(5), env={"deadline_margin_ms": "1000"})
+    output = handle(app, {"mode": "load_test", "model_id": model, "levels": [1, 2, 4], "step_duration_s": 30},
+                    timeout_s=60)
+    assert output["statusCode"] == 400
+    assert db.items("bedrockbenchmarkloadtest") == []
+
+    output = handle(app, {"mode": "load_test", "model_id": model, "categories": ["missing"], "step_duration_s": 0.05})
+    assert output["statusCode"] == 400
@@ -0,0 +1,69 @@
+from botocore.exceptions import ClientError
+
+from engine import InvocationEngine
+from ratelimit import AdaptiveRateLimiter, is_retryable, is_throttle
+
+
+def client_error(code):
+    return ClientError({"Error": {"Code": code, "Message": code}}, "InvokeModel")
+
+
+def rate(limiter, model):
+    return limiter.metrics()[model]["rate"]
+
+
+def test_throttles_halve_the_rate_and_successes_add_to_it():
+    limiter = AdaptiveRateLimiter(initial=8, min_rate=0.5, max_rate=10, increase=0.5, decrease=0.5)
+    limiter.on_throttle("m")
+    assert rate(limiter, "m") == 4.0
+    limiter.on_throttle("m")
+    assert rate(limiter, "m") == 2.0
+    for _ in range(3):
+        limiter.on_success("m")
+    assert rate(limiter, "m") == 3.5
+    counts = limiter.metrics()["m"]
+    assert (counts["throttles"], counts["successes"], counts["min_rate"], counts["max_rate"]) == (2, 3, 2.0, 8.0)
+
+
+def test_rates_stay_within_the_bounds():
+    limiter = AdaptiveRateLimiter(initial=1, min_rate=0.25, max_rate=2, increase=1, decrease=0.1)
+    for _ in range(5):
+        limiter.on_throttle("m")
+    assert rate(limiter, "m") == 0.25
+    for _ in range(5):
+        limiter.on_success("m")
+    assert rate(limiter, "m") == 2.0
+
+
+def test_models_have_their_own_buckets_and_starting_rates():
+    limiter = AdaptiveRateLimiter(initial=5, max_rate=50, model_rates={"slow": 1})
+    limiter.on_throttle("fast")
+    limiter.acquire("slow")
+    assert rate(limiter, "fast") == 2.5
+    assert rate(limiter, "slow") == 1.0
+
+
+def test_error_classification():
+    assert is_throttle(client_error("ThrottlingException"))
+    assert not is_throttle(client_error("ModelTimeoutException"))
+    assert is_retryable(client_error("ModelTimeoutException"))
+    assert not is_retryable(client_error("ValidationException"))
+    assert not is_retryable(ValueError("not a client error"))
+
+
+def test_throttled_tasks_are_requeued_and_slow_the_model_down():
+    limiter = AdaptiveRateLimiter(initial=1000, max_rate=1000, increase=0, decrease=0.5)
+    throttles = {"a": 2}
+
+    def invoke(task):
+        if throttles.get(task, 0):
+            throttles[task] -= 1
+            raise client_error("ThrottlingException")
+        return task
+
+    handled = []
+    stats = InvocationEngine(2, limiter=limiter).run(["a", "b"], invoke, lambda task: "m",
+                                                     lambda task, result: handled.append(result))
+    assert sorted(handled) == ["a", "b"]
+    assert stats["requeued"] == 2 and stats["failures"] == 0
+    assert rate(limiter, "m") == 250.0
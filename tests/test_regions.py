@@ -0,0 +1,31 @@
+from standins import FakeBedrockRuntime, FakeDynamoDB, LatencyModel, catalog_items, local_model_ids
+
+MODELS = local_model_ids("anthropic", 1)
+REGIONS = {"AWS_REGION": "us-west-2", "AWS_DEFAULT_REGION": "us-west-2", "regions": '["us-west-2", "us-east-1"]',
+           "ledger_table": ""}
+
+
+def endpoint(server_ms, network_ms):
+    # no real sleep for the server's time, only for the round trip the header leaves out
+    return FakeBedrockRuntime(latency=LatencyModel(median_ms=server_ms), output_tokens=(50, 50), time_scale=0,
+                              seed=0, network_ms=network_ms)
+
+
+def test_regions_are_ranked_on_the_latency_the_client_saw(local_app, handle):
+    # us-east-1 answers faster on the server but is further away
+    runtime = {"us-west-2": endpoint(server_ms=40, network_ms=0), "us-east-1": endpoint(server_ms=20, network_ms=60)}
+    db = FakeDynamoDB()
+    app = local_app(MODELS, runtime, db, catalog=catalog_items(5), env=REGIONS)
+    output = handle(app, {"run_id": "a"})
+    row = output["stats"]["regions"][MODELS[0]]
+    west, east = row["regions"]["us-west-2"], row["regions"]["us-east-1"]
+    assert (west["server_latency_p50"], east["server_latency_p50"]) == (40, 20)
+    assert east["latency_p50"] >= 60 > west["latency_p50"]
+    assert row["fastest"] == "us-west-2" and row["p50_gain_ms"] >= 60 - west["latency_p50"]
+    # throughput stays on server time
+    assert east["output_tokens_per_s"] == 2500.0
+
+    # every stored result carries what the client waited
+    rows = db.items("bedrockbenchmark")
+    assert len(rows) == 10 and all("client_latency_ms" in item for item in rows)
+    assert min(float(item["client_latency_ms"]) for item in rows if item.get("region") == "us-east-1") >= 60
@@ -0,0 +1,82 @@
+import json
+from datetime import date
+
+import pytest
+from botocore.exceptions import ClientError
+
+from sketch import DDSketch, baseline_period, periods
+from standins import FakeBedrockRuntime, FakeDynamoDB, LatencyModel, catalog_items, local_model_ids
+
+MODELS = local_model_ids("anthropic", 2)
+
+
+@pytest.fixture
+def run(local_app, handle):
+    def run(db, event, latency_ms=100.0):
+        runtime = FakeBedrockRuntime(latency=LatencyModel(median_ms=latency_ms), output_tokens=(50, 50), time_scale=0, seed=0)
+        app = local_app(MODELS, runtime, db, catalog=catalog_items(30), env={"ledger_table": ""})
+        return handle(app, event)
+    return run
+
+
+def test_rollup_counts_every_invocation(run):
+    db = FakeDynamoDB()
+    # the second run's outputs are unchanged, so it writes no new result rows
+    run(db, {"run_id": "a"})
+    run(db, {"run_id": "b"})
+    body = json.loads(run(db, {"mode": "rollup"})["body"])
+    assert body["invocations"] == 2 * 30 * 2
+    rollups = {(i["model_id"], i["category"]): i for i in db.items("bedrockbenchmarkrollup")}
+    assert len(rollups) == 2 * 6
+    for model in MODELS:
+        overall = rollups[(model, "all")]
+        assert overall["count"] == 60
+        assert overall["output_tokens_total"] == 60 * 50
+        assert float(overall["latency_mean"]) == 100.0
+        assert sum(rollups[(model, c)]["count"] for c in ("code", "creativity", "instruct", "knowledge", "reflexion")) == 60
+
+
+def test_regressions_are_checked_once_in_the_rollup(run):
+    db = FakeDynamoDB()
+    run(db, {"run_id": "a"}, latency_ms=100.0)
+    # the first run becomes last week's sketches, the baseline of today's
+    for item in db.items("bedrockbenchmarksketch"):
+        db.delete("bedrockbenchmarksketch", item)
+        if item["period"].startswith("week#"):
+            db.put("bedrockbenchmarksketch", dict(item, period=baseline_period(date.today())))
+
+    output = run(db, {"run_id": "b"}, latency_ms=200.0)
+    assert "regressions" not in output["stats"]
+    body = json.loads(run(db, {"mode": "rollup"})["body"])
+    flagged = {(r["model_id"], r["metric"], r["quantile"]) for r in body["regressions"]}
+    assert flagged == {(model, "latency", q) for model in MODELS for q in ("p50", "p99")}
+
+
+def test_a_failed_run_keeps_the_sketches_of_its_finished_pairs(local_app, handle):
+    db = FakeDynamoDB()
+    failing = FakeBedrockRuntime(error_rate=0.2, time_scale=0, seed=0)
+    app = local_app(MODELS, failing, db, catalog=catalog_items(30))
+    with pytest.raises(ClientError):
+        handle(app, {"run_id": "a"})
+    assert 0 < failing.errors < 60
+
+    # the retry skips the pairs the ledger has, so their observations must already be in the sketches
+    app = local_app(MODELS, FakeBedrockRuntime(time_scale=0, seed=0), db)
+    assert handle(app, {"run_id": "a"})["stats"]["skipped"] == 60 - failing.errors
+    sketches = {(i["model_id"], i["period"]): i for i in db.items("bedrockbenchmarksketch")}
+    assert len(sketches) == 2 * 3
+    for model in MODELS:
+        for period in periods(date.today()):
+            assert DDSketch.from_json(sketches[(model, period)]["latency"]).count == 30
+
+
+@pytest.mark.parametrize("interval_s, merges", [(0, 3), (3600, 1)])
+def test_sketches_are_merged_once_per_checkpoint(local_app, handle, interval_s, merges):
+    db = FakeDynamoDB()
+    app = local_app(MODELS, db=db, catalog=catalog_items(30), env={"checkpoint_interval_s": str(interval_s)})
+    handle(app, {"run_id": "a"})
+    # 60 pairs: ledger batches at 25 and 50 and the end, or only the end within the interval;
+    # each checkpoint is one write per model and period
+    assert db.calls["put_item"] == merges * len(MODELS) * 3
+    for item in db.items("bedrockbenchmarksketch"):
+        assert DDSketch.from_json(item["latency"]).count == 30
@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+
+import pytest
+
+from sampling import interleave
+from sketch import DDSketch
+from standins import FakeBedrockRuntime, FakeDynamoDB, LatencyModel, catalog_items, local_model_ids
+
+MODELS = local_model_ids("anthropic", 2)
+
+
+@pytest.fixture
+def run(local_app, handle):
+    def run(db, run_id, latency_ms=100.0, samples=3, warmup=1):
+        # fixed output lengths give the same text every run, so only the metrics change; no real sleeps
+        runtime = FakeBedrockRuntime(latency=LatencyModel(median_ms=latency_ms), output_tokens=(50, 50), time_scale=0, seed=0)
+        app = local_app(MODELS, runtime, db, catalog=catalog_items(5), env={"ledger_table": ""})
+        return handle(app, {"run_id": run_id, "samples": samples, "warmup_samples": warmup})
+    return run
+
+
+def test_samples_interleave_within_windows():
+    assert interleave(["a", "b", "c"], 2, window=2) == [("a", 0), ("b", 0), ("a", 1), ("b", 1), ("c", 0), ("c", 1)]
+    assert interleave(["a", "b"], 2) == [("a", 0), ("b", 0), ("a", 1), ("b", 1)]
+
+
+def test_the_continuation_keeps_the_sample_settings(local_app, handle):
+    runtime = FakeBedrockRuntime(latency=LatencyModel(median_ms=50), seed=0)
+    app = local_app(MODELS, runtime, catalog=catalog_items(20), env={"max_concurrency": "2",
+                    "deadline_margin_ms": "300", "default_pair_cost_ms": "50"})
+    output = handle(app, {"run_id": "a", "samples": 3, "warmup_samples": 1, "trace": True}, timeout_s=1.0)
+    assert not output["done"]
+    continuation = output["continuation"]
+    assert (continuation["samples"], continuation["warmup_samples"], continuation["trace"]) == (3, 1, True)
+
+
+@pytest.mark.parametrize("samples, warmup", [(2, 2), (3, 5), (1, 1), (0, 0), (2, -1)])
+def test_sample_settings_without_a_measured_sample_are_refused(local_app, handle, samples, warmup):
+    runtime = FakeBedrockRuntime(time_scale=0, seed=0)
+    app = local_app(MODELS, runtime, catalog=catalog_items(5), env={"ledger_table": ""})
+    with pytest.raises(ValueError):
+        handle(app, {"run_id": "a", "samples": samples, "warmup_samples": warmup})
+    with pytest.raises(ValueError):
+        handle(app, {"mode": "plan", "input": {"samples": samples, "warmup_samples": warmup}, "run": {"execution_id": "x"}})
+    assert runtime.calls == 0
+
+
+def has_output(row):
+    return "output" in row or "output_ref" in row
+
+
+def test_one_row_per_pair_with_the_measured_samples(run):
+    db = FakeDynamoDB()
+    output = run(db, "a", samples=4, warmup=1)
+    rows = db.items("bedrockbenchmark")
+    assert output["stats"]["invocations"] == 10 * 4
+    assert len(rows) == 10
+    for row in rows:
+        assert has_output(row)
+        assert row["sample_count"] == 3 and row["warmup_count"] == 1
+        assert len(row["latency_samples"]) == 3
+
+
+def test_warmup_samples_stay_out_of_the_sketches(run):
+    db = FakeDynamoDB()
+    run(db, "a", samples=4, warmup=1)
+    for item in db.items("bedrockbenchmarksketch"):
+        assert DDSketch.from_json(item["latency"]).count == 5 * 3
+
+
+def test_unchanged_output_on_the_same_day_keeps_output_and_rating(run):
+    db = FakeDynamoDB()
+    run(db, "a", latency_ms=100.0)
+    for row in db.items("bedrockbenchmark"):
+        row["Rating"] = 4
+    run(db, "b", latency_ms=300.0)
+    rows = db.items("bedrockbenchmark")
+    assert len(rows) == 10
+    for row in rows:
+        assert has_output(row)
+        assert row["Rating"] == 4
+        assert float(row["latency"]) == 300.0
+        assert not row.get("output_unchanged")
+
+
+def test_unchanged_output_on_a_later_day_adds_a_metrics_only_row(run):
+    db = FakeDynamoDB()
+    run(db, "a")
+    yesterday = str(date.today() - timedelta(days=1))
+    for row in db.items("bedrockbenchmark"):
+        db.delete("bedrockbenchmark", row)
+        db.put("bedrockbenchmark", dict(row, date=yesterday))
+    run(db, "b", latency_ms=200.0)
+    today = [row for row in db.items("bedrockbenchmark") if row["date"] == str(date.today())]
+    assert len(today) == 10
+    for row in today:
+        assert row["output_unchanged"] is True
+        assert not has_output(row)
+        assert float(row["latency"]) == 200.0
+    assert all(has_output(row) for row in db.items("bedrockbenchmark") if row["date"] == yesterday)
@@ -0,0 +1,86 @@
+import json
+from collections import Counter
+
+import pytest
+
+from local_map import run_branch
+from shards import load_plan
+from standins import FakeBedrockRuntime, FakeDynamoDB, FakeS3, LatencyModel, catalog_items, local_model_ids
+
+
+class CountingRuntime(FakeBedrockRuntime):
+    """Counts the calls per (model, request body), i.e. per prompt/model pair."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.pairs = Counter()
+
+    def invoke_model(self, modelId, body, **kwargs):
+        self.pairs[(modelId, body)] += 1
+        return super().invoke_model(modelId=modelId, body=body, **kwargs)
+
+
+@pytest.fixture
+def run_plan(local_app):
+    def run_plan(prompts, models, state_input, env=None, catalog=None, latency_ms=0.0, timeout_s=900):
+        runtime = CountingRuntime(latency=LatencyModel(median_ms=latency_ms), seed=0)
+        db, s3 = FakeDynamoDB(), FakeS3()
+        db.load("bedrockbenchmarkprompts", catalog if catalog is not None else catalog_items(prompts))
+        # every simulated execution environment imports its own app module over the same stand-ins
+        plan, results = run_branch(lambda: local_app(local_model_ids("anthropic", models), runtime, db, env=env,
+                                                     extra_clients={"s3": s3}), state_input, timeout_s)
+        return runtime, db, load_plan(s3, plan["shard_plan"]), results
+    return run_plan
+
+
+@pytest.mark.parametrize("prompts, models, shard_size", [(101, 3, 7), (40, 2, 80), (25, 1, 1), (60, 4, 25)])
+def test_each_pair_runs_exactly_once(run_plan, prompts, models, shard_size):
+    runtime, db, shards, results = run_plan(prompts, models, {"shard_size": shard_size, "shard_concurrency": 4})
+    assert len(shards) == -(-prompts * models // shard_size)
+    assert len(runtime.pairs) == prompts * models
+    assert set(runtime.pairs.values()) == {1}
+    assert sum(r["stats"]["invocations"] for r in results) == prompts * models
+    # the planner reads the catalog once; the shards only query their own spans
+    assert db.calls.get("scan", 0) == 1
+
+
+def test_prompts_without_category_fall_back_to_the_whole_catalog(run_plan):
+    catalog = [{"id": f"p_{i}", "prompt": f"Prompt {i}"} for i in range(30)]
+    runtime, db, shards, results = run_plan(30, 2, {"shard_size": 9}, catalog=catalog)
+    assert all("span" not in shard for shard in shards)
+    assert len(runtime.pairs) == 60
+    assert set(runtime.pairs.values()) == {1}
+
+
+def test_continuations_resume_without_repeating_pairs(run_plan):
+    # a short timeout makes every shard hand over to continuations before it is done
+    runtime, db, shards, results = run_plan(
+        40, 2, {"shard_size": 40, "shard_concurrency": 2}, latency_ms=50, timeout_s=1.0,
+        env={"max_concurrency": "2", "deadline_margin_ms": "300", "default_pair_cost_ms": "50"})
+    assert any(r["invocations"] > 1 for r in results)
+    assert len(runtime.pairs) == 80
+    assert set(runtime.pairs.values()) == {1}
+
+
+def test_the_plan_goes_to_s3_instead_of_the_state_payload(local_app, handle):
+    # 20,000 prompts x 4 models is 1,600 shards with spans, several times the 256 KB state limit
+    app = local_app(local_model_ids("anthropic", 4), catalog=catalog_items(20000))
+    output = handle(app, {"mode": "plan", "input": {}, "run": {"execution_id": "arn:aws:states:local:0:execution:sm:e1"}})
+    assert output["shard_plan"] == {"bucket": "local", "key": "plans/e1/local.json"}
+    assert output["shard_count"] == 1600
+    assert len(json.dumps(output)) < 1024
+    shards = load_plan(app.s3, output["shard_plan"])
+    assert [shard["shard_id"] for shard in shards] == list(range(1600))
+    assert shards[-1]["end"] == 80000
+
+
+def test_repeated_samples_with_continuations_finish(run_plan):
+    # each pair's samples are admitted as one unit, so every continuation makes progress
+    runtime, db, shards, results = run_plan(
+        40, 2, {"shard_size": 80, "samples": 3}, latency_ms=50, timeout_s=1.0,
+        env={"max_concurrency": "2", "deadline_margin_ms": "300", "default_pair_cost_ms": "50"})
+    assert results[0]["invocations"] > 1
+    assert len(runtime.pairs) == 80
+    assert set(runtime.pairs.values()) == {3}
+    rows = db.items("bedrockbenchmark")
+    assert len(rows) == 80 and all(row["sample_count"] == 3 for row in rows)
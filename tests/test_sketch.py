@@ -0,0 +1,139 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+from latency import percentile
+from sketch import DDSketch, baseline_period, find_regressions, merge_into, periods
+from standins import FakeDynamoDB
+
+
+def lognormal(n, seed):
+    rng = random.Random(seed)
+    return [800 * rng.lognormvariate(0, 0.6) for _ in range(n)]
+
+
+@pytest.mark.parametrize("q", [1, 25, 50, 90, 99, 99.9])
+def test_quantiles_are_within_the_relative_error(q):
+    values = lognormal(20000, seed=1)
+    sketch = DDSketch(alpha=0.01)
+    for v in values:
+        sketch.add(v)
+    exact = sorted(values)[round((len(values) - 1) * q / 100)]
+    assert abs(sketch.quantile(q) - exact) <= 0.01 * exact * 1.0001
+
+
+def test_merging_equals_sketching_everything_at_once():
+    first, second = lognormal(3000, seed=2), lognormal(5000, seed=3)
+    a, b, whole = DDSketch(), DDSketch(), DDSketch()
+    for v in first:
+        a.add(v)
+    for v in second:
+        b.add(v)
+    for v in first + second:
+        whole.add(v)
+    merged = a.merge(b)
+    assert merged.bins == whole.bins and merged.count == whole.count == 8000
+    assert merged.sum == pytest.approx(whole.sum)
+    with pytest.raises(ValueError):
+        DDSketch(alpha=0.01).merge(DDSketch(alpha=0.02))
+
+
+def test_serialization_round_trip():
+    sketch = DDSketch()
+    for v in lognormal(500, seed=4) + [0.0, 0.0]:
+        sketch.add(v)
+    restored = DDSketch.from_json(sketch.to_json())
+    assert (restored.bins, restored.zero_count, restored.count) == (sketch.bins, 2, 502)
+    assert restored.quantile(50) == sketch.quantile(50)
+    assert restored.quantile(0) == 0.0
+
+
+def test_collapsing_keeps_the_high_quantiles():
+    values = [1.01 ** i for i in range(2000)]
+    full, capped = DDSketch(), DDSketch(max_bins=100)
+    for v in values:
+        full.add(v)
+        capped.add(v)
+    assert len(capped.bins) <= 100 and capped.count == 2000
+    assert capped.quantile(99) == full.quantile(99)
+    assert abs(capped.quantile(99) - percentile(values, 99)) <= 0.01 * percentile(values, 99) * 1.0001
+
+
+def test_days_roll_into_their_week_and_month():
+    assert periods(date(2026, 1, 1)) == ["day#2026-01-01", "week#2026-W01", "month#2026-01"]
+    # ISO weeks belong to the year of their Thursday
+    assert periods(date(2027, 1, 1))[1] == "week#2026-W53"
+
+
+@pytest.mark.parametrize("day, span, expected", [
+    (date(2026, 10, 19), "week", "week#2026-W42"),  # Monday: the week that just ended
+    (date(2026, 10, 18), "week", "week#2026-W41"),  # Sunday: its own week is not complete yet
+    (date(2026, 1, 2), "week", "week#2025-W52"),
+    (date(2026, 10, 31), "month", "month#2026-09"),
+    (date(2026, 1, 1), "month", "month#2025-12"),
+])
+def test_the_baseline_is_the_last_complete_period(day, span, expected):
+    assert baseline_period(day, span) == expected
+
+
+def test_regressions_need_enough_samples_on_both_sides():
+    baseline, current = DDSketch(), DDSketch()
+    for v in lognormal(100, seed=5):
+        baseline.add(v)
+        current.add(v * 2)
+    thresholds = {"p50": 0.25, "p99": 0.5}
+    flagged = find_regressions("m", {"latency": current, "input_tokens": current}, {"latency": baseline,
+                               "input_tokens": baseline}, thresholds)
+    assert {(r["metric"], r["quantile"]) for r in flagged} == {("latency", "p50"), ("latency", "p99")}
+    assert find_regressions("m", {"latency": current}, {"latency": baseline}, thresholds, min_count=101) == []
+
+
+
+class RacingDynamoDB(FakeDynamoDB):
+    """Another writer bumps the item between the read and the conditional write of the first `races` merges."""
+
+    def __init__(self, races):
+        super().__init__()
+        self.races = races
+
+    def put_item(self, TableName, Item, **kwargs):
+        if self.races:
+            self.races -= 1
+            key = {"model_id": Item["model_id"]["S"], "period": Item["period"]["S"]}
+            current = next((i for i in self.items(TableName) if {k: i[k] for k in key} == key), key)
+            self.put(TableName, dict(current, version=int(current.get("version", 0)) + 1))
+        return super().put_item(TableName=TableName, Item=Item, **kwargs)
+
+
+def sketch_of(*values):
+    sketch = DDSketch()
+    for v in values:
+        sketch.add(v)
+    return sketch
+
+
+def test_merge_conflicts_back_off_exponentially_with_jitter(monkeypatch):
+    delays = []
+    monkeypatch.setattr("sketch.time.sleep", delays.append)
+    db = RacingDynamoDB(races=6)
+    merge_into(db, "bedrockbenchmarksketch", "m", "day#2026-10-18", {"latency": sketch_of(10.0, 20.0)},
+               base_delay=0.02, max_delay=0.5)
+    assert len(delays) == 6
+    assert all(0 <= delay <= min(0.5, 0.02 * 2 ** attempt) for attempt, delay in enumerate(delays))
+    (item,) = db.items("bedrockbenchmarksketch")
+    assert DDSketch.from_json(item["latency"]).count == 2
+
+    with pytest.raises(RuntimeError):
+        merge_into(RacingDynamoDB(races=3), "bedrockbenchmarksketch", "m", "day#2026-10-18",
+                   {"latency": sketch_of(1.0)}, max_attempts=3)
+
+
+def test_concurrent_merges_all_land():
+    db = FakeDynamoDB()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: merge_into(db, "bedrockbenchmarksketch", "m", "week#2026-W42",
+                                           {"latency": sketch_of(float(i + 1))}, base_delay=0.001), range(40)))
+    (item,) = db.items("bedrockbenchmarksketch")
+    assert DDSketch.from_json(item["latency"]).count == 40 and item["version"] == 40
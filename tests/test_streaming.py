@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from standins import FakeBedrockRuntime, FakeDynamoDB, catalog_items, local_model_ids
+from streaming import chunk_text, stream_prompt_result, supports_streaming
+
+# the output text of an invoke_model response body, per family
+RESPONSE_TEXT = {
+    "anthropic": lambda resp: resp["content"][0]["text"],
+    "amazon.titan": lambda resp: resp["results"][0]["outputText"],
+    "cohere.command-r": lambda resp: resp["text"],
+    "meta": lambda resp: resp["generation"],
+    "mistral": lambda resp: resp["outputs"][0]["text"],
+}
+
+
+@pytest.mark.parametrize("family", sorted(RESPONSE_TEXT))
+def test_streamed_text_matches_the_blocking_response(family):
+    runtime = FakeBedrockRuntime(output_tokens=(12, 12), time_scale=0, seed=0)
+    model = local_model_ids(family, 1)[0]
+    body = json.dumps({"prompt": "Explain DDSketch."})
+    resp, metadata = stream_prompt_result(runtime, model, body)
+    blocking = json.loads(runtime.invoke_model(modelId=model, body=body)["body"].read())
+    # the chunks add up to the blocking text, in the shape the put_item_* writers read
+    text = RESPONSE_TEXT[family]
+    assert text(resp).strip() == text(blocking).strip() != ""
+    assert metadata["extra_attributes"]["chunk_count"] == 12
+    assert metadata["ResponseMetadata"]["HTTPHeaders"]["x-amzn-bedrock-output-token-count"] == "12"
+    assert "ttft_ms" in metadata["extra_attributes"]
+
+
+@pytest.mark.parametrize("family, chunk", [
+    ("anthropic", {"type": "message_start"}),
+    ("anthropic", {"type": "message_stop"}),
+    ("cohere.command-r", {"event_type": "stream-end", "finish_reason": "COMPLETE"}),
+    ("amazon.titan", {"index": 0, "amazon-bedrock-invocationMetrics": {"outputTokenCount": 3}}),
+])
+def test_control_chunks_carry_no_text(family, chunk):
+    assert chunk_text(local_model_ids(family, 1)[0], chunk) == ""
+
+
+def test_jurassic_is_invoked_without_streaming(local_app, handle):
+    models = ["ai21.j2-mid", "ai21.j2-ultra"]
+    assert not any(supports_streaming(model) for model in models)
+    assert supports_streaming("anthropic.claude-3-haiku-20240307-v1:0@us-east-1")
+
+    db = FakeDynamoDB()
+    app = local_app(models, db=db, catalog=catalog_items(5), env={"ledger_table": ""})
+    # a stream request would be rejected with a ValidationException and fail the run
+    output = handle(app, {"invocation_mode": "stream"})
+    assert output["stats"]["invocations"] == 10 and output["stats"]["failures"] == 0
+    rows = db.items("bedrockbenchmark")
+    assert len(rows) == 10
+    assert not any("ttft_ms" in row for row in rows)
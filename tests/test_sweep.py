@@ -0,0 +1,90 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+pytest.importorskip("numpy")
+
+from standins import MODEL_SHAPES, FakeBedrockRuntime, FakeDynamoDB, LatencyModel, local_model_ids  # noqa: E402
+from sweep import fit_latency, geometric, predict_latency, set_max_output  # noqa: E402
+
+MODELS = local_model_ids("anthropic", 2)
+GRID = {"mode": "sweep", "input_tokens": [256, 1024, 4096, 16384], "output_tokens": [16, 128, 512]}
+
+
+def test_geometric_sizes_end_at_the_maximum():
+    assert geometric(256, 32768, 4) == [256, 1024, 4096, 16384, 32768]
+    assert geometric(256, 20000, 4) == [256, 1024, 4096, 16384, 20000]
+    assert geometric(16, 16) == [16]
+
+
+@pytest.mark.parametrize("family, field", [
+    ("anthropic", ("max_tokens",)),
+    ("amazon.titan", ("textGenerationConfig", "maxTokenCount")),
+    ("ai21", ("maxTokens",)),
+    ("meta", ("max_gen_len",)),
+    ("mistral", ("max_tokens",)),
+    ("cohere.command-r", ("max_tokens",)),
+])
+def test_the_output_cap_is_the_only_limit(family, field):
+    body = json.loads(json.dumps(MODEL_SHAPES[family]))
+    body = set_max_output(body, local_model_ids(family, 1)[0], 64)
+    value = body
+    for name in field:
+        value = value[name]
+    assert value == 64
+    assert body.get("stop_sequences", []) == [] and body.get("textGenerationConfig", {}).get("stopSequences", []) == []
+
+
+def test_the_fit_recovers_a_linear_latency_model():
+    points = [(i, o, 150 + 0.4 * i + 25 * o) for i in (100, 1000, 8000) for o in (10, 100, 400)]
+    fit = fit_latency(*zip(*points))
+    assert fit["intercept_ms"] == pytest.approx(150)
+    assert fit["prefill_ms_per_token"] == pytest.approx(0.4)
+    assert fit["decode_ms_per_token"] == pytest.approx(25)
+    assert fit["r2"] == pytest.approx(1.0) and fit["rank"] == 3 and fit["points"] == 9
+    assert predict_latency(fit, 2000, 50) == pytest.approx(150 + 800 + 1250)
+    # every output hit the same cap: decode and intercept cannot be told apart
+    assert fit_latency([100, 1000, 8000], [64, 64, 64], [200, 560, 3360])["rank"] == 2
+
+
+class FailingRuntime(FakeBedrockRuntime):
+    """Fails the 512-token cap of the shortest prompt with a ModelErrorException, and every call of `throttled`."""
+
+    def __init__(self, throttled=None, **kwargs):
+        super().__init__(**kwargs)
+        self.throttled = throttled
+
+    def invoke_model(self, modelId, body, **kwargs):
+        if modelId == self.throttled:
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "slow down"}}, "InvokeModel")
+        if json.loads(body)["max_tokens"] == 512 and len(body) < 3000:
+            raise ClientError({"Error": {"Code": "ModelErrorException", "Message": "model error"}}, "InvokeModel")
+        return super().invoke_model(modelId=modelId, body=body, **kwargs)
+
+
+def runtime(**kwargs):
+    latency = LatencyModel(median_ms=200, per_input_token_ms=0.5, per_output_token_ms=20)
+    return FailingRuntime(latency=latency, output_tokens=(2000, 2000), context_tokens=10000, time_scale=0, **kwargs)
+
+
+def test_a_failed_grid_point_only_costs_that_point(local_app, handle):
+    db = FakeDynamoDB()
+    app = local_app(MODELS, runtime(), db)
+    body = json.loads(handle(app, GRID)["body"])
+    for model in MODELS:
+        fit = body["fits"][model]
+        # the longest prompt is past the context window; one point failed; the other 8 fit
+        assert fit["rejected_input_sizes"] == [16384] and fit["failed_points"] == 1 and fit["points"] == 8
+        assert fit["decode_ms_per_token"] == pytest.approx(20, rel=0.01)
+        assert fit["prefill_ms_per_token"] == pytest.approx(0.5, rel=0.05)
+        assert body["failed"][model] == [{"input_tokens": 256, "output_tokens": 512, "error": "ModelErrorException"}]
+    assert sorted(row["model_id"] for row in db.items("bedrockbenchmarkrollup")) == sorted(MODELS)
+
+
+def test_the_measured_fits_are_stored_before_an_error_is_raised(local_app, handle):
+    db = FakeDynamoDB()
+    app = local_app(MODELS, runtime(throttled=MODELS[1]), db, env={"max_requeues": "0"})
+    with pytest.raises(ClientError):
+        handle(app, GRID)
+    assert [row["model_id"] for row in db.items("bedrockbenchmarkrollup")] == [MODELS[0]]
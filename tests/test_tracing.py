@@ -0,0 +1,39 @@
+from tracing import EMF_MAX_VALUES, NO_SPAN, Tracer, format_profile
+
+
+def test_a_disabled_tracer_records_nothing():
+    tracer = Tracer(enabled=False)
+    assert tracer.span("invoke") is NO_SPAN
+    tracer.traced("write")(lambda: None)()
+    tracer.record("invoke", 5.0)
+    assert tracer.summary() == {} and tracer.emf("ns", {"function": "f"}) == []
+
+
+def test_spans_are_split_into_emf_documents_of_at_most_100_values():
+    tracer = Tracer(enabled=True)
+    for i in range(2 * EMF_MAX_VALUES + 50):
+        tracer.record("invoke", float(i))
+    for i in range(30):
+        tracer.record("write", 1.0)
+    documents = tracer.emf("BedrockBenchmark", {"function": "f"})
+    assert [len(d.get("invoke", [])) for d in documents] == [100, 100, 50]
+    assert [len(d.get("write", [])) for d in documents] == [30, 0, 0]
+    # every value once, in order, all under one timestamp
+    assert sum((d["invoke"] for d in documents), []) == [float(i) for i in range(250)]
+    assert len({d["_aws"]["Timestamp"] for d in documents}) == 1
+    # a document only declares the metrics it carries
+    assert [[m["Name"] for m in d["_aws"]["CloudWatchMetrics"][0]["Metrics"]] for d in documents] == [
+        ["invoke", "write"], ["invoke"], ["invoke"]]
+    assert all(d["function"] == "f" and d["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["function"]]
+               for d in documents)
+
+
+def test_the_profile_lists_the_largest_total_first():
+    tracer = Tracer(enabled=True)
+    with tracer.span("write"):
+        pass
+    for ms in (10.0, 20.0, 30.0):
+        tracer.record("invoke", ms)
+    summary = tracer.summary()
+    assert summary["invoke"]["count"] == 3 and summary["invoke"]["total_ms"] == 60.0
+    assert [line.split()[0] for line in format_profile(summary).splitlines()[1:]] == ["invoke", "write"]
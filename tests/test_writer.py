@@ -0,0 +1,113 @@
+import pytest
+
+from sketch import DDSketch
+from standins import FakeDynamoDB, catalog_items, local_model_ids
+from writer import BatchResultWriter, UpdateBuffer
+
+
+class UnprocessedWrites:
+    """Returns every request of the first `calls` BatchWriteItem calls as unprocessed, like a throttled table."""
+
+    def __init__(self, db, calls):
+        self.resource = db.resource()
+        self.calls = calls
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        if self.calls:
+            self.calls -= 1
+            return {"UnprocessedItems": RequestItems}
+        return self.resource.batch_write_item(RequestItems=RequestItems, **kwargs)
+
+
+def items(count):
+    return [{"model_prompt_id": f"m_{i}", "date": "2026-10-18"} for i in range(count)]
+
+
+def test_unprocessed_items_are_retried_until_written():
+    db = FakeDynamoDB()
+    writer = BatchResultWriter(UnprocessedWrites(db, calls=3), "bedrockbenchmark", base_delay=0)
+    for item in items(30):
+        writer.put(item)
+    writer.flush()
+    assert len(db.items("bedrockbenchmark")) == writer.written == 30
+    # the full batch of 25 went out four times, the remaining 5 once
+    assert writer.batches == 5
+
+
+def test_items_still_unprocessed_after_the_retries_raise():
+    db = FakeDynamoDB()
+    writer = BatchResultWriter(UnprocessedWrites(db, calls=3), "bedrockbenchmark", max_retries=2, base_delay=0)
+    for item in items(10):
+        writer.put(item)
+    with pytest.raises(RuntimeError, match="10 items still unprocessed"):
+        writer.flush()
+    assert writer.written == 0 and db.items("bedrockbenchmark") == []
+
+
+class ThrottledBenchmarkTable(FakeDynamoDB):
+    """Returns every benchmark-table write of the first `calls` BatchWriteItem calls as unprocessed."""
+
+    def __init__(self, calls):
+        super().__init__()
+        self.throttled_calls = calls
+
+    def _batch_write(self, RequestItems, typed):
+        if self.throttled_calls and "bedrockbenchmark" in RequestItems:
+            self.throttled_calls -= 1
+            self._count("batch_write_item")
+            return {"UnprocessedItems": RequestItems}
+        return super()._batch_write(RequestItems, typed)
+
+
+def test_items_given_up_after_the_retries_leave_their_pairs_to_the_retry(local_app, handle):
+    db = ThrottledBenchmarkTable(calls=9)
+    models = local_model_ids("anthropic", 2)
+    app = local_app(models, db=db, catalog=catalog_items(30))
+    app.result_writer.base_delay = 0
+    with pytest.raises(RuntimeError):
+        handle(app, {"run_id": "a"})
+    assert app.result_writer.dropped == 25
+    # no pair is in the ledger without its item
+    stored = {row["model_prompt_id"] for row in db.items("bedrockbenchmark")}
+    recorded = {row["pair_id"] for row in db.items("bedrockbenchmarkledger")}
+    assert recorded <= stored and len(stored) < 60
+
+    app = local_app(models, db=db)
+    handle(app, {"run_id": "a"})
+    assert len(db.items("bedrockbenchmark")) == 60
+    for item in db.items("bedrockbenchmarksketch"):
+        assert DDSketch.from_json(item["latency"]).count == 30
+
+
+def test_updates_are_buffered_and_missing_items_handed_on():
+    db = FakeDynamoDB()
+    db.put("bedrockbenchmark", {"model_prompt_id": "m_1", "date": "2026-10-18", "output": "kept", "Rating": 4})
+    missing = []
+    updates = UpdateBuffer(db.resource(), "bedrockbenchmark", batch_size=3,
+                           on_missing=lambda key, values: missing.append(key["model_prompt_id"]))
+    updates.update({"model_prompt_id": "m_1", "date": "2026-10-18"}, {"latency": "120"})
+    updates.update({"model_prompt_id": "m_2", "date": "2026-10-18"}, {"latency": "130"})
+    # nothing goes out until the batch is full or flushed
+    assert "update_item" not in db.calls
+    updates.update({"model_prompt_id": "m_1", "date": "2026-10-18"}, {"latency": "110"})
+    updates.flush()
+    assert db.calls["update_item"] == 2 and updates.updated == 2 and missing == ["m_2"]
+    (row,) = db.items("bedrockbenchmark")
+    assert (row["latency"], row["output"], row["Rating"]) == ("110", "kept", 4)
+
+
+def test_failed_updates_are_counted_and_raised():
+    db = FakeDynamoDB()
+
+    def fail(key, values):
+        raise ConnectionError("write failed")
+
+    updates = UpdateBuffer(db.resource(), "bedrockbenchmark", on_missing=fail)
+    for i in range(3):
+        updates.update({"model_prompt_id": f"m_{i}", "date": "2026-10-18"}, {"latency": "1"})
+    with pytest.raises(ConnectionError):
+        updates.flush()
+    assert updates.dropped == 3 and updates.updated == 0
+    # the buffer was taken: a later flush does not send them again
+    updates.flush()
+    assert db.calls["update_item"] == 3